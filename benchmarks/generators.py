@@ -0,0 +1,58 @@
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from scheduler import ScheduleManager  # noqa: E402
+from timegrid import Calendar  # noqa: E402
+
+# Synthetic schedules for the benchmarks. Everything is derived from a seed, so the same scale
+# always produces the same rooms, offerings and placements.
+
+BUILDINGS = ("P", "B", "LAB", "E")
+
+# name: (rooms, trimesters, courses per trimester, sections per course, slot minutes)
+SCALES = {
+    "small": (10, 12, 6, 1, 30),
+    "medium": (60, 12, 10, 3, 30),
+    "large": (300, 12, 25, 6, 30),
+    "fine": (60, 12, 10, 3, 15),  # Medium load on a 15-minute grid
+}
+
+
+def synthetic_manager(rooms, slot_minutes=30, seed=0):
+    # Manager with `rooms` classrooms of 20-120 seats spread over a few buildings, and no sections
+    rng = random.Random(seed)
+    manager = ScheduleManager()
+    manager.set_calendar(Calendar(slot_minutes=slot_minutes))  # 08:00 AM to 05:00 PM
+    for idx in range(rooms):
+        building = BUILDINGS[idx % len(BUILDINGS)]
+        manager.add_classroom(f"{building}{100 + idx}", rng.choice((20, 25, 30, 40, 50, 60, 80, 120)))
+    return manager
+
+
+def synthetic_offerings(trimesters, courses, sections, seed=0, slot_minutes=30):
+    # {trimester: [(course, sections, students, meetings, duration), ...]}; meetings last 1-2 hours
+    rng = random.Random(seed)
+    slots_per_hour = 60 // slot_minutes
+    return {
+        trimester: [
+            (f"Course {trimester}-{idx}", sections, rng.choice((15, 20, 25, 30, 40, 50)), rng.choice((1, 2, 2, 3)),
+             rng.choice((1, 2)) * slots_per_hour)
+            for idx in range(courses)
+        ]
+        for trimester in range(1, trimesters + 1)
+    }
+
+
+def synthetic_schedule(scale, seed=0):
+    # (manager with the offerings placed by the greedy solver, offerings)
+    from solver import solve_timetable
+
+    rooms, trimesters, courses, sections, slot_minutes = SCALES[scale]
+    manager = synthetic_manager(rooms, slot_minutes, seed)
+    offerings = synthetic_offerings(trimesters, courses, sections, seed, slot_minutes)
+    solve_timetable(manager, offerings)
+    return manager, offerings
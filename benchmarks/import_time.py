@@ -0,0 +1,70 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Import-time benchmark for the headless modules.
+# Each module is imported in a fresh interpreter (best of --runs) and must not pull in the GUI or
+# the heavy optional dependencies; those are only loaded by the code paths that need them.
+#
+#   python benchmarks/import_time.py            # table, exit status 1 on a violation
+#   python benchmarks/import_time.py --save     # also store the numbers in benchmarks/results/
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_FILE = os.path.join(ROOT, "benchmarks", "results", "import_time.json")
+
+HEADLESS_MODULES = ("scheduler", "solver", "storage", "journal", "history", "export", "importer", "validator", "cli")
+FORBIDDEN_MODULES = ("tkinter", "pandas", "numpy", "openpyxl", "multiprocessing")
+BUDGET_MS = 60.0  # Per module, measured around the import statement only
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(elapsed, ",".join(name for name in {forbidden!r} if name in sys.modules))
+"""
+
+
+def measure(module, runs):
+    # (best import time in ms, forbidden modules it loaded)
+    best, loaded = None, []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", PROBE.format(module=module, forbidden=FORBIDDEN_MODULES)],
+                                cwd=ROOT, capture_output=True, text=True, check=True).stdout.split()
+        elapsed = float(output[0]) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+        loaded = output[1].split(",") if len(output) > 1 else []
+    return best, loaded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure how long the headless modules take to import.")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per module (default %(default)s)")
+    parser.add_argument("--budget", type=float, default=BUDGET_MS, help="ms allowed per module (default %(default)s)")
+    parser.add_argument("--save", action="store_true", help=f"write the results to {os.path.relpath(RESULTS_FILE, ROOT)}")
+    args = parser.parse_args(argv)
+
+    results = {}
+    failures = 0
+    for module in HEADLESS_MODULES:
+        elapsed, loaded = measure(module, args.runs)
+        problems = []
+        if loaded:
+            problems.append("imports " + ", ".join(loaded))
+        if elapsed > args.budget:
+            problems.append(f"over the {args.budget:.0f} ms budget")
+        failures += bool(problems)
+        results[module] = {"ms": round(elapsed, 2), "forbidden": loaded}
+        print(f"{module:<12} {elapsed:8.2f} ms  {'; '.join(problems) or 'ok'}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(RESULTS_FILE), exist_ok=True)
+        with open(RESULTS_FILE, "w") as outfile:
+            json.dump({"python": sys.version.split()[0], "modules": results}, outfile, indent=2)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,279 @@
+import argparse
+import importlib.util
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generators import ROOT, SCALES, synthetic_manager, synthetic_schedule  # noqa: E402
+from scheduler import ScheduleManager, SchedulingError  # noqa: E402
+
+# Benchmark suite: placement, conflict checks, view aggregation, grid updates, save/load, export,
+# validation and the solver, on synthetic schedules of several scales.
+#
+#   python benchmarks/run.py                        # all benchmarks at the medium scale
+#   python benchmarks/run.py --scale large --only save_json load_json
+#   python benchmarks/run.py --save                 # append the results to benchmarks/results/history.jsonl
+#   python benchmarks/run.py --compare              # exit status 1 if something got slower than last time
+#
+# Each benchmark is timed --repeat times on fresh state and the fastest run is kept.
+
+HISTORY_FILE = os.path.join(ROOT, "benchmarks", "results", "history.jsonl")
+REGRESSION_THRESHOLD = 1.5  # Slower than 150% of the last stored run counts as a regression
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    # Register a benchmark: a function(context) -> callable to time, or None to skip
+    def decorator(function):
+        BENCHMARKS[name] = function
+        return function
+    return decorator
+
+
+class Context:
+    def __init__(self, scale, seed, workdir):
+        self.scale = scale
+        self.seed = seed
+        self.workdir = workdir
+        self.manager, self.offerings = synthetic_schedule(scale, seed)
+        self.rng = random.Random(seed)
+
+    def path(self, name):
+        return os.path.join(self.workdir, name)
+
+    def copy(self):
+        # Independent manager with the same schedule and calendar
+        manager = ScheduleManager()
+        manager.load_dict(self.manager.to_dict())
+        return manager
+
+
+@benchmark("place")
+def place_benchmark(context):
+    # Create and book every planned section in an empty manager
+    from solver import TimetableSolver
+
+    rooms, _, _, _, slot_minutes = SCALES[context.scale]
+    plan = TimetableSolver(synthetic_manager(rooms, slot_minutes, context.seed), context.offerings).solve()
+
+    def run():
+        plan.sections = []
+        plan.apply(synthetic_manager(rooms, slot_minutes, context.seed))
+    return run
+
+
+@benchmark("conflict_checks")
+def conflict_benchmark(context):
+    # 10000 placement attempts at random positions, most of which clash
+    manager = context.copy()
+    sections = list(manager.sections.values())
+    attempts = [(context.rng.choice(sections), context.rng.choice(manager.days_of_week),
+                 context.rng.choice(manager.time_slots)) for _ in range(10000)]
+
+    def run():
+        for section, day, time_slot in attempts:
+            try:
+                manager.book_meetings(section, [(day, time_slot)])
+            except SchedulingError:
+                continue
+            manager.release_meeting(section, (day, time_slot))
+    return run
+
+
+@benchmark("classroom_views")
+def classroom_views_benchmark(context):
+    # What switching to every classroom view costs
+    manager = context.manager
+
+    def run():
+        for room in manager.classrooms:
+            manager.get_classroom_schedule(room.name)
+    return run
+
+
+@benchmark("grid_updates")
+def grid_updates_benchmark(context):
+    # Headless equivalent of update_schedule_grid: the labels of every trimester view diffed into a cell dict
+    manager = context.manager
+    cells = {(time_slot, day): "" for time_slot in manager.time_slots for day in manager.days_of_week}
+    trimesters = sorted(manager.occupancy.trimesters)
+
+    def run():
+        for trimester in trimesters:
+            labels = manager.get_grid_labels(trimester=trimester)
+            for cell in [cell for cell, text in cells.items() if text and cell not in labels]:
+                cells[cell] = ""
+            for cell, label in labels.items():
+                if cells[cell] != label:
+                    cells[cell] = label
+    return run
+
+
+def save_benchmark(context, file_name):
+    def run():
+        context.manager.save_schedule(context.path(file_name))
+    return run
+
+
+def load_benchmark(context, file_name):
+    context.manager.save_schedule(context.path(file_name))
+
+    def run():
+        manager = ScheduleManager()
+        manager.load_schedule(context.path(file_name))
+    return run
+
+
+@benchmark("save_json")
+def save_json_benchmark(context):
+    return save_benchmark(context, "schedule.json")
+
+
+@benchmark("load_json")
+def load_json_benchmark(context):
+    return load_benchmark(context, "schedule.json")
+
+
+@benchmark("save_compact")
+def save_compact_benchmark(context):
+    return save_benchmark(context, "schedule.hbs")
+
+
+@benchmark("load_compact")
+def load_compact_benchmark(context):
+    return load_benchmark(context, "schedule.hbs")
+
+
+@benchmark("save_sqlite")
+def save_sqlite_benchmark(context):
+    return save_benchmark(context, "schedule.db")
+
+
+@benchmark("load_sqlite")
+def load_sqlite_benchmark(context):
+    return load_benchmark(context, "schedule.db")
+
+
+@benchmark("export_xlsx")
+def export_xlsx_benchmark(context):
+    if importlib.util.find_spec("openpyxl") is None:
+        return None
+    from export import export_schedule
+
+    def run():
+        export_schedule(context.manager, context.path("rooms.xlsx"), "room")
+    return run
+
+
+@benchmark("export_csv")
+def export_csv_benchmark(context):
+    from export import export_schedule
+
+    def run():
+        export_schedule(context.manager, context.path("rooms.csv"), "room")
+    return run
+
+
+@benchmark("validate")
+def validate_benchmark(context):
+    from validator import validate_document
+    data = context.manager.to_dict()
+
+    def run():
+        validate_document(data, context.manager.days_of_week, context.manager.time_slots)
+    return run
+
+
+@benchmark("solve")
+def solve_benchmark(context):
+    from solver import TimetableSolver
+
+    rooms, _, _, _, slot_minutes = SCALES[context.scale]
+    manager = synthetic_manager(rooms, slot_minutes, context.seed)
+
+    def run():
+        TimetableSolver(manager, context.offerings).solve()
+    return run
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def last_run(scale):
+    # Most recent stored results for this scale, or None
+    if not os.path.exists(HISTORY_FILE):
+        return None
+    previous = None
+    with open(HISTORY_FILE) as infile:
+        for line in infile:
+            run = json.loads(line)
+            if run["scale"] == scale:
+                previous = run
+    return previous
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the scheduling benchmarks on synthetic schedules.")
+    parser.add_argument("--scale", default="medium", choices=sorted(SCALES))
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="run only these benchmarks")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per benchmark (default %(default)s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", action="store_true", help="append the results to benchmarks/results/history.jsonl")
+    parser.add_argument("--compare", action="store_true", help="compare with the last stored run of this scale")
+    args = parser.parse_args(argv)
+
+    previous = last_run(args.scale) if args.compare else None
+    results = {}
+    regressions = 0
+    with tempfile.TemporaryDirectory() as workdir:
+        context = Context(args.scale, args.seed, workdir)
+        print(f"{args.scale}: {len(context.manager.classrooms)} rooms, {len(context.manager.sections)} sections, "
+              f"{sum(map(len, context.manager.room_views.values()))} booked room slots, {len(context.manager.time_slots)} slots per day")
+        for name in args.only or BENCHMARKS:
+            run = BENCHMARKS[name](context)
+            if run is None:
+                print(f"{name:<16} skipped")
+                continue
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                run()
+                timings.append(time.perf_counter() - start)
+            best = min(timings) * 1000
+            results[name] = round(best, 3)
+
+            line = f"{name:<16} {best:10.3f} ms"
+            if previous and name in previous["results"]:
+                ratio = best / previous["results"][name] if previous["results"][name] else 1.0
+                line += f"  {ratio:6.2f}x vs {previous.get('revision') or 'last run'}"
+                if ratio > REGRESSION_THRESHOLD:
+                    line += "  REGRESSION"
+                    regressions += 1
+            print(line)
+
+    if args.save:
+        os.makedirs(os.path.dirname(HISTORY_FILE), exist_ok=True)
+        record = {
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"), "revision": git_revision(),
+            "python": sys.version.split()[0], "scale": args.scale, "seed": args.seed, "results": results,
+        }
+        with open(HISTORY_FILE, "a") as outfile:
+            outfile.write(json.dumps(record) + "\n")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,261 @@
+import argparse
+import os
+import sys
+
+from diff import ADDED, REMOVED
+from export import EXPORT_GROUPINGS
+from instrumentation import configure_logging, enable_timing, get_logger, log_timing_report
+from scheduler import ScheduleManager, SchedulingError
+
+logger = get_logger("cli")
+
+# Batch entry point for servers without a display: everything goes through ScheduleManager and the
+# headless modules, tkinter is never imported. Each command accepts several schedule files, and
+# output names are templates where {name} is the input file name without its extension.
+#
+#   python cli.py validate schedule.json backup.json
+#   python cli.py solve schedule.hbs --offerings offerings.csv -o "{name}-solved.hbs"
+#   python cli.py export schedule.hbs --by room -o "{name}-rooms.xlsx"
+#   python cli.py diff old.hbs new.hbs --by room
+#   python cli.py merge base.hbs mine.hbs theirs.hbs -o merged.hbs
+#   python cli.py query archive.db --schedule 2025-fall --building P --day Thursday --from "12:00 PM"
+
+
+def load_manager(file_name, rooms=None, instructors=None):
+    manager = ScheduleManager()
+    manager.load_schedule(file_name)
+    if rooms or instructors:
+        from importer import import_instructors, import_rooms
+        if rooms:
+            import_rooms(manager, rooms)
+        if instructors:
+            import_instructors(manager, instructors)
+    return manager
+
+
+def output_name(template, file_name):
+    return template.format(name=os.path.splitext(os.path.basename(file_name))[0])
+
+
+def validate_command(args):
+    from validator import validate_file
+
+    status = 0
+    for file_name in args.files:
+        if file_name.endswith(".hbs"):
+            # Compact files cannot hold conflicts; report what the load had to skip instead
+            manager = load_manager(file_name)
+            problems = [f"skipped booking of {info} at {time_slot} on {day}"
+                        for day, time_slot, info in manager.rejected_bookings]
+            summary = f"{len(problems)} skipped bookings" if problems else "No problems"
+        else:
+            report = validate_file(file_name)
+            problems = [f"{violation.kind}: {violation.message}" for violation in report.violations]
+            summary = report.summary()
+        if not args.quiet:
+            for problem in problems:
+                print(f"{file_name}: {problem}")
+        print(f"{file_name}: {summary}")
+        if problems:
+            status = 1
+    return status
+
+
+def solve_command(args):
+    from solver import offerings_from_predefined, solve_parallel, solve_timetable
+
+    status = 0
+    for file_name in args.files:
+        manager = load_manager(file_name, args.rooms, args.instructors)
+        if args.offerings:
+            from importer import import_offerings
+            import_offerings(manager, args.offerings)
+        duration = 1
+        if args.duration is not None:
+            # Minutes on the command line, whole time slots of the schedule's calendar for the solver
+            duration, remainder = divmod(args.duration, manager.calendar.slot_minutes)
+            if remainder or duration < 1:
+                print(f"{file_name}: --duration must be a multiple of {manager.calendar.slot_minutes} minutes")
+                status = 1
+                continue
+        offerings = manager.offerings or offerings_from_predefined(
+            manager, args.students, args.sections, args.meetings, duration)
+
+        if args.workers == 1:
+            result = solve_timetable(manager, offerings, seed=args.seed)
+        else:
+            result = solve_parallel(manager, offerings, workers=args.workers, time_budget=args.time_budget,
+                                    seed=args.seed or 0)
+        placed, students = result.score()
+        print(f"{file_name}: placed {placed} sections ({students} students), {len(result.unplaced)} unplaced")
+        for request in result.unplaced:
+            logger.info("%s: could not place %s", file_name, request)
+        if result.unplaced and args.strict:
+            status = 1
+
+        output = output_name(args.output, file_name)
+        manager.save_schedule(output)
+        print(f"{file_name}: written to {output}")
+    return status
+
+
+def export_command(args):
+    from export import export_schedule
+
+    for file_name in args.files:
+        manager = load_manager(file_name)
+        files = export_schedule(manager, output_name(args.output, file_name), args.by)
+        print(f"{file_name}: exported to {', '.join(files)}")
+    return 0
+
+
+def change_lines(change):
+    trimester, course, number = change.key
+    name = f"{trimester}T: {course} (Group {number})"
+    if change.kind == ADDED:
+        return [f"+ {name} in {change.after['room']} {sorted(change.after['meetings'])}"]
+    if change.kind == REMOVED:
+        return [f"- {name} in {change.before['room']} {sorted(change.before['meetings'])}"]
+    lines = [f"~ {name} ({change.kind})"]
+    for field, value_before, value_after in change.fields():
+        if field == "meetings":
+            value_before, value_after = sorted(value_before), sorted(value_after)
+        lines.append(f"    {field}: {value_before} -> {value_after}")
+    return lines
+
+
+def diff_command(args):
+    # Sections added, removed, moved or changed between two files, per section, room or trimester
+    from diff import diff_schedules
+
+    result = diff_schedules(load_manager(args.old), load_manager(args.new))
+    if args.by == "section":
+        groups = {None: result.changes}
+    elif args.by == "room":
+        groups = result.by_room()
+    else:
+        groups = {f"Group {trimester}": changes for trimester, changes in result.by_trimester().items()}
+    for group, changes in groups.items():
+        if group is not None:
+            print(f"{group}:")
+        for change in changes:
+            for line in change_lines(change):
+                print(line if group is None else "  " + line)
+    print(result.summary())
+    return 1 if result.changes else 0
+
+
+def merge_command(args):
+    # Three-way merge of two edited copies of a common base file
+    from diff import merge_schedules
+
+    result = merge_schedules(load_manager(args.base), load_manager(args.ours), load_manager(args.theirs))
+    for conflict in result.conflicts:
+        print(f"conflict ({conflict.kind}): {conflict.message}")
+    result.manager.save_schedule(args.output)
+    print(f"Merged {len(result.manager.sections)} sections into {args.output}, {len(result.conflicts)} conflicts")
+    return 1 if result.conflicts else 0
+
+
+def query_command(args):
+    # Answered by SQLite from the indexed bookings table; the schedule is never loaded
+    from database import ScheduleDatabase
+
+    database = ScheduleDatabase(args.database)
+    try:
+        if args.list:
+            for name in database.schedules():
+                print(name)
+            return 0
+        bookings = database.find_bookings(args.schedule, building=args.building, room=args.room,
+                                          trimester=args.trimester, instructor=args.instructor, day=args.day,
+                                          start=args.start, end=args.end)
+    except KeyError as e:
+        raise ValueError(e.args[0]) from e
+    finally:
+        database.close()
+    for trimester, course, number, room, instructor, day, time_slot in bookings:
+        print(f"{day} {time_slot}  {room}  {trimester}T: {course} (Group {number})" + (f"  {instructor}" if instructor else ""))
+    print(f"{len(bookings)} booked slots")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Batch scheduling operations (no GUI).")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log progress at INFO level")
+    parser.add_argument("--timing", action="store_true", help="log how long each operation took")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    validate = commands.add_parser("validate", help="check schedule files for conflicts")
+    validate.add_argument("files", nargs="+")
+    validate.add_argument("-q", "--quiet", action="store_true", help="only print one summary line per file")
+    validate.set_defaults(handler=validate_command)
+
+    solve = commands.add_parser("solve", help="place the offerings automatically and save the result")
+    solve.add_argument("files", nargs="+")
+    solve.add_argument("-o", "--output", default="{name}-solved.hbs", help="output file template (default %(default)s)")
+    solve.add_argument("--offerings", help="CSV/xlsx of course offerings (default: predefined classes)")
+    solve.add_argument("--rooms", help="CSV/xlsx of rooms to add before solving")
+    solve.add_argument("--instructors", help="CSV/xlsx of instructors to add before solving")
+    solve.add_argument("--students", type=int, default=30, help="students per section without --offerings")
+    solve.add_argument("--sections", type=int, default=1, help="sections per course without --offerings")
+    solve.add_argument("--meetings", type=int, default=1, help="weekly meetings without --offerings")
+    solve.add_argument("--duration", type=int, help="minutes per meeting without --offerings (default one time slot)")
+    solve.add_argument("--workers", type=int, default=1, help="processes for randomized restarts (default 1)")
+    solve.add_argument("--time-budget", type=float, default=5.0, help="seconds for restarts when workers > 1")
+    solve.add_argument("--seed", type=int, help="random seed")
+    solve.add_argument("--strict", action="store_true", help="exit with status 1 when sections stay unplaced")
+    solve.set_defaults(handler=solve_command)
+
+    export = commands.add_parser("export", help="write schedule grids to CSV or Excel")
+    export.add_argument("files", nargs="+")
+    export.add_argument("-o", "--output", default="{name}.xlsx", help="output file template (default %(default)s)")
+    export.add_argument("--by", default="trimester", choices=EXPORT_GROUPINGS)
+    export.set_defaults(handler=export_command)
+
+    diff = commands.add_parser("diff", help="list the sections that differ between two schedule files")
+    diff.add_argument("old")
+    diff.add_argument("new")
+    diff.add_argument("--by", default="section", choices=("section", "room", "trimester"),
+                      help="group the changes (default %(default)s)")
+    diff.set_defaults(handler=diff_command)
+
+    merge = commands.add_parser("merge", help="merge two edited copies of a schedule file")
+    merge.add_argument("base", help="the file both copies started from")
+    merge.add_argument("ours")
+    merge.add_argument("theirs")
+    merge.add_argument("-o", "--output", default="merged.hbs", help="merged schedule file (default %(default)s)")
+    merge.set_defaults(handler=merge_command)
+
+    query = commands.add_parser("query", help="search the bookings stored in a SQLite schedule database")
+    query.add_argument("database")
+    query.add_argument("--schedule", default="schedule", help="stored schedule to search (default %(default)s)")
+    query.add_argument("--list", action="store_true", help="list the stored schedules instead")
+    query.add_argument("--building")
+    query.add_argument("--room")
+    query.add_argument("--trimester", type=int)
+    query.add_argument("--instructor")
+    query.add_argument("--day")
+    query.add_argument("--from", dest="start", metavar="TIME_SLOT", help='first time slot, e.g. "12:00 PM"')
+    query.add_argument("--to", dest="end", metavar="TIME_SLOT", help="last time slot")
+    query.set_defaults(handler=query_command)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    configure_logging("INFO" if args.verbose or args.timing else None)
+    if args.timing:
+        enable_timing()
+    try:
+        return args.handler(args)
+    except (OSError, ValueError, SchedulingError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    finally:
+        if args.timing:
+            log_timing_report()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,354 @@
+import json
+import sqlite3
+from contextlib import contextmanager
+
+from instrumentation import get_logger, timed
+from scheduler import ScheduleManager
+from timegrid import Calendar
+
+logger = get_logger("database")
+
+# SQLite storage (.sqlite/.db): several named schedules (one per semester, say) in one file, with
+# every booked slot in an indexed table, so questions like "sections in building P on Thursday
+# afternoons" are answered by SQLite without loading any schedule into a ScheduleManager.
+#
+# save()/load() write or read a whole schedule in one transaction. attach() keeps a schedule in
+# the database up to date with a manager: each operation record becomes its own transaction, and
+# deferred() groups a bulk change (solver run, import) into one.
+#
+#   python main.py --database schedule.db     # edit as usual; the database follows every change
+#   python server.py --database schedule.db   # the same for a shared schedule, one transaction per batch
+
+DEFAULT_SCHEDULE = "schedule"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS schedules (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    seq INTEGER NOT NULL DEFAULT 0,
+    days TEXT NOT NULL,
+    time_slots TEXT NOT NULL,
+    calendar TEXT
+);
+CREATE TABLE IF NOT EXISTS rooms (
+    schedule_id INTEGER NOT NULL REFERENCES schedules(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    capacity INTEGER NOT NULL,
+    building TEXT NOT NULL,
+    features TEXT NOT NULL,
+    PRIMARY KEY (schedule_id, name)
+);
+CREATE INDEX IF NOT EXISTS rooms_by_building ON rooms (schedule_id, building);
+CREATE TABLE IF NOT EXISTS instructors (
+    schedule_id INTEGER NOT NULL REFERENCES schedules(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    windows TEXT NOT NULL,
+    PRIMARY KEY (schedule_id, name)
+);
+CREATE TABLE IF NOT EXISTS sections (
+    id INTEGER PRIMARY KEY,
+    schedule_id INTEGER NOT NULL REFERENCES schedules(id) ON DELETE CASCADE,
+    trimester INTEGER NOT NULL,
+    course TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    room TEXT NOT NULL,
+    students INTEGER NOT NULL,
+    duration INTEGER NOT NULL,
+    days TEXT NOT NULL,
+    instructor TEXT,
+    UNIQUE (schedule_id, trimester, course, number)
+);
+CREATE TABLE IF NOT EXISTS meetings (
+    id INTEGER PRIMARY KEY,
+    section_id INTEGER NOT NULL REFERENCES sections(id) ON DELETE CASCADE,
+    day TEXT NOT NULL,
+    start TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS meetings_by_section ON meetings (section_id);
+CREATE TABLE IF NOT EXISTS bookings (
+    meeting_id INTEGER NOT NULL REFERENCES meetings(id) ON DELETE CASCADE,
+    section_id INTEGER NOT NULL,
+    schedule_id INTEGER NOT NULL,
+    room TEXT NOT NULL,
+    trimester INTEGER NOT NULL,
+    instructor TEXT,
+    day TEXT NOT NULL,
+    slot INTEGER NOT NULL,
+    time_slot TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS bookings_by_room ON bookings (schedule_id, room, day, slot);
+CREATE INDEX IF NOT EXISTS bookings_by_trimester ON bookings (schedule_id, trimester, day, slot);
+CREATE INDEX IF NOT EXISTS bookings_by_instructor ON bookings (schedule_id, instructor, day, slot);
+CREATE INDEX IF NOT EXISTS bookings_by_meeting ON bookings (meeting_id);
+CREATE INDEX IF NOT EXISTS bookings_by_section ON bookings (section_id);
+"""
+
+
+class ScheduleDatabase:
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.connection = sqlite3.connect(file_name)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.executescript(SCHEMA)
+        # Files written before calendars were stored get the column; their schedules keep plain labels
+        if "calendar" not in {row[1] for row in self.connection.execute("PRAGMA table_info(schedules)")}:
+            self.connection.execute("ALTER TABLE schedules ADD COLUMN calendar TEXT")
+        self.attached = None  # (manager, schedule id) kept up to date by record()
+        self.deferring = False
+
+    def close(self):
+        if self.attached is not None:
+            self.detach()
+        self.connection.close()
+
+    def schedules(self):
+        # Names of the stored schedules
+        return [name for name, in self.connection.execute("SELECT name FROM schedules ORDER BY name")]
+
+    def schedule_row(self, name):
+        # (id, Calendar) of a stored schedule; KeyError if there is none by that name
+        row = self.connection.execute("SELECT id, days, time_slots, calendar FROM schedules WHERE name = ?",
+                                      (name,)).fetchone()
+        if row is None:
+            raise KeyError(f"No schedule named {name!r} in {self.file_name}")
+        if row[3] is None:
+            return row[0], Calendar.from_labels(json.loads(row[1]), json.loads(row[2]))
+        return row[0], Calendar.from_dict(json.loads(row[3]))
+
+    # ----- Whole schedules -----
+
+    @timed("db_save")
+    def save(self, manager, name=DEFAULT_SCHEDULE):
+        # Replace the stored schedule `name` with the manager's, in one transaction
+        with self.connection:
+            self.connection.execute("DELETE FROM schedules WHERE name = ?", (name,))
+            schedule_id = self.connection.execute(
+                "INSERT INTO schedules (name, seq, days, time_slots, calendar) VALUES (?, ?, ?, ?, ?)",
+                (name, manager.sequence, json.dumps(manager.days_of_week), json.dumps(manager.time_slots),
+                 json.dumps(manager.calendar.to_dict()))).lastrowid
+            self.connection.executemany(
+                "INSERT INTO rooms VALUES (?, ?, ?, ?, ?)",
+                ((schedule_id, room.name, room.capacity, room.building, json.dumps(list(room.features)))
+                 for room in manager.classrooms))
+            self.connection.executemany(
+                "INSERT INTO instructors VALUES (?, ?, ?)",
+                ((schedule_id, instructor.name, json.dumps([list(window) for window in instructor.windows]))
+                 for instructor in manager.instructors.values()))
+            for section in manager.sections.values():
+                self.insert_section(schedule_id, manager, section)
+        return schedule_id
+
+    @timed("db_load")
+    def load(self, name=DEFAULT_SCHEDULE, manager=None):
+        # ScheduleManager (a new one unless one is given) holding the stored schedule `name`
+        schedule_id, calendar = self.schedule_row(name)
+        if manager is None:
+            manager = ScheduleManager()
+
+        meetings = {}
+        for section_id, day, start in self.connection.execute(
+                "SELECT m.section_id, m.day, m.start FROM meetings m JOIN sections s ON s.id = m.section_id "
+                "WHERE s.schedule_id = ? ORDER BY m.id", (schedule_id,)):
+            meetings.setdefault(section_id, []).append((day, start))
+        data = {
+            "calendar": calendar.to_dict(),
+            "classrooms": [
+                {"name": room_name, "capacity": capacity, "building": building, "features": json.loads(features)}
+                for room_name, capacity, building, features in self.connection.execute(
+                    "SELECT name, capacity, building, features FROM rooms WHERE schedule_id = ? ORDER BY rowid",
+                    (schedule_id,))
+            ],
+            "instructors": [
+                {"name": instructor, "windows": json.loads(windows)}
+                for instructor, windows in self.connection.execute(
+                    "SELECT name, windows FROM instructors WHERE schedule_id = ? ORDER BY rowid", (schedule_id,))
+            ],
+            "sections": [
+                {"trimester": trimester, "course": course, "number": number, "room": room, "students": students,
+                 "duration": duration, "days": json.loads(section_days), "instructor": instructor,
+                 "meetings": meetings.get(section_id, [])}
+                for section_id, trimester, course, number, room, students, duration, section_days, instructor
+                in self.connection.execute(
+                    "SELECT id, trimester, course, number, room, students, duration, days, instructor "
+                    "FROM sections WHERE schedule_id = ? ORDER BY id", (schedule_id,))
+            ],
+        }
+        manager.load_dict(data)
+        manager.sequence, = self.connection.execute("SELECT seq FROM schedules WHERE id = ?", (schedule_id,)).fetchone()
+        return manager
+
+    def delete(self, name):
+        with self.connection:
+            self.connection.execute("DELETE FROM schedules WHERE name = ?", (name,))
+
+    # ----- Rows of one section -----
+
+    def section_id(self, schedule_id, key):
+        trimester, course, number = key
+        row = self.connection.execute(
+            "SELECT id FROM sections WHERE schedule_id = ? AND trimester = ? AND course = ? AND number = ?",
+            (schedule_id, trimester, course, number)).fetchone()
+        return row[0]
+
+    def insert_section(self, schedule_id, manager, section):
+        section_id = self.connection.execute(
+            "INSERT INTO sections (schedule_id, trimester, course, number, room, students, duration, days, instructor) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (schedule_id, section.trimester, section.course, section.number, section.room, section.students,
+             section.duration, json.dumps(list(section.days)), section.instructor)).lastrowid
+        for meeting in sorted(section.meetings):
+            self.insert_meeting(schedule_id, manager, section, section_id, meeting)
+        return section_id
+
+    def insert_meeting(self, schedule_id, manager, section, section_id, meeting):
+        # The meeting and one booking row per slot it covers
+        day, start = meeting
+        meeting_id = self.connection.execute("INSERT INTO meetings (section_id, day, start) VALUES (?, ?, ?)",
+                                             (section_id, day, start)).lastrowid
+        first = manager.occupancy.slot_index[start]
+        self.connection.executemany(
+            "INSERT INTO bookings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            ((meeting_id, section_id, schedule_id, section.room, section.trimester, section.instructor, day, slot,
+              manager.time_slots[slot])
+             for slot in range(first, first + section.duration)))
+
+    def delete_meeting(self, section_id, meeting):
+        self.connection.execute("DELETE FROM meetings WHERE section_id = ? AND day = ? AND start = ?",
+                                (section_id, *meeting))
+
+    # ----- Live updates -----
+
+    def attach(self, manager, name=DEFAULT_SCHEDULE):
+        # Store the manager's schedule as `name` and write each of its later changes as they happen
+        schedule_id = self.save(manager, name)
+        self.attached = (manager, schedule_id)
+        manager.add_listener(self.record)
+
+    def detach(self):
+        manager, _ = self.attached
+        manager.remove_listener(self.record)
+        self.attached = None
+
+    @contextmanager
+    def deferred(self):
+        # One transaction for every change inside the block
+        if self.deferring:
+            yield
+            return
+        self.deferring = True
+        try:
+            with self.connection:
+                yield
+        finally:
+            self.deferring = False
+
+    def record(self, record):
+        # Listener: apply one operation record to the stored schedule
+        if self.deferring:
+            self.write(record)
+            return
+        with self.connection:
+            self.write(record)
+
+    def write(self, record):
+        manager, schedule_id = self.attached
+        op = record["op"]
+        execute = self.connection.execute
+        if op == "reset":
+            # A file was loaded into the manager: store it whole
+            execute("DELETE FROM rooms WHERE schedule_id = ?", (schedule_id,))
+            execute("DELETE FROM instructors WHERE schedule_id = ?", (schedule_id,))
+            execute("DELETE FROM sections WHERE schedule_id = ?", (schedule_id,))
+            execute("UPDATE schedules SET days = ?, time_slots = ?, calendar = ? WHERE id = ?",
+                    (json.dumps(manager.days_of_week), json.dumps(manager.time_slots),
+                     json.dumps(manager.calendar.to_dict()), schedule_id))
+            for room in manager.classrooms:
+                self.write({"op": "room", "name": room.name})
+            for instructor in manager.instructors:
+                self.write({"op": "instructor", "name": instructor})
+            for section in manager.sections.values():
+                self.insert_section(schedule_id, manager, section)
+        elif op == "room":
+            room = manager.classrooms_by_name[record["name"]]
+            execute("INSERT OR REPLACE INTO rooms VALUES (?, ?, ?, ?, ?)",
+                    (schedule_id, room.name, room.capacity, room.building, json.dumps(list(room.features))))
+        elif op == "instructor":
+            instructor = manager.instructors[record["name"]]
+            execute("INSERT OR REPLACE INTO instructors VALUES (?, ?, ?)",
+                    (schedule_id, instructor.name, json.dumps([list(window) for window in instructor.windows])))
+        elif op == "create":
+            self.insert_section(schedule_id, manager, manager.sections_by_key[tuple(record["section"])])
+        elif op == "delete":
+            execute("DELETE FROM sections WHERE id = ?", (self.section_id(schedule_id, record["section"]),))
+        else:
+            section = manager.sections_by_key[tuple(record["section"])]
+            section_id = self.section_id(schedule_id, record["section"])
+            if op == "place":
+                for meeting in record["meetings"]:
+                    self.insert_meeting(schedule_id, manager, section, section_id, tuple(meeting))
+            elif op == "unplace":
+                self.delete_meeting(section_id, record["meeting"])
+            elif op == "move":
+                self.delete_meeting(section_id, record["meeting"])
+                self.insert_meeting(schedule_id, manager, section, section_id, tuple(record["to"]))
+            elif op == "assign":
+                execute("UPDATE sections SET instructor = ? WHERE id = ?", (record["instructor"], section_id))
+                execute("UPDATE bookings SET instructor = ? WHERE section_id = ?", (record["instructor"], section_id))
+        if "seq" in record:
+            execute("UPDATE schedules SET seq = ? WHERE id = ?", (record["seq"], schedule_id))
+
+    # ----- Queries without loading -----
+
+    def find_bookings(self, name=DEFAULT_SCHEDULE, building=None, room=None, trimester=None, instructor=None,
+                      day=None, start=None, end=None):
+        # [(trimester, course, number, room, instructor, day, time_slot), ...] of the stored schedule
+        # `name`, filtered by any of the arguments; start/end bound the time slots (both included) and
+        # may be written in any form timegrid.parse_time reads ("01:00 PM", "13:00")
+        schedule_id, calendar = self.schedule_row(name)
+        conditions = ["b.schedule_id = ?"]
+        parameters = [schedule_id]
+        for column, value in (("b.room", room), ("b.trimester", trimester), ("b.instructor", instructor),
+                              ("b.day", day)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                parameters.append(value)
+        if building is not None:
+            conditions.append("b.room IN (SELECT name FROM rooms WHERE schedule_id = ? AND building = ?)")
+            parameters += [schedule_id, building]
+        for time_slot, condition in ((start, "b.slot >= ?"), (end, "b.slot <= ?")):
+            if time_slot is None:
+                continue
+            try:
+                slot = calendar.slot_of(time_slot)
+            except KeyError:
+                raise ValueError(f"Unknown time slot {time_slot!r}") from None
+            conditions.append(condition)
+            parameters.append(slot)
+        rows = self.connection.execute(
+            "SELECT s.trimester, s.course, s.number, b.room, b.instructor, b.day, b.time_slot, b.slot "
+            "FROM bookings b JOIN sections s ON s.id = b.section_id "
+            f"WHERE {' AND '.join(conditions)}", parameters).fetchall()
+        day_order = calendar.day_index
+        rows.sort(key=lambda row: (day_order.get(row[5], len(day_order)), row[7], row[3]))
+        return [row[:7] for row in rows]
+
+    def find_sections(self, name=DEFAULT_SCHEDULE, **filters):
+        # Distinct (trimester, course, number) of the sections with at least one matching booking
+        return sorted({booking[:3] for booking in self.find_bookings(name, **filters)})
+
+
+def save_database(manager, file_name, name=DEFAULT_SCHEDULE):
+    database = ScheduleDatabase(file_name)
+    try:
+        database.save(manager, name)
+    finally:
+        database.close()
+
+
+def load_database(file_name, manager=None, name=DEFAULT_SCHEDULE):
+    database = ScheduleDatabase(file_name)
+    try:
+        return database.load(name, manager)
+    finally:
+        database.close()
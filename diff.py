@@ -0,0 +1,210 @@
+from instrumentation import get_logger, timed
+from scheduler import ScheduleManager, SchedulingError
+
+logger = get_logger("diff")
+
+# Differences between two schedules and three-way merges of two edited copies of a common base.
+# Sections are matched by their stable (trimester, course, number) key and compared field by field,
+# so both run in time linear in the number of sections and meetings; labels are never compared.
+
+ADDED = "added"
+REMOVED = "removed"
+MOVED = "moved"  # Other room or other meetings
+CHANGED = "changed"  # Same placement, other students, duration or instructor
+
+SECTION_FIELDS = ("room", "students", "duration", "days", "instructor", "meetings")
+PLACEMENT_FIELDS = ("room", "meetings")
+
+SECTION_CONFLICT = "section"  # Both sides changed the same section differently
+SLOT_CONFLICT = "slot"  # Merged sections need the same room, trimester or instructor slot
+
+
+def section_state(section):
+    # Comparable description of a section; meetings as a frozenset so their order does not matter
+    return {
+        "room": section.room, "students": section.students, "duration": section.duration,
+        "days": tuple(section.days), "instructor": section.instructor, "meetings": frozenset(section.meetings),
+    }
+
+
+def schedule_states(manager):
+    # {section key: section_state}
+    return {key: section_state(section) for key, section in manager.sections_by_key.items()}
+
+
+def as_manager(source):
+    # A ScheduleManager, or the name of a file any ScheduleManager can load
+    if isinstance(source, ScheduleManager):
+        return source
+    manager = ScheduleManager()
+    manager.load_schedule(source)
+    return manager
+
+
+class SectionChange:
+    def __init__(self, kind, key, before=None, after=None):
+        self.kind = kind
+        self.key = key  # (trimester, course, number)
+        self.before = before  # section_state in the old schedule, None if added
+        self.after = after  # section_state in the new schedule, None if removed
+
+    def __repr__(self):
+        return f"SectionChange({self.kind} {self.key})"
+
+    def fields(self):
+        # [(field, old value, new value), ...] for the fields that differ
+        if self.before is None or self.after is None:
+            return []
+        return [(field, self.before[field], self.after[field])
+                for field in SECTION_FIELDS if self.before[field] != self.after[field]]
+
+    def rooms(self):
+        return {state["room"] for state in (self.before, self.after) if state is not None}
+
+
+class ScheduleDiff:
+    def __init__(self, changes):
+        self.changes = changes  # SectionChanges sorted by section key
+
+    def __len__(self):
+        return len(self.changes)
+
+    def by_kind(self, kind):
+        return [change for change in self.changes if change.kind == kind]
+
+    def by_room(self):
+        # {room: [SectionChange, ...]}; a section moved between rooms is listed under both
+        rooms = {}
+        for change in self.changes:
+            for room in change.rooms():
+                rooms.setdefault(room, []).append(change)
+        return dict(sorted(rooms.items()))
+
+    def by_trimester(self):
+        trimesters = {}
+        for change in self.changes:
+            trimesters.setdefault(change.key[0], []).append(change)
+        return dict(sorted(trimesters.items()))
+
+    def summary(self):
+        counts = [f"{len(self.by_kind(kind))} {kind}" for kind in (ADDED, REMOVED, MOVED, CHANGED)]
+        return f"{len(self.changes)} sections differ: " + ", ".join(counts)
+
+
+def diff_states(old, new):
+    changes = []
+    for key in sorted(old.keys() | new.keys()):
+        before, after = old.get(key), new.get(key)
+        if before is None:
+            changes.append(SectionChange(ADDED, key, after=after))
+        elif after is None:
+            changes.append(SectionChange(REMOVED, key, before=before))
+        elif before != after:
+            moved = any(before[field] != after[field] for field in PLACEMENT_FIELDS)
+            changes.append(SectionChange(MOVED if moved else CHANGED, key, before, after))
+    return ScheduleDiff(changes)
+
+
+@timed("diff")
+def diff_schedules(old, new):
+    # ScheduleDiff from old to new (ScheduleManagers or schedule file names)
+    return diff_states(schedule_states(as_manager(old)), schedule_states(as_manager(new)))
+
+
+class MergeConflict:
+    def __init__(self, kind, key, message, day=None, time_slot=None):
+        self.kind = kind
+        self.key = key  # Section that lost (slot conflicts) or was kept as in "ours" (section conflicts);
+        # None for an instructor whose availability could not be kept
+        self.message = message
+        self.day = day
+        self.time_slot = time_slot
+
+    def __repr__(self):
+        return f"MergeConflict({self.kind}: {self.message})"
+
+
+class MergeResult:
+    def __init__(self, manager, conflicts):
+        self.manager = manager  # Merged schedule
+        self.conflicts = conflicts
+
+    @property
+    def ok(self):
+        return not self.conflicts
+
+
+def merge_states(base, ours, theirs):
+    # ({key: state}, {key: "ours" or "theirs"}, [MergeConflict])
+    merged = {}
+    sources = {}
+    conflicts = []
+    for key in sorted(base.keys() | ours.keys() | theirs.keys()):
+        original, mine, other = base.get(key), ours.get(key), theirs.get(key)
+        if mine == other or other == original:
+            state, source = mine, "ours"
+        elif mine == original:
+            state, source = other, "theirs"
+        else:
+            state, source = mine, "ours"
+            trimester, course, number = key
+            conflicts.append(MergeConflict(SECTION_CONFLICT, key, f"{course} (Group {number}, {trimester}T) was "
+                                           "changed differently on both sides; kept ours"))
+        if state is not None:
+            merged[key] = state
+            sources[key] = source
+    return merged, sources, conflicts
+
+
+@timed("merge")
+def merge_schedules(base, ours, theirs):
+    # Three-way merge of two edited copies of base. Changes made on one side only are taken as they
+    # are; sections changed on both sides keep our version. Meetings that would then clash with
+    # another section, or that do not exist in our calendar, are left unplaced and reported as slot
+    # conflicts (our sections win).
+    base, ours, theirs = as_manager(base), as_manager(ours), as_manager(theirs)
+    merged, sources, conflicts = merge_states(schedule_states(base), schedule_states(ours), schedule_states(theirs))
+
+    manager = ScheduleManager()
+    manager.set_calendar(ours.calendar)
+    for side in (ours, theirs):
+        for room in side.classrooms:
+            if manager.get_classroom(room.name) is None:
+                manager.add_classroom(room.name, room.capacity, room.building, room.features)
+        for instructor in side.instructors.values():
+            if instructor.name in manager.instructors:
+                continue
+            try:
+                manager.add_instructor(instructor.name, instructor.windows)
+            except SchedulingError as e:
+                # Windows of their calendar that ours does not have
+                manager.add_instructor(instructor.name)
+                conflicts.append(MergeConflict(SLOT_CONFLICT, None, f"{instructor.name} was added as available "
+                                               f"all week: {e}"))
+
+    # Create every section first, then place ours before theirs so ours keep their slots
+    for key, state in list(merged.items()):
+        trimester, course, number = key
+        try:
+            manager.create_section(course, state["students"], state["room"], trimester, number, state["duration"],
+                                   list(state["days"]), state["instructor"])
+        except SchedulingError as e:
+            del merged[key]
+            conflicts.append(MergeConflict(SLOT_CONFLICT, key, f"{course} (Group {number}, {trimester}T) was "
+                                           f"left out: {e}"))
+    for source in ("ours", "theirs"):
+        for key, state in merged.items():
+            if sources[key] != source:
+                continue
+            section = manager.sections_by_key[key]
+            for day, time_slot in sorted(state["meetings"]):
+                try:
+                    manager.place_section(section.id, day, time_slot)
+                except (SchedulingError, KeyError) as e:
+                    # KeyError: a day or time slot of their calendar
+                    reason = f"no such time slot in {ours.calendar!r}" if isinstance(e, KeyError) else e
+                    conflicts.append(MergeConflict(SLOT_CONFLICT, key, f"{section.label()} was not placed at "
+                                                   f"{time_slot} on {day}: {reason}", day, time_slot))
+    manager.offerings = {**theirs.offerings, **ours.offerings}
+    logger.info("Merged %d sections with %d conflicts", len(merged), len(conflicts))
+    return MergeResult(manager, conflicts)
@@ -0,0 +1,149 @@
+import csv
+import os
+import re
+import threading
+
+from instrumentation import get_logger, timed
+
+logger = get_logger("export")
+
+# Schedule export to CSV or Excel.
+# Each sheet is built straight from the occupancy bitsets (only booked slots are visited) and
+# written row by row, to csv or to an openpyxl write-only workbook, so memory stays flat even with
+# hundreds of rooms. export_in_background() runs an export on a snapshot in a worker thread.
+
+EXPORT_GROUPINGS = ("trimester", "room", "building", "instructor")
+SHEET_NAME_LIMIT = 31  # Excel's limit
+INVALID_SHEET_CHARACTERS = re.compile(r"[\[\]:*?/\\]")
+
+
+def sheet_rows(manager, trimester=None, classroom=None, instructor=None):
+    # [[time_slot, label per day, ...], ...] for one trimester, classroom or instructor grid
+    occupancy = manager.occupancy
+    view = manager.get_view(trimester, classroom, instructor)
+
+    # Day-major flat grid, filled in one pass over the view's bookings; blocked slots show why
+    days = len(occupancy.days)
+    cells = [""] * (days * occupancy.slots_per_day)
+    for position, reason in occupancy.blocked_reasons.items():
+        cells[position] = reason
+    labels = {}
+    for position, section_id in view.items():
+        label = labels.get(section_id)
+        if label is None:
+            label = labels[section_id] = manager.sections[section_id].label()
+        cells[position] = label
+
+    slots_per_day = occupancy.slots_per_day
+    return [[time_slot] + cells[slot_idx::slots_per_day] for slot_idx, time_slot in enumerate(occupancy.time_slots)]
+
+
+def plan_workbooks(manager, file_name, by="trimester"):
+    # {output file: [(sheet name, {"trimester" / "classroom" / "instructor": ...}), ...]}
+    if by == "trimester":
+        trimesters = sorted({section.trimester for section in manager.sections.values() if section.slots})
+        return {file_name: [(f"Group {trimester}", {"trimester": trimester}) for trimester in trimesters]}
+    if by == "room":
+        return {file_name: [(room.name, {"classroom": room.name}) for room in manager.classrooms]}
+    if by == "building":
+        # One workbook per building, one sheet per room
+        stem, extension = os.path.splitext(file_name)
+        workbooks = {}
+        for room in manager.classrooms:
+            workbooks.setdefault(f"{stem}-{room.building}{extension}", []).append(
+                (room.name, {"classroom": room.name}))
+        return workbooks
+    if by == "instructor":
+        return {file_name: [(name, {"instructor": name}) for name in manager.instructors]}
+    raise ValueError(f"Unknown export grouping {by!r}, expected one of {EXPORT_GROUPINGS}")
+
+
+def sheet_title(name, used):
+    # Excel-safe, unique sheet title
+    title = INVALID_SHEET_CHARACTERS.sub("_", name)[:SHEET_NAME_LIMIT]
+    base, counter = title, 1
+    while title in used:
+        counter += 1
+        suffix = f" ({counter})"
+        title = base[:SHEET_NAME_LIMIT - len(suffix)] + suffix
+    used.add(title)
+    return title
+
+
+def write_csv(file_name, sheets, header, rows_of, progress):
+    # One long table; the first column names the sheet (trimester, room or instructor)
+    with open(file_name, "w", newline="", encoding="utf-8") as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(["Sheet"] + header)
+        for name, view in sheets:
+            writer.writerows([name] + row for row in rows_of(view))
+            progress(name)
+
+
+def write_xlsx(file_name, sheets, header, rows_of, progress):
+    from openpyxl import Workbook  # Only needed for Excel output
+
+    workbook = Workbook(write_only=True)
+    used = set()
+    for name, view in sheets:
+        worksheet = workbook.create_sheet(sheet_title(name, used))
+        worksheet.append(header)
+        for row in rows_of(view):
+            worksheet.append(row)
+        progress(name)
+    workbook.save(file_name)
+
+
+@timed("export")
+def export_schedule(manager, file_name, by="trimester", progress=None):
+    # Write the schedule grids to file_name (.csv or .xlsx); returns the files written.
+    # progress(done, total, sheet name) is called after each sheet.
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension == ".csv":
+        writer = write_csv
+    elif extension in (".xlsx", ".xlsm"):
+        writer = write_xlsx
+    else:
+        raise ValueError(f"Cannot export to {file_name!r}: use a .csv or .xlsx file")
+
+    workbooks = plan_workbooks(manager, file_name, by)
+    total = sum(len(sheets) for sheets in workbooks.values())
+    done = [0]
+
+    def sheet_done(name):
+        done[0] += 1
+        if progress is not None:
+            progress(done[0], total, name)
+
+    header = ["Time"] + list(manager.days_of_week)
+    for output_file, sheets in workbooks.items():
+        writer(output_file, sheets, header, lambda view: sheet_rows(manager, **view), sheet_done)
+        logger.info("Exported %d sheets to %s", len(sheets), output_file)
+    return list(workbooks)
+
+
+def export_in_background(manager, exports, progress=None, finished=None):
+    # Run export_schedule for each (file name, grouping) in a worker thread.
+    # The worker exports a snapshot of the schedule, so the GUI can keep editing meanwhile.
+    # finished(files, error) is called from the worker thread when everything is written.
+    from storage import decode_schedule, encode_schedule
+
+    snapshot = encode_schedule(manager)
+
+    def run():
+        files = []
+        try:
+            copy = decode_schedule(snapshot)
+            for file_name, by in exports:
+                files.extend(export_schedule(copy, file_name, by, progress))
+        except Exception as e:
+            logger.exception("Export failed")
+            if finished is not None:
+                finished(files, e)
+            return
+        if finished is not None:
+            finished(files, None)
+
+    worker = threading.Thread(target=run, name="schedule-export", daemon=True)
+    worker.start()
+    return worker
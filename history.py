@@ -0,0 +1,124 @@
+from contextlib import contextmanager
+
+from instrumentation import get_logger
+
+logger = get_logger("history")
+
+
+def inverse_operations(record):
+    # Operation records that undo `record`, in the order they have to be applied
+    op = record["op"]
+    section = record["section"]
+    if op == "create":
+        return [{"op": "delete", "section": section}]
+    if op == "place":
+        return [{"op": "unplace", "section": section, "meeting": meeting} for meeting in record["meetings"]]
+    if op == "unplace":
+        return [{"op": "place", "section": section, "meetings": [record["meeting"]]}]
+    if op == "move":
+        return [{"op": "move", "section": section, "meeting": record["to"], "to": record["meeting"]}]
+    if op == "assign":
+        return [{"op": "assign", "section": section, "instructor": record["previous"],
+                 "previous": record["instructor"]}]
+    if op == "delete":
+        return [dict(record, op="create"), {"op": "place", "section": section, "meetings": record["meetings"]}]
+    raise ValueError(f"Operation {op!r} cannot be undone")
+
+
+# Undo/redo stacks built from the manager's operation records.
+# Each step is the list of records one user action produced (a drop, a deletion, or a whole solver
+# run inside batch()); undoing it replays the inverse operations, so only the slots of the sections
+# involved change. Room and instructor additions are not undoable and loading a file clears the history.
+class ScheduleHistory:
+    def __init__(self, manager, limit=200):
+        self.manager = manager
+        self.limit = limit
+        self.undo_stack = []
+        self.redo_stack = []
+        self.open_batch = None  # Records of the batch being collected, if any
+        self.applying = False  # Ignore the records our own undo/redo produce
+        self.sections_changed = False  # Whether the last undo/redo created or deleted sections
+        manager.add_listener(self.record)
+
+    def record(self, record):
+        if self.applying or record["op"] in ("room", "instructor"):
+            return
+        if record["op"] == "reset":
+            self.clear()
+            return
+        if self.open_batch is not None:
+            self.open_batch.append(record)
+            return
+        self.push([record])
+
+    def push(self, step):
+        self.undo_stack.append(step)
+        if len(self.undo_stack) > self.limit:
+            del self.undo_stack[0]
+        self.redo_stack = []
+
+    @contextmanager
+    def batch(self):
+        # Group every operation inside the block into one undo step
+        if self.open_batch is not None:
+            yield  # Nested batches join the outer one
+            return
+        self.open_batch = []
+        try:
+            yield
+        finally:
+            step, self.open_batch = self.open_batch, None
+            if step:
+                self.push(step)
+
+    def clear(self):
+        self.undo_stack = []
+        self.redo_stack = []
+
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def undo(self):
+        # Revert the last step; returns the (day, time_slot) pairs whose bookings changed
+        if not self.undo_stack:
+            return set()
+        step = self.undo_stack.pop()
+        inverse = [inverse for record in reversed(step) for inverse in inverse_operations(record)]
+        touched = self.apply(inverse)
+        self.redo_stack.append(step)
+        logger.debug("Undid %d operations", len(step))
+        return touched
+
+    def redo(self):
+        if not self.redo_stack:
+            return set()
+        step = self.redo_stack.pop()
+        touched = self.apply(step)
+        self.undo_stack.append(step)
+        logger.debug("Redid %d operations", len(step))
+        return touched
+
+    def apply(self, records):
+        # Apply records through the manager (listeners such as the journal still see them) and
+        # collect the slots covered by the affected sections before and after
+        keys = {tuple(record["section"]) for record in records}
+        self.sections_changed = any(record["op"] in ("create", "delete") for record in records)
+        touched = self.covered_slots(keys)
+        self.applying = True
+        try:
+            for record in records:
+                self.manager.apply_operation(record)
+        finally:
+            self.applying = False
+        return touched | self.covered_slots(keys)
+
+    def covered_slots(self, keys):
+        slots = set()
+        for key in keys:
+            section = self.manager.sections_by_key.get(key)
+            if section is not None:
+                slots |= section.slots
+        return slots
@@ -0,0 +1,263 @@
+import csv
+import os
+
+from instrumentation import get_logger, timed
+from timegrid import DEFAULT_CALENDAR
+
+logger = get_logger("importer")
+
+# Bulk import of room inventories and course offerings from CSV or Excel sheets.
+# Every row is validated before anything reaches the manager, and all problems are reported at
+# once. Header names are matched case-insensitively, with a few common aliases.
+
+ROOM_COLUMNS = {
+    "name": ("name", "room", "classroom", "salon", "aula"),
+    "capacity": ("capacity", "seats", "capacidad"),
+    "building": ("building", "edificio"),
+    "features": ("features", "equipment", "caracteristicas"),
+}
+OFFERING_COLUMNS = {
+    "trimester": ("trimester", "group", "trimestre"),
+    "course": ("course", "class", "materia", "curso"),
+    "sections": ("sections", "groups", "secciones"),
+    "students": ("students", "enrollment", "expected enrollment", "alumnos"),
+    "meetings": ("meetings", "meetings per week", "sesiones"),
+    "duration": ("duration", "minutes", "duracion"),  # Minutes per meeting, a multiple of the slot length
+    "slots": ("slots",),  # Or time slots per meeting, as older sheets gave it
+    "instructor": ("instructor", "teacher", "professor", "profesor"),
+}
+INSTRUCTOR_COLUMNS = {
+    "name": ("name", "instructor", "teacher", "professor", "profesor"),
+    "day": ("day", "dia"),
+    "first": ("from", "start", "first", "desde"),
+    "last": ("to", "end", "last", "hasta"),
+}
+FEATURE_SEPARATORS = (";", ",", "|")
+
+
+# Raised with every problem found in a sheet; nothing is imported when it is raised
+class ImportValidationError(ValueError):
+    def __init__(self, file_name, problems):
+        self.file_name = file_name
+        self.problems = problems  # [(row number, message)]
+        shown = "\n".join(f"row {row}: {message}" for row, message in problems[:20])
+        more = f"\n... and {len(problems) - 20} more" if len(problems) > 20 else ""
+        super().__init__(f"{file_name}: {len(problems)} problems\n{shown}{more}")
+
+
+def read_rows(file_name):
+    # (header, [(row number, [cell, ...]), ...]) from a .csv or the first sheet of a .xlsx
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension == ".csv":
+        with open(file_name, newline="", encoding="utf-8-sig") as infile:
+            reader = csv.reader(infile)
+            header = next(reader, [])
+            rows = list(enumerate(reader, start=2))
+    elif extension in (".xlsx", ".xlsm"):
+        from openpyxl import load_workbook  # Only needed for Excel input
+
+        workbook = load_workbook(file_name, read_only=True, data_only=True)
+        try:
+            values = workbook.worksheets[0].iter_rows(values_only=True)
+            header = next(values, ())
+            rows = [(number, ["" if cell is None else cell for cell in row])
+                    for number, row in enumerate(values, start=2)]
+        finally:
+            workbook.close()
+    else:
+        raise ValueError(f"Cannot import {file_name!r}: use a .csv or .xlsx file")
+    return [str(cell or "").strip() for cell in header], rows
+
+
+def column_positions(file_name, header, columns, required):
+    # {field: column position} for the fields found in the header
+    aliases = {alias: field for field, names in columns.items() for alias in names}
+    positions = {}
+    for position, title in enumerate(header):
+        field = aliases.get(title.lower())
+        if field is not None and field not in positions:
+            positions[field] = position
+    missing = [field for field in required if field not in positions]
+    if missing:
+        raise ImportValidationError(file_name, [(1, f"missing column(s): {', '.join(missing)}")])
+    return positions
+
+
+def cell_text(row, position):
+    if position is None or position >= len(row):
+        return ""
+    value = row[position]
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # Excel stores every number as a float
+    return str(value).strip()
+
+
+def positive_int(text, field, problems, number, default=None):
+    if not text and default is not None:
+        return default
+    try:
+        value = int(text)
+    except ValueError:
+        problems.append((number, f"{field} must be a whole number, got {text!r}"))
+        return None
+    if value <= 0:
+        problems.append((number, f"{field} must be positive, got {value}"))
+        return None
+    return value
+
+
+def split_features(text):
+    for separator in FEATURE_SEPARATORS:
+        if separator in text:
+            return tuple(feature.strip() for feature in text.split(separator) if feature.strip())
+    return (text,) if text else ()
+
+
+def parse_rooms(file_name, existing=()):
+    # [(name, capacity, building or None, features)] from a room inventory sheet
+    header, rows = read_rows(file_name)
+    positions = column_positions(file_name, header, ROOM_COLUMNS, ("name", "capacity"))
+    building_at, features_at = positions.get("building"), positions.get("features")
+    seen = set(existing)
+    rooms = []
+    problems = []
+    for number, row in rows:
+        name = cell_text(row, positions["name"])
+        if not name and not any(cell_text(row, position) for position in positions.values()):
+            continue  # Blank line
+        if not name:
+            problems.append((number, "room name is empty"))
+            continue
+        if name in seen:
+            problems.append((number, f"room {name!r} is listed twice or already exists"))
+            continue
+        seen.add(name)
+        capacity = positive_int(cell_text(row, positions["capacity"]), "capacity", problems, number)
+        if capacity is None:
+            continue
+        rooms.append((name, capacity, cell_text(row, building_at) or None, split_features(cell_text(row, features_at))))
+    if problems:
+        raise ImportValidationError(file_name, problems)
+    return rooms
+
+
+def parse_offerings(file_name, calendar=DEFAULT_CALENDAR):
+    # {trimester: [(course, sections, students, meetings, duration, instructor), ...]} from an offerings
+    # sheet; the sheet gives durations in minutes, the offerings count them in slots of the calendar
+    days, slots, slot_minutes = len(calendar.days), len(calendar.time_slots), calendar.slot_minutes
+    header, rows = read_rows(file_name)
+    positions = column_positions(file_name, header, OFFERING_COLUMNS, ("trimester", "course", "students"))
+    offerings = {}
+    seen = set()
+    problems = []
+    for number, row in rows:
+        texts = {field: cell_text(row, position) for field, position in positions.items()}
+        if not any(texts.values()):
+            continue  # Blank line
+        trimester = positive_int(texts["trimester"], "trimester", problems, number)
+        course = texts["course"]
+        if not course:
+            problems.append((number, "course is empty"))
+        sections = positive_int(texts.get("sections", ""), "sections", problems, number, default=1)
+        students = positive_int(texts["students"], "students", problems, number)
+        meetings = positive_int(texts.get("meetings", ""), "meetings", problems, number, default=1)
+        if texts.get("duration"):
+            minutes = positive_int(texts["duration"], "duration", problems, number)
+            duration = None
+            if minutes is not None and minutes % slot_minutes:
+                problems.append((number, f"duration must be a multiple of {slot_minutes} minutes, got {minutes}"))
+            elif minutes is not None:
+                duration = minutes // slot_minutes
+        else:
+            duration = positive_int(texts.get("slots", ""), "slots", problems, number, default=1)
+        if meetings is not None and meetings > days:
+            problems.append((number, f"meetings must be at most {days} (one per day), got {meetings}"))
+            continue
+        if duration is not None and duration > slots:
+            problems.append((number, f"duration must be at most {slots * slot_minutes} minutes (one day), "
+                                     f"got {duration * slot_minutes}"))
+            continue
+        if None in (trimester, sections, students, meetings, duration) or not course:
+            continue
+        instructor = texts.get("instructor") or None
+        if (trimester, course, instructor) in seen:
+            problems.append((number, f"{course!r} is listed twice for trimester {trimester}"))
+            continue
+        seen.add((trimester, course, instructor))
+        offerings.setdefault(trimester, []).append((course, sections, students, meetings, duration, instructor))
+    if problems:
+        raise ImportValidationError(file_name, problems)
+    return offerings
+
+
+def parse_instructors(file_name, calendar=DEFAULT_CALENDAR, existing=()):
+    # {name: [(day, first time_slot, last time_slot), ...]}; one row per availability window and a
+    # row without a day for instructors available all week. Times may be "08:00 AM", "8:00" or "13:30".
+    header, rows = read_rows(file_name)
+    positions = column_positions(file_name, header, INSTRUCTOR_COLUMNS, ("name",))
+    days = {day.lower(): day for day in calendar.days}
+    instructors = {}
+    problems = []
+    for number, row in rows:
+        texts = {field: cell_text(row, positions.get(field)) for field in INSTRUCTOR_COLUMNS}
+        if not any(texts.values()):
+            continue  # Blank line
+        name = texts["name"]
+        if not name:
+            problems.append((number, "instructor name is empty"))
+            continue
+        if name in existing:
+            problems.append((number, f"instructor {name!r} already exists"))
+            continue
+        windows = instructors.setdefault(name, [])
+        if not texts["day"]:
+            continue
+        day = days.get(texts["day"].lower())
+        if day is None:
+            problems.append((number, f"unknown day {texts['day']!r}"))
+            continue
+        try:
+            first, last = calendar.slot_of(texts["first"]), calendar.slot_of(texts["last"])
+        except KeyError:
+            problems.append((number, f"window {texts['first']!r}-{texts['last']!r} is not made of schedule time slots"))
+            continue
+        if last < first:
+            problems.append((number, f"window {texts['first']}-{texts['last']} ends before it starts"))
+        else:
+            windows.append((day, calendar.time_slots[first], calendar.time_slots[last]))
+    if problems:
+        raise ImportValidationError(file_name, problems)
+    return instructors
+
+
+@timed("import")
+def import_instructors(manager, file_name):
+    # Add the instructors of the sheet with their availability windows; returns the new Instructors
+    instructors = parse_instructors(file_name, manager.calendar, manager.instructors)
+    added = [manager.add_instructor(name, windows) for name, windows in instructors.items()]
+    logger.info("Imported %d instructors from %s", len(added), file_name)
+    return added
+
+
+@timed("import")
+def import_rooms(manager, file_name):
+    # Add every room of the sheet to the manager; returns the new Classrooms
+    rooms = parse_rooms(file_name, existing=manager.classrooms_by_name)
+    added = [manager.add_classroom(name, capacity, building, features)
+             for name, capacity, building, features in rooms]
+    logger.info("Imported %d rooms from %s", len(added), file_name)
+    return added
+
+
+@timed("import")
+def import_offerings(manager, file_name):
+    # Replace the offerings of the trimesters in the sheet; their courses feed the class pools
+    offerings = parse_offerings(file_name, manager.calendar)
+    # Instructors named in the sheet but not known yet are added, available all week
+    for courses in offerings.values():
+        for offering in courses:
+            if offering[5] is not None and offering[5] not in manager.instructors:
+                manager.add_instructor(offering[5])
+    manager.set_offerings({**manager.offerings, **offerings})
+    logger.info("Imported %d offerings from %s", sum(len(courses) for courses in offerings.values()), file_name)
+    return offerings
@@ -0,0 +1,63 @@
+import logging
+import os
+import time
+from functools import wraps
+
+# Logging and optional per-operation timing.
+# Set HORARIOS_LOG_LEVEL=DEBUG to see every scheduling action and HORARIOS_TIMING=1 (or call
+# enable_timing()) to record how long drops, deletions, renders and file I/O take.
+
+timing_enabled = os.environ.get("HORARIOS_TIMING", "") not in ("", "0")
+timings = {}  # Operation name -> [calls, total seconds, slowest call in seconds]
+
+
+def get_logger(name):
+    return logging.getLogger(f"horarios.{name}")
+
+
+logger = get_logger("timing")
+
+
+def configure_logging(level=None):
+    level = level or os.environ.get("HORARIOS_LOG_LEVEL", "WARNING")
+    logging.basicConfig(level=level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+
+def enable_timing(enabled=True):
+    global timing_enabled
+    timing_enabled = enabled
+
+
+def timed(operation):
+    # Decorator recording the duration of each call under `operation` while timing is enabled.
+    # When timing is off the only cost is one global flag check per call.
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not timing_enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                stats = timings.setdefault(operation, [0, 0.0, 0.0])
+                stats[0] += 1
+                stats[1] += elapsed
+                stats[2] = max(stats[2], elapsed)
+                logger.debug("%s took %.3f ms", operation, elapsed * 1000)
+        return wrapper
+    return decorator
+
+
+def timing_report():
+    # [(operation, calls, mean ms, max ms)] sorted by total time spent
+    rows = [(operation, calls, total / calls * 1000, slowest * 1000)
+            for operation, (calls, total, slowest) in timings.items()]
+    rows.sort(key=lambda row: row[1] * row[2], reverse=True)
+    return rows
+
+
+def log_timing_report():
+    for operation, calls, mean_ms, max_ms in timing_report():
+        logger.info("%-20s %6d calls  mean %8.3f ms  max %8.3f ms", operation, calls, mean_ms, max_ms)
@@ -0,0 +1,114 @@
+import json
+import os
+from contextlib import contextmanager
+
+from instrumentation import get_logger
+from storage import load_compact, save_compact
+
+logger = get_logger("journal")
+
+
+# Write-ahead journal of ScheduleManager operations.
+# Every place/move/unplace/create/delete is appended to the journal as one JSON line as soon as it
+# happens, and every `compact_every` records the whole state is written to a compact snapshot and
+# the journal starts over. Startup loads the snapshot and replays only the records after it, so a
+# crash loses at most the record being written.
+class ScheduleJournal:
+    def __init__(self, manager, journal_file="schedule.journal", snapshot_file="schedule.hbs",
+                 compact_every=200, fsync=True):
+        self.manager = manager
+        self.journal_file = journal_file
+        self.snapshot_file = snapshot_file
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.outfile = None
+        self.pending = 0  # Records appended since the last snapshot
+        self.deferring = False  # Inside deferred(): write records, sync once at the end
+
+    def open(self):
+        # Restore snapshot + journal tail into the manager, then start recording
+        replayed = self.replay()
+        self.outfile = open(self.journal_file, "a", encoding="utf-8")
+        self.pending = replayed
+        self.manager.add_listener(self.record)
+        return replayed
+
+    def replay(self):
+        if os.path.exists(self.snapshot_file):
+            load_compact(self.snapshot_file, self.manager)
+
+        replayed = 0
+        if not os.path.exists(self.journal_file):
+            return replayed
+        valid_size = 0
+        with open(self.journal_file, "rb") as infile:
+            for line in infile:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn last line from a crash mid-write; everything before it is intact
+                    logger.warning("Ignoring unreadable journal line: %r", line[:80])
+                    break
+                valid_size += len(line)
+                if record["seq"] <= self.manager.sequence:
+                    continue  # Already part of the snapshot
+                self.manager.apply_operation(record)
+                self.manager.sequence = record["seq"]
+                replayed += 1
+        if valid_size != os.path.getsize(self.journal_file):
+            # Drop the torn tail so new records start on a clean line
+            with open(self.journal_file, "r+b") as journal:
+                journal.truncate(valid_size)
+        logger.info("Replayed %d journal records after the snapshot", replayed)
+        return replayed
+
+    def record(self, record):
+        if record["op"] == "reset":
+            # The whole state was replaced (e.g. a file was loaded): snapshot it right away
+            self.compact()
+            return
+        self.outfile.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self.pending += 1
+        if self.deferring:
+            return
+        self.sync()
+
+    def sync(self):
+        self.outfile.flush()
+        if self.fsync:
+            os.fsync(self.outfile.fileno())
+        if self.pending >= self.compact_every:
+            self.compact()
+
+    @contextmanager
+    def deferred(self):
+        # For bulk changes (imports, solver runs): one sync and at most one compaction at the end
+        if self.deferring or self.outfile is None:
+            yield
+            return
+        self.deferring = True
+        try:
+            yield
+        finally:
+            self.deferring = False
+            self.sync()
+
+    def compact(self):
+        # Write the snapshot first (atomically), then truncate the journal. If we crash in between,
+        # the records left in the journal are skipped on replay because the snapshot carries their seq.
+        temporary_file = self.snapshot_file + ".tmp"
+        save_compact(self.manager, temporary_file)
+        os.replace(temporary_file, self.snapshot_file)
+        if self.outfile is not None:
+            self.outfile.truncate(0)
+            self.outfile.seek(0)
+        self.pending = 0
+        logger.debug("Compacted journal into %s at operation %d", self.snapshot_file, self.manager.sequence)
+
+    def close(self):
+        if self.outfile is None:
+            return
+        self.manager.remove_listener(self.record)
+        self.compact()
+        self.outfile.close()
+        self.outfile = None
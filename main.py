@@ -1,113 +1,56 @@
+import argparse
+import os
+import queue
 import tkinter as tk
-from tkinter import messagebox, simpledialog, Toplevel
-import json
-from datetime import datetime, timedelta
-import re
-import pandas as pd
-# Class to represent a classroom
-class Classroom:
-    def __init__(self, name, capacity):
-        self.name = name
-        self.capacity = capacity
-        self.schedule = {day: {} for day in ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]}
-
-# Class to manage schedules
-class ScheduleManager:
-    def __init__(self):
-        self.classrooms = []
-        self.groups = {}  # Track groups by their number
-        self.predefined_classes = {
-            1: ["Cálculo Diferencial", "Mecánica Clásica", "Ecología", "Química Universitaria", "Optativa Inter",],
-            2: ["Cálculo Integral", "Lab de Mediciones y Mecánica", "Ondas Calor Fluidos", "Probabilidad Estadística",
-                "Álgebra Lineal", "Optativa Inter"],
-            3: ["Cálculo de Varias Variables", "Optativa Inter","Electricidad Magnetismo", "Laboratorio Física",
-                "Circuitos Eléctricos 1", "Fundamentos de Programación", "Fundamentos Diseño Lógico"],
-            4: ["Ecuaciones Diferenciales", "Optativa Inter","Campos Electromagnéticos", "Dispositivos Electrónicos",
-                "Circuitos Eléctricos 2", "Métodos Numéricos"],
-            5: ["Matemáticas para ICT", "Optativa Inter","Acondicionamiento de Señales Eléctricas", "Programación Orientada a Objetos",
-                "Diseño Lógico Avanzado"],
-            6: ["Señales Sistemas", "Administración de Organizaciones", "Optativa Inter","Comunicaciones Analógicas",
-                "Algoritmos Estructuras de Datos", "Sistemas Basados en Microcontroladores"],
-            7: ["Control Analógico", "Bases de Datos", "Optativa Inter","Sistemas Operativos"],
-            8: ["Comunicaciones Digitales", "Optativa Inter","Óptica Física Moderna", "Fundamentos de Admin de Proyectos de SW",
-                "Redes de Comunicación"],
-            9: ["Procesamiento Digital de Señales", "Optativa Inter","Teoría de Información Codificación", "Física Electrónica",
-                "Formulación de proyecto fundamento económico", "Optativa Disciplinar"],
-            10: ["Control Digital", "Laboratorio de Control", "Optativa Inter","Factibilidad tec económica financiera", "Optativa Disciplinar"],
-            11: ["Emprendimiento social""Optativa Inter","Optativa Disciplinar"],
-            12: ["Optativa Inter", "Optativa Disciplinar"]  # Group 12 has no classes (thesis work)
-        }
-        self.current_group = 1
-        self.group_tracker = {}  # Track the group number for each class
-        self.saved_schedule = {}  # To save the schedules
-        self.class_pools = {}  # To save created classes per group
-        self.current_classroom_idx = 0  # Track which classroom is being viewed
-
-        # Define trimester colors
-        self.trimester_colors = {
-            1: "#FFCCCC", 2: "#FF9999", 3: "#FF6666", 4: "#FF3333", 5: "#FF0000",
-            6: "#CCFFCC", 7: "#99FF99", 8: "#66FF66", 9: "#33FF33", 10: "#00FF00",
-            11: "#CCCCFF", 12: "#9999FF"
-        }
-
-    def add_classroom(self, name, capacity):
-        self.classrooms.append(Classroom(name, capacity))
-
-    def get_available_classrooms(self, required_capacity):
-        return [room.name for room in self.classrooms if room.capacity >= required_capacity]
-
-    def is_time_slot_free(self, room, day, time_slot):
-        return time_slot not in room.schedule[day]
-
-    def assign_class_to_time_slot(self, room, day, time_slot, class_info):
-        room.schedule[day][time_slot] = class_info
-
-    def save_schedule(self, file_name="schedule.json"):
-        data = {
-            "classrooms": [
-                {"name": room.name, "capacity": room.capacity, "schedule": room.schedule}
-                for room in self.classrooms
-            ],
-            "saved_schedule": self.saved_schedule,
-            "class_pools": self.class_pools
-        }
-        with open(file_name, 'w') as outfile:
-            json.dump(data, outfile, indent=4)
-
-    def load_schedule(self, file_name="schedule.json"):
-        with open(file_name, 'r') as infile:
-            data = json.load(infile)
-        self.classrooms = []
-        for room_data in data["classrooms"]:
-            room = Classroom(room_data["name"], room_data["capacity"])
-            room.schedule = room_data["schedule"]
-            self.classrooms.append(room)
-        self.saved_schedule = data["saved_schedule"]
-        self.class_pools = data["class_pools"]
+from contextlib import ExitStack, contextmanager
+from tkinter import filedialog, messagebox, simpledialog, Toplevel
+from scheduler import DEFAULT_CLASSROOMS, ScheduleManager, SchedulingError
+from solver import offerings_from_predefined, solve_timetable
+from instrumentation import configure_logging, get_logger, log_timing_report, timed
+from export import export_in_background
+from history import ScheduleHistory
+from importer import import_instructors, import_offerings, import_rooms
+from journal import ScheduleJournal
+from timegrid import Calendar
+
+logger = get_logger("gui")
+
+FIND_SLOT_LIMIT = 500  # Options listed by the Find a Slot panel
+SERVER_POLL_MS = 50  # How often local edits are sent to the schedule server and its updates shown
+MAX_MEETING_MINUTES = 180  # Longest meeting offered in the duration menus
+BLOCKED_COLOR = "gray70"  # Cells of lunch breaks and other periods no class can use
 
 # Class to manage the GUI and interaction
 class DragDropInterface(tk.Frame):
-    def __init__(self, master=None, manager=None):
+    def __init__(self, master=None, manager=None, journal=None, client=None, database=None):
         super().__init__(master)
         self.manager = manager
-        self.view_mode = 'group'  # Can be 'classroom' or 'group'
-        self.grid_widgets = []  # Track the grid widgets
+        self.journal = journal  # ScheduleJournal recording the changes, if any
+        self.database = database  # database.ScheduleDatabase mirroring the changes, if any
+        self.client = client  # server.ScheduleClient when the schedule lives on a schedule server
+        self.view_mode = 'group'  # Can be 'classroom', 'group' or 'instructor'
+        self.current_instructor = None  # Instructor shown in the instructor view
+        self.grid_cells = {}  # (time_slot, day) -> slot label, created once per calendar
+        self.cell_texts = {}  # (time_slot, day) -> text currently shown in the cell
+        self.grid_widgets = []  # Headers and cells of the grid, replaced when the calendar changes
+        self.calendar = None  # Calendar the grid was built for
         self.class_blocks = []  # Store created class blocks
         self.class_pool_widgets = []  # Widgets in the class pool (right sidebar)
-        self.dragged_class_info = None  # Track class being dragged
+        self.dragged_section_id = None  # Track section being dragged
         self.drag_data = {"x": 0, "y": 0}  # Track drag data
+        self.history = ScheduleHistory(manager)  # Undo/redo of drops, deletions and solver runs
+        self.export_worker = None  # Background export thread, if one is running
+        self.export_events = queue.Queue()  # Progress and completion events from the export thread
         self.pack(fill=tk.BOTH, expand=True)
         self.create_widgets()
+        if self.client is not None:
+            self.after(SERVER_POLL_MS, self.poll_server)
 
     def create_widgets(self):
         # Buttons for switching views
         self.group_buttons_frame = tk.Frame(self)
         self.group_buttons_frame.pack(side=tk.TOP, padx=10, pady=10)
 
-        # Create a button for each group
-        for group_num in self.manager.predefined_classes.keys():
-            tk.Button(self.group_buttons_frame, text=f"Tri {group_num}",
-                      command=lambda g=group_num: self.switch_to_group(g)).pack(side=tk.LEFT, padx=5)
 
         # Add a Load Button to load saved schedule manually
         load_button = tk.Button(self, text="Load Schedule", command=self.load_schedule)
@@ -131,15 +74,42 @@ class DragDropInterface(tk.Frame):
         # Add the Export to Excel button to the backup frame
         export_button = tk.Button(backup_frame, text="Export to Excel", command=self.export_schedule_to_excel)
         export_button.pack(side=tk.TOP, padx=10, pady=5)
+        self.export_status = tk.Label(backup_frame, text="", font=("Arial", 8))
+        self.export_status.pack(side=tk.TOP, padx=10)
+
+        # Add the Auto Schedule button to place every predefined class automatically
+        auto_button = tk.Button(backup_frame, text="Auto Schedule", command=self.auto_schedule)
+        auto_button.pack(side=tk.TOP, padx=10, pady=5)
+
+        # Where a new section would fit: every free room, day and start time for a headcount
+        find_slot_button = tk.Button(backup_frame, text="Find a Slot", command=self.find_slot)
+        find_slot_button.pack(side=tk.TOP, padx=10, pady=5)
+
+        # Bulk import of room inventories and course offerings from CSV/xlsx
+        import_rooms_button = tk.Button(backup_frame, text="Import Rooms", command=self.import_rooms)
+        import_rooms_button.pack(side=tk.TOP, padx=10, pady=5)
+        import_offerings_button = tk.Button(backup_frame, text="Import Offerings", command=self.import_offerings)
+        import_offerings_button.pack(side=tk.TOP, padx=10, pady=5)
+        import_instructors_button = tk.Button(backup_frame, text="Import Instructors", command=self.import_instructors)
+        import_instructors_button.pack(side=tk.TOP, padx=10, pady=5)
+
+        # Undo/redo buttons (also Ctrl+Z / Ctrl+Y)
+        undo_button = tk.Button(backup_frame, text="Undo", command=self.undo)
+        undo_button.pack(side=tk.TOP, padx=10, pady=5)
+        redo_button = tk.Button(backup_frame, text="Redo", command=self.redo)
+        redo_button.pack(side=tk.TOP, padx=10, pady=5)
+        self.master.bind("<Control-z>", lambda e: self.undo())
+        self.master.bind("<Control-y>", lambda e: self.redo())
 
         # Buttons for classrooms
         self.classroom_buttons_frame = tk.Frame(self)
         self.classroom_buttons_frame.pack(side=tk.TOP, padx=10, pady=10)
 
-        # Create a button for each classroom
-        for idx, classroom in enumerate(self.manager.classrooms):
-            tk.Button(self.classroom_buttons_frame, text=classroom.name,
-                      command=lambda i=idx: self.switch_to_classroom(i)).pack(side=tk.LEFT, padx=5)
+        # Buttons for instructors
+        self.instructor_buttons_frame = tk.Frame(self)
+        self.instructor_buttons_frame.pack(side=tk.TOP, padx=10, pady=5)
+
+        self.build_view_buttons()
 
         # Scrollable frame for schedule grid
         self.grid_canvas = tk.Canvas(self)
@@ -151,6 +121,10 @@ class DragDropInterface(tk.Frame):
         self.grid_canvas.pack(side="left", fill="both", expand=True)
         self.grid_canvas.create_window((0, 0), window=self.grid_frame, anchor="nw")
 
+        # Title of the schedule currently displayed (group or classroom)
+        self.group_label = tk.Label(self.grid_frame, text=f"Group {self.manager.current_group}", font=('Arial', 14))
+        self.group_label.grid(row=0, column=0, columnspan=3, padx=5, pady=5)
+
         # Configure scrolling
         self.grid_frame.bind("<Configure>",
                              lambda e: self.grid_canvas.configure(scrollregion=self.grid_canvas.bbox("all")))
@@ -165,11 +139,39 @@ class DragDropInterface(tk.Frame):
 
         self.update_class_list()
 
-        # Time slots for Monday to Friday
-        self.time_slots = self.generate_time_slots()
-        self.days_of_week = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+        self.update_schedule_grid()  # Builds the grid for the manager's calendar
 
-        self.update_schedule_grid()
+    def build_view_buttons(self):
+        # (Re)create the trimester, classroom and instructor buttons, e.g. after an import
+        for frame in (self.group_buttons_frame, self.classroom_buttons_frame, self.instructor_buttons_frame):
+            for widget in frame.winfo_children():
+                widget.destroy()
+
+        # Create a button for each group
+        for group_num in self.manager.predefined_classes.keys():
+            tk.Button(self.group_buttons_frame, text=f"Tri {group_num}",
+                      command=lambda g=group_num: self.switch_to_group(g)).pack(side=tk.LEFT, padx=5)
+
+        # Create a button for each classroom
+        for idx, classroom in enumerate(self.manager.classrooms):
+            tk.Button(self.classroom_buttons_frame, text=classroom.name,
+                      command=lambda i=idx: self.switch_to_classroom(i)).pack(side=tk.LEFT, padx=5)
+
+        # Create a button for each instructor
+        for name in self.manager.instructors:
+            tk.Button(self.instructor_buttons_frame, text=name,
+                      command=lambda n=name: self.switch_to_instructor(n)).pack(side=tk.LEFT, padx=5)
+
+    @contextmanager
+    def bulk_change(self):
+        # One undo step, one journal sync and one database transaction for everything done inside the block
+        with ExitStack() as stack:
+            stack.enter_context(self.history.batch())
+            if self.journal is not None:
+                stack.enter_context(self.journal.deferred())
+            if self.database is not None:
+                stack.enter_context(self.database.deferred())
+            yield
 
     def _on_mousewheel(self, event):
         # For Windows and Linux systems
@@ -183,141 +185,257 @@ class DragDropInterface(tk.Frame):
         #     self.grid_canvas.yview_scroll(-1, "units")
 
     def export_schedule_to_excel(self):
-        # Export group schedules
-        group_writer = pd.ExcelWriter('HorarioXTri.xlsx', engine='openpyxl')
-
-        for group_key, group_schedule in self.manager.saved_schedule.items():
-            if 'Group' in group_key:
-                group_df = pd.DataFrame(columns=self.days_of_week, index=self.time_slots)
-                for day, time_slots in group_schedule.items():
-                    for time_slot, class_info in time_slots.items():
-                        group_df.at[time_slot, day] = class_info
-                group_df.to_excel(group_writer, sheet_name=group_key)
-
-        group_writer.close()  # Corrected from save() to close()
-
-        # Export room schedules
-        room_writer = pd.ExcelWriter('HorarioXSalon.xlsx', engine='openpyxl')
+        # Export the trimester and room workbooks in a worker thread; progress shows under the button
+        if self.export_worker is not None and self.export_worker.is_alive():
+            messagebox.showinfo("Export", "An export is already running.")
+            return
+        self.export_status.config(text="Exporting...")
+        exports = [("HorarioXTri.xlsx", "trimester"), ("HorarioXSalon.xlsx", "room")]
+        if self.manager.instructors:
+            exports.append(("HorarioXProfesor.xlsx", "instructor"))
+        self.export_worker = export_in_background(
+            self.manager, exports,
+            progress=lambda done, total, sheet: self.export_events.put(("progress", done, total, sheet)),
+            finished=lambda files, error: self.export_events.put(("finished", files, error)))
+        self.after(100, self.poll_export)
+
+    def poll_export(self):
+        # Tk widgets may only be touched from the main thread, so the worker reports through a queue
+        while not self.export_events.empty():
+            event = self.export_events.get()
+            if event[0] == "progress":
+                _, done, total, sheet = event
+                self.export_status.config(text=f"Exporting {done}/{total}: {sheet}")
+            else:
+                _, files, error = event
+                self.export_status.config(text="")
+                if error is not None:
+                    messagebox.showerror("Export Failed", f"An error occurred while exporting: {error}")
+                else:
+                    messagebox.showinfo("Export Successful", "Schedules have been exported to " + ", ".join(files))
+                return
+        self.after(100, self.poll_export)
+
+    def poll_server(self):
+        # Send our edits and show the other editors' changes as they arrive
+        for event in self.client.poll():
+            if event[0] == "changed":
+                ops = {record["op"] for record in event[1]}
+                if ops & {"room", "instructor"}:
+                    self.build_view_buttons()
+                if ops & {"create", "delete"}:
+                    self.update_class_list()
+                self.update_schedule_grid()
+            elif event[0] == "reloaded":
+                # Refused edits are gone from the fresh copy, so the undo steps no longer apply
+                self.history.clear()
+                self.refresh_after_load()
+            elif event[0] == "rejected":
+                messagebox.showwarning("Change Refused", f"Your last change was undone: {event[1]}")
+            else:
+                messagebox.showerror("Server", "The connection to the schedule server was lost.")
+                return
+        self.after(SERVER_POLL_MS, self.poll_server)
+
+    def files_locked(self):
+        # Loading a file would replace everyone's schedule, so it is not possible as a server client
+        if self.client is None:
+            return False
+        messagebox.showinfo("Server", "Files cannot be loaded while connected to a schedule server.")
+        return True
+
+    def auto_schedule(self):
+        # Imported offerings carry their own sections and enrollments; otherwise ask for one headcount
+        offerings = self.manager.offerings
+        if not offerings:
+            students = simpledialog.askinteger("Number of Students", "Students per section:")
+            if not students or students <= 0:
+                messagebox.showerror("Invalid Input", "Please enter a valid number of students.")
+                return
+            meetings = simpledialog.askinteger("Meetings", "Weekly meetings per section:", initialvalue=1,
+                                               minvalue=1, maxvalue=len(self.days_of_week))
+            if not meetings:
+                return
+            # One section of every predefined class
+            offerings = offerings_from_predefined(self.manager, students, meetings=meetings)
+
+        # Placed without conflicts, undone as a single step
+        try:
+            with self.bulk_change():
+                result = solve_timetable(self.manager, offerings)
+        except SchedulingError as e:
+            messagebox.showerror("Auto Schedule", str(e))
+            return
 
-        for room in self.manager.classrooms:
-            room_df = pd.DataFrame(columns=self.days_of_week, index=self.time_slots)
-            for day, time_slots in room.schedule.items():
-                for time_slot, class_info in time_slots.items():
-                    room_df.at[time_slot, day] = class_info
-            room_df.to_excel(room_writer, sheet_name=room.name)
+        self.update_class_list()
+        self.update_schedule_grid()
+        message = f"{len(result.assignments)} sections were placed."
+        if result.unplaced:
+            message += f"\n{len(result.unplaced)} could not be placed:\n" + "\n".join(
+                f"{request.trimester}T: {request.course}" for request in result.unplaced[:20])
+        messagebox.showinfo("Auto Schedule", message)
+
+    def find_slot(self):
+        # Panel listing every clash-free (room, day, start) for a section, best-fitting rooms first.
+        # Double-clicking a result shows that room's schedule.
+        top = Toplevel(self)
+        top.title("Find a Slot")
+        form = tk.Frame(top)
+        form.pack(padx=10, pady=10)
+
+        tk.Label(form, text="Students").grid(row=0, column=0, sticky="w")
+        students_variable = tk.StringVar(top, value="30")
+        tk.Entry(form, textvariable=students_variable, width=8).grid(row=0, column=1, sticky="w")
+
+        tk.Label(form, text="Duration (minutes)").grid(row=1, column=0, sticky="w")
+        durations = self.duration_choices()
+        duration_variable = tk.StringVar(top, value=durations[min(1, len(durations) - 1)])
+        tk.OptionMenu(form, duration_variable, *durations).grid(row=1, column=1, sticky="w")
+
+        tk.Label(form, text="Trimester").grid(row=2, column=0, sticky="w")
+        trimester_variable = tk.StringVar(top, value=str(self.manager.current_group))
+        tk.Spinbox(form, from_=1, to=12, textvariable=trimester_variable, width=6).grid(row=2, column=1, sticky="w")
+
+        tk.Label(form, text="Instructor").grid(row=3, column=0, sticky="w")
+        instructor_choices = ["(none)"] + list(self.manager.instructors)
+        instructor_variable = tk.StringVar(top, value=instructor_choices[0])
+        tk.OptionMenu(form, instructor_variable, *instructor_choices).grid(row=3, column=1, sticky="w")
+
+        summary = tk.Label(top, text="")
+        summary.pack(padx=10)
+        results_frame = tk.Frame(top)
+        results_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        results = tk.Listbox(results_frame, width=50, height=20)
+        scrollbar = tk.Scrollbar(results_frame, orient="vertical", command=results.yview)
+        results.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        results.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        placements = []
+
+        def search():
+            try:
+                students = int(students_variable.get())
+                trimester = int(trimester_variable.get())
+            except ValueError:
+                messagebox.showerror("Invalid Input", "Students and trimester must be whole numbers.", parent=top)
+                return
+            duration = int(duration_variable.get()) // self.calendar.slot_minutes
+            instructor = instructor_variable.get() if instructor_variable.get() != "(none)" else None
+            placements[:] = self.manager.find_placements(students, duration, trimester, instructor)
+
+            # The listbox only shows the best options; the count covers all of them
+            results.delete(0, tk.END)
+            for room, day, time_slot in placements[:FIND_SLOT_LIMIT]:
+                capacity = self.manager.get_classroom(room).capacity
+                results.insert(tk.END, f"{room} ({capacity} seats)  {day} {time_slot}")
+            rooms = len({room for room, _, _ in placements})
+            summary.config(text=f"{len(placements)} options in {rooms} rooms")
+
+        def show_room(event):
+            selection = results.curselection()
+            if not selection:
+                return
+            room = placements[selection[0]][0]
+            self.switch_to_classroom(next(idx for idx, classroom in enumerate(self.manager.classrooms)
+                                          if classroom.name == room))
+
+        results.bind("<Double-Button-1>", show_room)
+        tk.Button(form, text="Search", command=search).grid(row=4, column=0, columnspan=2, pady=5)
+
+    def import_rooms(self):
+        file_name = filedialog.askopenfilename(title="Import rooms",
+                                               filetypes=[("Spreadsheets", "*.csv *.xlsx"), ("All files", "*.*")])
+        if not file_name:
+            return
+        try:
+            with self.bulk_change():
+                rooms = import_rooms(self.manager, file_name)
+        except (ValueError, OSError) as e:  # ImportValidationError is a ValueError
+            messagebox.showerror("Import Failed", str(e))
+            return
+        self.build_view_buttons()
+        messagebox.showinfo("Import Rooms", f"{len(rooms)} rooms were imported.")
 
-        room_writer.close()  # Corrected from save() to close()
+    def import_instructors(self):
+        file_name = filedialog.askopenfilename(title="Import instructors",
+                                               filetypes=[("Spreadsheets", "*.csv *.xlsx"), ("All files", "*.*")])
+        if not file_name:
+            return
+        try:
+            with self.bulk_change():
+                instructors = import_instructors(self.manager, file_name)
+        except (ValueError, OSError) as e:  # ImportValidationError is a ValueError
+            messagebox.showerror("Import Failed", str(e))
+            return
+        self.build_view_buttons()
+        messagebox.showinfo("Import Instructors", f"{len(instructors)} instructors were imported.")
 
-        messagebox.showinfo("Export Successful", "Schedules have been exported to Excel.")
+    def import_offerings(self):
+        file_name = filedialog.askopenfilename(title="Import course offerings",
+                                               filetypes=[("Spreadsheets", "*.csv *.xlsx"), ("All files", "*.*")])
+        if not file_name:
+            return
+        try:
+            offerings = import_offerings(self.manager, file_name)
+        except (ValueError, OSError) as e:  # ImportValidationError is a ValueError
+            messagebox.showerror("Import Failed", str(e))
+            return
+        self.build_view_buttons()
+        self.update_class_list()
+        count = sum(len(courses) for courses in offerings.values())
+        messagebox.showinfo("Import Offerings", f"{count} offerings for {len(offerings)} trimesters were imported.\n"
+                                                "Auto Schedule will place their sections.")
 
     def load_backup(self):
+        if self.files_locked():
+            return
         try:
-            # Open the backup file and load its contents
-            with open("backup.json", "r") as backup_file:
-                data = json.load(backup_file)
-
-            # Restore the classrooms, saved schedule, and class pools
-            self.manager.classrooms = []
-            for room_data in data["classrooms"]:
-                room = Classroom(room_data["name"], room_data["capacity"])
-                room.schedule = room_data["schedule"]
-                self.manager.classrooms.append(room)
-
-            # Restore the saved schedule
-            self.manager.saved_schedule = data["saved_schedule"]
+            # Restore the classrooms, saved schedule, and class pools from the backup file,
+            # falling back to the JSON backups written by older versions
+            backup_file = "backup.hbs" if os.path.exists("backup.hbs") else "backup.json"
+            self.manager.load_schedule(backup_file)
 
             # Clear and recreate the class pool from the saved schedule
-            self.recreate_class_pool_from_schedule()
+            self.manager.rebuild_class_pools()
 
             # Refresh the UI to reflect the loaded data
-            self.update_schedule_grid()
+            self.refresh_after_load()
 
-            messagebox.showinfo("Backup Loaded", "Your schedule and class pools have been restored from backup.json")
+            messagebox.showinfo("Backup Loaded", f"Your schedule and class pools have been restored from {backup_file}")
+            self.show_validation_report(backup_file)
         except FileNotFoundError:
             messagebox.showerror("Error", "No backup file found!")
         except Exception as e:
             messagebox.showerror("Error", f"An error occurred while loading the backup: {e}")
 
+    def show_validation_report(self, file_name):
+        # List what the validator found in the file just loaded (conflicting bookings were skipped)
+        report = self.manager.validation_report
+        if report is None or report.ok:
+            return
+        details = "\n".join(violation.message for violation in report.violations[:15])
+        if len(report.violations) > 15:
+            details += f"\n... and {len(report.violations) - 15} more"
+        messagebox.showwarning("Schedule Problems", f"{file_name}: {report.summary()}\n\n{details}")
+
     def save_backup(self):
-        # Create a dictionary to hold all the data we want to save
-        data = {
-            "classrooms": [
-                {"name": room.name, "capacity": room.capacity, "schedule": room.schedule}
-                for room in self.manager.classrooms
-            ],
-            "saved_schedule": self.manager.saved_schedule,
-            "class_pools": {
-                group: [class_info for class_info in class_list]
-                for group, class_list in self.manager.class_pools.items()
-            }  # Save all dynamically created class info
-        }
-
-        # Save this data to a JSON file called backup.json
-        with open("backup.json", "w") as backup_file:
-            json.dump(data, backup_file, indent=4)
+        # Save the classrooms, sections and bookings to backup.hbs (compact format)
+        self.manager.save_schedule("backup.hbs")
 
         # Notify the user that the backup was successful
-        messagebox.showinfo("Backup", "Your schedule and class pools have been successfully saved to backup.json")
-
-    def recreate_class_pool_from_schedule(self):
-        # Clear the current class pool
-        for widget in self.class_pool_widgets:
-            widget.destroy()
-        self.class_pool_widgets.clear()
-
-        recreated_classes = set()  # To avoid duplicating the same classes
-
-        # Iterate over the saved schedule and extract class details
-        for group_key, group_schedule in self.manager.saved_schedule.items():
-            for day, time_slots in group_schedule.items():
-                for time_slot, class_info in time_slots.items():
-                    # Extract class details from the saved schedule
-                    match = re.search(r'(\d+)T: (.+?) \(Group (\d+), ([A-Za-z0-9]+), (\d+) students\)', class_info)
-
-                    if match:
-                        trimester = match.group(1)
-                        class_name = match.group(2)
-                        group_num = match.group(3)
-                        room_name = match.group(4)
-                        num_students = match.group(5)
-
-                        # Create a unique identifier to avoid duplicates
-                        class_id = f"{class_name} (Group {group_num}, {room_name}, {num_students} students)"
-
-                        # Avoid duplicating the class
-                        if class_id not in recreated_classes:
-                            # Recreate the class block using this extracted information
-                            self.create_class_block_in_pool(class_id, is_dynamic=True)
-                            recreated_classes.add(class_id)
-
-        # Refresh the class pool for predefined classes
-        self.update_class_list()
-
-    def is_time_slot_free(self, room, day, time_slot):
-        # Debugging: Print current room schedule before checking
-        print(f"Checking time slot for {room.name} on {day} at {time_slot}. Room schedule: {room.schedule[day]}")
+        messagebox.showinfo("Backup", "Your schedule and class pools have been successfully saved to backup.hbs")
 
-        # Check if the time slot is free in the room's internal schedule
-        if day in room.schedule and time_slot in room.schedule[day]:
-            print(f"Time slot {time_slot} on {day} is occupied in {room.name}'s internal schedule")
-            return False  # The slot is occupied in the room
-
-        # Check the saved schedule for both groups and classrooms
-        for group_key, group_schedule in self.saved_schedule.items():
-            if day in group_schedule and time_slot in group_schedule[day]:
-                class_info = group_schedule[day][time_slot]
-                if room.name in class_info:  # If the class info contains the room's name
-                    print(f"Time slot {time_slot} on {day} is occupied by {class_info} in the saved_schedule")
-                    return False  # The slot is occupied in the saved schedule
-
-        print(f"Time slot {time_slot} on {day} is free in {room.name}")
-        return True  # The slot is free
-
-    def update_schedule_grid(self):
-        # Clear existing grid widgets
+    def build_schedule_grid(self):
+        # (Re)create the grid for the manager's calendar: loading a file or a server snapshot can bring another one
         for widget in self.grid_widgets:
             widget.destroy()
         self.grid_widgets = []
+        self.grid_cells = {}
+        self.cell_texts = {}
+        self.calendar = self.manager.calendar
+        self.days_of_week = self.calendar.days
+        self.time_slots = self.calendar.time_slots
+        blocked = self.calendar.blocked_pairs()
 
         # Create the header row with day names
         for idx, day in enumerate(self.days_of_week):
@@ -331,141 +449,138 @@ class DragDropInterface(tk.Frame):
             time_label.grid(row=row_idx + 3, column=0)
             self.grid_widgets.append(time_label)
 
-            # Populate the grid with schedule data
+            # Create the empty cells; update_schedule_grid fills them in. Blocked cells show why and never get a class.
             for col_idx, day in enumerate(self.days_of_week):
-                slot_label = tk.Label(self.grid_frame, text="", relief="sunken", width=30, height=6, font=("Arial", 8))
+                reason = blocked.get((day, time_slot))
+                slot_label = tk.Label(self.grid_frame, text=reason or "", relief="sunken", width=30, height=6,
+                                      bg=BLOCKED_COLOR if reason else "white", wraplength=150, justify="center",
+                                      font=("Arial", 8))
                 slot_label.grid(row=row_idx + 3, column=col_idx + 1)
+                self.grid_widgets.append(slot_label)
 
-                # Determine whether we're in group or classroom view
-                if self.view_mode == 'group':
-                    # Get the group's saved schedule
-                    saved_schedule = self.manager.saved_schedule.get(f'Group {self.manager.current_group}', {})
-                else:
-                    # Get the classroom's saved schedule
-                    current_classroom = self.manager.classrooms[self.manager.current_classroom_idx]
-                    saved_schedule = self.manager.saved_schedule.get(current_classroom.name, {})
-
-                # If there is a class assigned to this time slot, set it
-                if day in saved_schedule and time_slot in saved_schedule[day]:
-                    class_info = saved_schedule[day][time_slot]
-                    slot_label.config(text=class_info, bg="lightgray", wraplength=150, justify="center",
-                                      font=("Arial", 8))
+                # Bind the time slot to handle drop event and deletion prompt
+                slot_label.bind("<ButtonRelease-1>", lambda e, t=time_slot, d=day: self.drop_in_time_slot(t, d))
+                # Bind a left-click event to handle deletion
+                slot_label.bind("<Button-1>", lambda e, t=time_slot, d=day: self.confirm_delete_class(t, d))
 
-                # Bind the time slot to handle drag-and-drop
-                slot_label.bind("<ButtonRelease-1>",
-                                lambda e, t=time_slot, d=day, slot_label=slot_label: self.drop_in_time_slot(t, d,
-                                                                                                            slot_label))
-                self.grid_widgets.append(slot_label)
+                self.grid_cells[(time_slot, day)] = slot_label
+                self.cell_texts[(time_slot, day)] = ""
+
+    def set_cell(self, time_slot, day, text):
+        # Reconfigure one cell, only if its text actually changes
+        if self.cell_texts.get((time_slot, day)) == text:
+            return
+        self.cell_texts[(time_slot, day)] = text
+        self.grid_cells[(time_slot, day)].config(text=text, bg="lightgray" if text else "white")
+
+    def view_filter(self):
+        # Manager query arguments selecting the grid currently shown
+        if self.view_mode == 'group':
+            return {"trimester": self.manager.current_group}
+        if self.view_mode == 'instructor':
+            return {"instructor": self.current_instructor}
+        return {"classroom": self.manager.classrooms[self.manager.current_classroom_idx].name}
+
+    def refresh_cells(self, pairs):
+        # Re-read only the given (day, time_slot) cells of the current view
+        view = self.view_filter()
+        for day, time_slot in pairs:
+            if (time_slot, day) not in self.grid_cells:
+                continue
+            section = self.manager.get_section_at(day, time_slot, **view)
+            self.set_cell(time_slot, day, section.label() if section else "")
+
+    @timed("render")
+    def update_schedule_grid(self):
+        # Labels of the group, classroom or instructor grid being shown
+        if self.calendar != self.manager.calendar:
+            self.build_schedule_grid()
+        labels = self.manager.get_grid_labels(**self.view_filter())
+
+        # Only the cells showing a class now or before can change: clear the old ones, fill the new ones
+        for cell in [cell for cell, text in self.cell_texts.items() if text and cell not in labels]:
+            self.set_cell(cell[0], cell[1], "")
+        for (time_slot, day), label in labels.items():
+            if (time_slot, day) in self.grid_cells:
+                self.set_cell(time_slot, day, label)
 
     def switch_to_group(self, group_num):
+        self.view_mode = 'group'
         self.manager.current_group = group_num
         self.update_group_label()
         self.load_current_state()
 
     def switch_to_classroom(self, idx):
         # Set the current classroom index
+        self.view_mode = 'classroom'
         self.manager.current_classroom_idx = idx
 
-        # Clear the grid to prepare for displaying the classroom's schedule
-        self.clear_schedule()
-
         # Load the current classroom's state and schedule
         self.load_classroom_state()
 
         # Update the label to reflect the current classroom
-        self.group_label.config(
-            text=f"{self.manager.classrooms[idx].name} (Capacity: {self.manager.classrooms[idx].capacity})")
-
-    def save_schedule(self):
-        data = {
-            "classrooms": [
-                {"name": room.name, "capacity": room.capacity, "schedule": room.schedule}
-                for room in self.classrooms
-            ],
-            "saved_schedule": self.saved_schedule,  # Make sure the saved schedule is stored
-            "class_pools": self.class_pools  # Ensure class pools are saved
-        }
-        with open("schedule.json", 'w') as outfile:
-            json.dump(data, outfile, indent=4)
+        self.update_classroom_label()
 
-    def load_schedule(self):
-        self.manager.load_schedule()
+    def switch_to_instructor(self, name):
+        self.view_mode = 'instructor'
+        self.current_instructor = name
         self.update_schedule_grid()
+        windows = self.manager.instructors[name].windows
+        availability = ", ".join(f"{day[:3]} {first}-{last}" for day, first, last in windows) or "any time"
+        self.group_label.config(text=f"{name} (Available: {availability})")
 
     def update_group_label(self):
         # Update the label for the current group
-        self.group_label = tk.Label(self.grid_frame, text=f"Group {self.manager.current_group}", font=('Arial', 14))
-        self.group_label.grid(row=0, column=0, columnspan=3, padx=5, pady=5)
+        self.group_label.config(text=f"Group {self.manager.current_group}")
+
+    def update_classroom_label(self):
+        classroom = self.manager.classrooms[self.manager.current_classroom_idx]
+        self.group_label.config(text=f"{classroom.name} (Capacity: {classroom.capacity})")
+
+    def refresh_after_load(self):
+        # A loaded file can bring other rooms and instructors: rebuild the view buttons and fall back
+        # to the group view when the classroom or instructor shown no longer exists
+        self.build_view_buttons()
+        if self.current_instructor not in self.manager.instructors:
+            self.current_instructor = None
+        if self.manager.current_classroom_idx >= len(self.manager.classrooms):
+            self.manager.current_classroom_idx = 0
+        if (self.view_mode == 'instructor' and self.current_instructor is None) or \
+                (self.view_mode == 'classroom' and not self.manager.classrooms):
+            self.view_mode = 'group'
+
+        self.update_class_list()
+        if self.view_mode == 'instructor':
+            self.switch_to_instructor(self.current_instructor)
+            return
+        self.update_schedule_grid()
+        if self.view_mode == 'classroom':
+            self.update_classroom_label()
+        else:
+            self.update_group_label()
 
     def load_current_state(self):
         # Load the current group's schedule and class pool
-        if self.manager.current_group in self.manager.saved_schedule:
-            self.set_schedule(self.manager.saved_schedule[self.manager.current_group])  # Load the group schedule
-        else:
-            self.clear_schedule()  # If no saved schedule exists, clear the grid
+        self.update_schedule_grid()
 
         # Refresh the class pool for the current group
         self.update_class_list()
 
-    def save_current_state(self):
-        # Save the current group's schedule
-        self.manager.saved_schedule[self.manager.current_group] = self.get_current_schedule()
-
-        # Save the class pool for the current group
-        class_pool = [block.cget("text") for block in self.class_pool_widgets]
-        self.manager.class_pools[self.manager.current_group] = class_pool
-
     def load_classroom_state(self):
         # Get the current classroom based on the selected index
         current_classroom = self.manager.classrooms[self.manager.current_classroom_idx]
         classroom_name = current_classroom.name
 
-        # Clear the grid first
-        self.clear_schedule()
-
-        # We'll gather the schedule for this classroom from the group schedules
-        classroom_schedule = {}
-
-        # Iterate through all groups to find classes scheduled in this classroom
-        for group_key, group_schedule in self.manager.saved_schedule.items():
-            for day, time_slots in group_schedule.items():
-                for time_slot, class_info in time_slots.items():
-                    # Check if the class is assigned to the current classroom
-                    if classroom_name in class_info:  # e.g., "Room A" in the class_info
-                        if day not in classroom_schedule:
-                            classroom_schedule[day] = {}
-                        classroom_schedule[day][time_slot] = class_info
+        # Show the classroom's bookings
+        self.update_schedule_grid()
 
         # Check if any schedule was found for the classroom
-        if classroom_schedule:
-            print(f"Loading schedule for {classroom_name}: {classroom_schedule}")
-            self.set_schedule(classroom_schedule)
+        if self.manager.occupancy.rooms[classroom_name]:
+            logger.debug("Showing schedule for %s", classroom_name)
         else:
             # If no saved schedule exists for this classroom, notify the user
             messagebox.showinfo("No Saved Schedule", f"No saved schedule for {classroom_name}")
 
-    def set_schedule(self, schedule_data):
-        # Set the current schedule from saved data (for groups or classrooms)
-        for day, slots in schedule_data.items():
-            for time_slot, class_info in slots.items():
-                # Make sure the time slot and day exist in the grid
-                if time_slot in self.time_slots and day in self.days_of_week:
-                    row_idx = self.time_slots.index(time_slot)
-                    col_idx = self.days_of_week.index(day)
-                    slot_label = self.grid_frame.grid_slaves(row=row_idx + 3, column=col_idx + 1)
-                    if slot_label:
-                        # Apply the saved schedule data to the grid
-                        slot_label[0].config(text=class_info, bg="lightgray", wraplength=150, justify="center",
-                                             font=("Arial", 8))
-
-    def clear_schedule(self):
-        # Clear the schedule from the grid, but not from saved data
-        for row_idx in range(len(self.time_slots)):
-            for col_idx in range(len(self.days_of_week)):
-                slot_label = self.grid_frame.grid_slaves(row=row_idx + 3, column=col_idx + 1)
-                if slot_label:
-                    slot_label[0].config(text="", bg="white")
-
     def update_class_list(self):
         # Clear existing class pool widgets
         for widget in self.class_pool_widgets:
@@ -474,12 +589,9 @@ class DragDropInterface(tk.Frame):
 
         recreated_classes = set()  # Track classes we already added to avoid duplication
 
-        # Load dynamically created classes from the saved pool for this group
-        if self.manager.current_group in self.manager.class_pools:
-            for class_info in self.manager.class_pools[self.manager.current_group]:
-                if class_info not in recreated_classes:
-                    self.create_class_block_in_pool(class_info, is_dynamic=True)
-                    recreated_classes.add(class_info)
+        # Load dynamically created sections from the saved pool for this group
+        for section in self.manager.get_pool_sections():
+            self.create_class_block_in_pool(section.label(), section_id=section.id)
 
         # Predefined classes for this group (ensure these are always shown once)
         for class_name in self.manager.predefined_classes.get(self.manager.current_group, []):
@@ -487,14 +599,14 @@ class DragDropInterface(tk.Frame):
                 self.create_class_block_in_pool(class_name)  # Predefined classes are not draggable
                 recreated_classes.add(class_name)
 
-    def create_class_block_in_pool(self, class_info, is_dynamic=False):
+    def create_class_block_in_pool(self, class_info, section_id=None):
         # Create the class block label
         class_block = tk.Label(self.class_pool_frame, text=class_info, relief="raised", padx=10, pady=5, bg="lightblue")
         class_block.pack(pady=5)
 
-        # If it's a dynamically created class, make it draggable
-        if is_dynamic:
-            class_block.bind("<Button-1>", self.start_drag_block)
+        # If it's a dynamically created section, make it draggable
+        if section_id is not None:
+            class_block.bind("<Button-1>", lambda e, s=section_id: self.start_drag_block(e, s))
         else:
             # Predefined classes will trigger the class creation process
             class_block.bind("<Button-1>", self.start_class_creation)
@@ -509,7 +621,8 @@ class DragDropInterface(tk.Frame):
             messagebox.showerror("Invalid Input", "Please enter a valid number of students.")
             return
 
-        available_classrooms = self.manager.get_available_classrooms(students)
+        # Best-fit rooms first, leaving out rooms with no slot left for this trimester
+        available_classrooms = self.manager.get_available_classrooms(students, self.manager.current_group)
         if not available_classrooms:
             messagebox.showerror("No Classrooms", f"No classrooms available for {students} students.")
             return
@@ -523,50 +636,49 @@ class DragDropInterface(tk.Frame):
 
         tk.OptionMenu(top, variable, *available_classrooms).pack(pady=10)
 
-        def on_select():
-            classroom = variable.get()
-
-            # Determine the next group number for this class
-            group_num = self.manager.group_tracker.get(class_name, 1)  # Start at group 1 if not tracked yet
-            self.manager.group_tracker[class_name] = group_num + 1  # Increment group number for future instances
-
-            trimester = self.manager.current_group  # Track current trimester
-            class_name_with_trimester = f"{trimester}T: {class_name}"
-
-            self.manager.groups[group_num] = {
-                "class": class_name_with_trimester,
-                "students": students,
-                "classroom": classroom
-            }
+        # Length of each meeting, in whole time slots
+        tk.Label(top, text="Duration (minutes)").pack(pady=5)
+        durations = self.duration_choices()
+        duration_variable = tk.StringVar(top)
+        duration_variable.set(durations[0])
+        tk.OptionMenu(top, duration_variable, *durations).pack(pady=5)
+
+        # Instructor teaching the section; their other classes and availability are checked on drop
+        tk.Label(top, text="Instructor").pack(pady=5)
+        instructor_choices = ["(none)"] + list(self.manager.instructors)
+        instructor_variable = tk.StringVar(top)
+        instructor_variable.set(instructor_choices[0])
+        tk.OptionMenu(top, instructor_variable, *instructor_choices).pack(pady=5)
+
+        # Optional weekly pattern: dropping on one of these days books all of them at once
+        tk.Label(top, text="Meets on").pack(pady=5)
+        day_variables = {}
+        days_frame = tk.Frame(top)
+        days_frame.pack(pady=5)
+        for day in self.days_of_week:
+            day_variables[day] = tk.BooleanVar(top)
+            tk.Checkbutton(days_frame, text=day[:3], variable=day_variables[day]).pack(side=tk.LEFT)
 
-            # Increment the group counter for this class
-            self.create_class_block(class_name_with_trimester, students, group_num, classroom)
+        def on_select():
+            # Register the new section and show it in the class pool
+            days = [day for day in self.days_of_week if day_variables[day].get()]
+            duration = int(duration_variable.get()) // self.calendar.slot_minutes
+            instructor = instructor_variable.get() if instructor_variable.get() != "(none)" else None
+            try:
+                section = self.manager.create_section(class_name, students, variable.get(), duration=duration,
+                                                      days=days, instructor=instructor)
+            except SchedulingError as e:
+                # Keep the dialog open so the choice can be corrected
+                messagebox.showerror("Cannot Create Section", str(e), parent=top)
+                return
+            self.create_class_block_in_pool(section.label(), section_id=section.id)
             top.destroy()
 
         tk.Button(top, text="OK", command=on_select).pack(pady=10)
 
-    def create_class_block(self, class_name_with_trimester, students, group_num, classroom):
-        # Display the class with the correct group number and classroom details
-        class_info = f"{class_name_with_trimester} (Group {group_num}, {classroom}, {students} students)"
-
-        # Create the class block for the dynamically created class
-        class_block = tk.Label(self.class_pool_frame, text=class_info, relief="raised", padx=10, pady=5, bg="lightblue")
-        class_block.pack(pady=5)
-
-        # Make the class block draggable
-        class_block.bind("<Button-1>", self.start_drag_block)
-
-        # Add the class block to the pool widget list
-        self.class_pool_widgets.append(class_block)
-
-        # Store this class in the manager's class pool for the current group
-        if self.manager.current_group not in self.manager.class_pools:
-            self.manager.class_pools[self.manager.current_group] = []
-        self.manager.class_pools[self.manager.current_group].append(class_info)
-
-    def start_drag_block(self, event):
+    def start_drag_block(self, event, section_id):
         widget = event.widget
-        self.dragged_class_info = widget.cget("text")
+        self.dragged_section_id = section_id
         self.drag_data["x"] = event.x
         self.drag_data["y"] = event.y
 
@@ -584,295 +696,159 @@ class DragDropInterface(tk.Frame):
         widget.unbind("<B1-Motion>")
         widget.unbind("<ButtonRelease-1>")
 
-    def generate_time_slots(self):
-        start_time = datetime.strptime("08:00 AM", "%I:%M %p")
-        end_time = datetime.strptime("04:30 PM", "%I:%M %p")
-        time_slots = []
-        current_time = start_time
-        while current_time <= end_time:
-            time_slots.append(current_time.strftime("%I:%M %p"))
-            current_time += timedelta(minutes=30)
-        return time_slots
-
-    def drop_in_time_slot(self, time_slot, day, slot_label):
-        if self.dragged_class_info:
-            match = re.search(r'Group (\d+), ([A-Za-z0-9]+)', self.dragged_class_info)
-
-
-            if match:
-                group_num = int(match.group(1))
-                room_name = match.group(2)
-
-                if self.view_mode == 'group':
-                    # Update the group schedule
-                    selected_classroom = next((room for room in self.manager.classrooms if room.name == room_name),
-                                              None)
-                    if selected_classroom:
-                        if not self.manager.is_time_slot_free(selected_classroom, day, time_slot):
-                            messagebox.showerror("Time Slot Occupied",
-                                                 f"The time slot at {time_slot} on {day} is already booked.")
-                        else:
-                            self.manager.assign_class_to_time_slot(selected_classroom, day, time_slot,
-                                                                   self.dragged_class_info)
-                            self.save_class_to_schedule(self.dragged_class_info, day, time_slot)
-                            slot_label.config(text=self.dragged_class_info, bg="lightgray", wraplength=150,
-                                              justify="center", font=("Arial", 8))
-
-                elif self.view_mode == 'classroom':
-                    # Update the classroom schedule
-                    selected_classroom = self.manager.classrooms[self.current_classroom_idx]
-                    if not self.manager.is_time_slot_free(selected_classroom, day, time_slot):
-                        messagebox.showerror("Time Slot Occupied",
-                                             f"The time slot at {time_slot} on {day} is already booked.")
-                    else:
-                        self.manager.assign_class_to_time_slot(selected_classroom, day, time_slot,
-                                                               self.dragged_class_info)
-                        self.save_class_to_schedule(self.dragged_class_info, day, time_slot)
-                        slot_label.config(text=self.dragged_class_info, bg="lightgray", wraplength=150,
-                                          justify="center", font=("Arial", 8))
-
-            self.dragged_class_info = None  # Reset drag state
-
-    def save_class_to_schedule(self, class_info, day, time_slot):
-        if self.view_mode == 'group':
-            # Use "Group X" format for group keys
-            group_key = f"Group {self.manager.current_group}"
+    def duration_choices(self):
+        # Meeting lengths in minutes, whole time slots of the calendar up to MAX_MEETING_MINUTES
+        slot_minutes = self.calendar.slot_minutes
+        return [str(slots * slot_minutes) for slots in range(1, max(MAX_MEETING_MINUTES // slot_minutes, 1) + 1)]
+
+    @timed("drop")
+    def drop_in_time_slot(self, time_slot, day):
+        if self.dragged_section_id is not None:
+            section = self.manager.sections[self.dragged_section_id]
+            try:
+                # The manager checks every covered slot of the room and the trimester before booking
+                if day in section.days:
+                    self.manager.place_pattern(section.id, time_slot)
+                else:
+                    self.manager.place_section(section.id, day, time_slot)
+            except SchedulingError as e:
+                messagebox.showerror("Time Slot Occupied", str(e))
+            else:
+                self.update_schedule_grid()
+                logger.debug("Placed %s on %s at %s", section, day, time_slot)
 
-            # Save group schedule
-            group_schedule = self.manager.saved_schedule.setdefault(group_key, {})
-            group_schedule[day] = group_schedule.get(day, {})
-            group_schedule[day][time_slot] = class_info
-        elif self.view_mode == 'classroom':
-            # Save classroom schedule using the classroom name as the key
-            current_classroom = self.manager.classrooms[self.manager.current_classroom_idx]
-            classroom_key = current_classroom.name
-
-            classroom_schedule = self.manager.saved_schedule.setdefault(classroom_key, {})
-            classroom_schedule[day] = classroom_schedule.get(day, {})
-            classroom_schedule[day][time_slot] = class_info
-
-        # Debugging: Print saved schedule after adding class
-        print(f"Saved schedule after adding class: {self.manager.saved_schedule}")
-
-    def get_current_schedule(self):
-        current_schedule = {}
-        for col_idx, day in enumerate(self.days_of_week):
-            current_schedule[day] = {}
-            for row_idx, time_slot in enumerate(self.time_slots):
-                slot_label = self.grid_frame.grid_slaves(row=row_idx + 3, column=col_idx + 1)
-                if slot_label and slot_label[0].cget("text"):
-                    current_schedule[day][time_slot] = slot_label[0].cget("text")
-        return current_schedule
+            self.dragged_section_id = None  # Reset drag state
 
     def confirm_delete_class(self, time_slot, day):
-        # Get the current schedule based on view mode
-        if self.view_mode == 'group':
-            group_key = f'Group {self.manager.current_group}'
-            saved_schedule = self.manager.saved_schedule.get(group_key, {})
-        else:
-            current_classroom = self.manager.classrooms[self.manager.current_classroom_idx]
-            saved_schedule = self.manager.saved_schedule.get(current_classroom.name, {})
-
-        # Debugging: Print saved schedule and room schedule before deletion
-        print(f"Before deletion - Saved Schedule: {self.manager.saved_schedule}")
-        print(f"Before deletion - Room Schedule: {[room.schedule for room in self.manager.classrooms]}")
+        # Look up the booked section based on view mode
+        section = self.manager.get_section_at(day, time_slot, **self.view_filter())
 
         # Check if a class is scheduled at this time
-        if day in saved_schedule and time_slot in saved_schedule[day]:
-            class_info = saved_schedule[day][time_slot]
+        if section is not None:
+            class_info = section.label()
 
             # Ask for confirmation to delete
             confirm = messagebox.askyesno("Delete Class", f"Do you want to delete this class?\n\n{class_info}")
             if confirm:
-                # Delete the class from the saved schedule
-                del saved_schedule[day][time_slot]
-                if not saved_schedule[day]:  # If no more classes for the day, remove the day entry
-                    del saved_schedule[day]
-
-                # Now, ensure the class is also deleted from the internal room schedule
-                # Match the room name within parentheses, e.g., "(Group 1, P310, 25 students)"
-                class_info_match = re.search(r'\(Group \d+, ([A-Za-z0-9]+), \d+ students\)', class_info)
-
-                if class_info_match:
-                    room_name = class_info_match.group(1)
-
-                    # Debugging: Print room name being matched
-                    print(f"Attempting to match room: {room_name}")
-
-                    # Find the correct room by name
-                    room = next((r for r in self.manager.classrooms if r.name == room_name), None)
-
-                    if room:
-                        print(f"Matched room: {room.name}")
-                        if day in room.schedule and time_slot in room.schedule[day]:
-                            print(f"Deleting from room.schedule: {room.schedule[day][time_slot]}")
-                            # Explicitly delete the entry from the room's internal schedule
-                            del room.schedule[day][time_slot]  # Clear the internal room schedule
-                        else:
-                            print(f"Error: Time slot {time_slot} not found in room {room.name} for {day}")
-                    else:
-                        print(f"Error: Room {room_name} not found")
-                else:
-                    print("Error: Could not extract room from class info")
-
-                # Debugging: Print saved schedule and room schedule after deletion
-                print(f"After deletion - Saved Schedule: {self.manager.saved_schedule}")
-                print(f"After deletion - Room Schedule: {[room.schedule for room in self.manager.classrooms]}")
-
-                # Update the schedule grid to reflect the deletion
-                self.update_schedule_grid()
-
-                # Save the updated schedule to the JSON file
-                self.manager.save_schedule()
+                self.delete_booking(section, day, time_slot)
 
                 # Notify user of successful deletion
                 messagebox.showinfo("Deleted", "The class has been deleted.")
 
-    def update_schedule_grid(self):
-        # Clear existing grid widgets
-        for widget in self.grid_widgets:
-            widget.destroy()
-        self.grid_widgets = []
-
-        # Create the header row with day names
-        for idx, day in enumerate(self.days_of_week):
-            day_label = tk.Label(self.grid_frame, text=day, relief="ridge", padx=10, pady=5, font=("Arial", 10))
-            day_label.grid(row=2, column=idx + 1)
-            self.grid_widgets.append(day_label)
-
-        # Create time slots in the first column
-        for row_idx, time_slot in enumerate(self.time_slots):
-            time_label = tk.Label(self.grid_frame, text=time_slot, relief="ridge", padx=10, pady=5, font=("Arial", 8))
-            time_label.grid(row=row_idx + 3, column=0)
-            self.grid_widgets.append(time_label)
-
-            # Add saved schedule data to the grid
-            for col_idx, day in enumerate(self.days_of_week):
-                slot_label = tk.Label(self.grid_frame, text="", relief="sunken", width=30, height=6, font=("Arial", 8))
-                slot_label.grid(row=row_idx + 3, column=col_idx + 1)
-
-                # Get saved schedule for this time slot and day
-                saved_schedule = self.manager.saved_schedule.get(f'Group {self.manager.current_group}', {})
-                if day in saved_schedule and time_slot in saved_schedule[day]:
-                    class_info = saved_schedule[day][time_slot]
-                    slot_label.config(text=class_info, bg="lightgray", wraplength=150, justify="center",
-                                      font=("Arial", 8))
-
-                # Bind the time slot to handle drop event and deletion prompt
-                slot_label.bind("<ButtonRelease-1>",
-                                lambda e, t=time_slot, d=day, slot_label=slot_label: self.drop_in_time_slot(t, d,
-                                                                                                            slot_label))
-                # Bind a left-click event to handle deletion
-                slot_label.bind("<Button-1>", lambda e, t=time_slot, d=day: self.confirm_delete_class(t, d))
+    @timed("delete")
+    def delete_booking(self, section, day, time_slot):
+        # Free the whole meeting in both the trimester and the room index
+        self.manager.unplace_section(section.id, day, time_slot)
+        logger.debug("Deleted %s on %s at %s", section, day, time_slot)
 
-                self.grid_widgets.append(slot_label)
+        # Update the cells the meeting covered (the journal records the change)
+        self.update_schedule_grid()
 
-    def save_classroom_state(self, classroom):
-        # Save the current classroom's schedule
-        self.manager.saved_schedule[classroom.name] = self.get_current_schedule()
-    def toggle_view(self):
-        # Save the current state before toggling views
-        if self.view_mode == 'group':
-            self.save_current_state()  # Save current group's schedule
-        elif self.view_mode == 'classroom':
-            current_classroom = self.manager.classrooms[self.manager.current_classroom_idx]
-            self.save_classroom_state(current_classroom)  # Save the current classroom's schedule
+    @timed("undo")
+    def undo(self):
+        if not self.history.can_undo():
+            return
+        self.refresh_cells(self.history.undo())
+        if self.history.sections_changed:
+            self.update_class_list()
 
-        # Toggle between Classroom and Group views
-        if self.view_mode == 'classroom':
-            self.view_mode = 'group'
-            self.load_current_state()  # Load the group schedule and class pool
-        else:
-            self.view_mode = 'classroom'
-            self.load_classroom_state()  # Load the classroom schedule
-
-        # Refresh the schedule grid and class pool after toggling views
-        self.update_schedule_grid()  # Update the grid with the loaded schedule
-        self.update_class_list()  # Reload the class pool
-
-    def drop_in_time_slot(self, time_slot, day, slot_label):
-        if self.dragged_class_info:
-            match = re.search(r'Group (\d+), ([A-Za-z0-9]+)', self.dragged_class_info)
-
-            if match:
-                group_num = int(match.group(1))
-                room_name = match.group(2)
-
-                if self.view_mode == 'group':
-                    # Update the group schedule
-                    selected_classroom = next((room for room in self.manager.classrooms if room.name == room_name),
-                                              None)
-                    if selected_classroom:
-                        # Check if time slot is free
-                        if not self.manager.is_time_slot_free(selected_classroom, day, time_slot):
-                            messagebox.showerror("Time Slot Occupied",
-                                                 f"The time slot at {time_slot} on {day} is already booked.")
-                        else:
-                            # Assign the class and save the schedule
-                            self.manager.assign_class_to_time_slot(selected_classroom, day, time_slot,
-                                                                   self.dragged_class_info)
-                            self.save_class_to_schedule(self.dragged_class_info, day, time_slot)
-                            slot_label.config(text=self.dragged_class_info, bg="lightgray", wraplength=150,
-                                              justify="center", font=("Arial", 8))
-
-                elif self.view_mode == 'classroom':
-                    # Update the classroom schedule
-                    selected_classroom = self.manager.classrooms[self.manager.current_classroom_idx]
-                    if not self.manager.is_time_slot_free(selected_classroom, day, time_slot):
-                        messagebox.showerror("Time Slot Occupied",
-                                             f"The time slot at {time_slot} on {day} is already booked.")
-                    else:
-                        # Assign the class and save the schedule
-                        self.manager.assign_class_to_time_slot(selected_classroom, day, time_slot,
-                                                               self.dragged_class_info)
-                        self.save_class_to_schedule(self.dragged_class_info, day, time_slot)
-                        slot_label.config(text=self.dragged_class_info, bg="lightgray", wraplength=150,
-                                          justify="center", font=("Arial", 8))
-
-            self.dragged_class_info = None  # Reset drag state
+    @timed("redo")
+    def redo(self):
+        if not self.history.can_redo():
+            return
+        self.refresh_cells(self.history.redo())
+        if self.history.sections_changed:
+            self.update_class_list()
 
     def load_schedule(self):
-        # Convert current_group to the correct key format ("Group X")
-        group_key = f"Group {self.manager.current_group}"
+        if self.files_locked():
+            return
+        try:
+            self.manager.load_schedule()
+        except FileNotFoundError:
+            messagebox.showerror("Error", "No schedule.json file found!")
+            return
 
-        # Debugging step: Print the saved schedule
-        print(f"Saved schedule: {self.manager.saved_schedule}")
+        logger.info("Loaded %d sections from schedule.json", len(self.manager.sections))
+        self.show_validation_report("schedule.json")
 
-        if self.view_mode == 'group':
-            if group_key in self.manager.saved_schedule:  # Check using the correct key format
-                print(f"Loading schedule for {group_key}")
-                self.set_schedule(self.manager.saved_schedule[group_key])
-            else:
+        self.refresh_after_load()
+        if self.view_mode == 'instructor':
+            pass  # An instructor without classes is a normal state, no need for a notice
+        elif self.view_mode == 'group':
+            # Convert current_group to the correct key format ("Group X")
+            group_key = f"Group {self.manager.current_group}"
+            if not self.manager.occupancy.trimesters.get(self.manager.current_group, 0):
                 messagebox.showinfo("No Saved Schedule", f"No saved schedule for {group_key}")
         else:
             # For classrooms, use the classroom name as the key
-            current_classroom = self.manager.classrooms[self.manager.current_classroom_idx]
-            classroom_key = current_classroom.name
-
-            # Check if the saved schedule for the classroom exists
-            if classroom_key in self.manager.saved_schedule:
-                print(f"Loading schedule for {classroom_key}")
-                self.set_schedule(self.manager.saved_schedule[classroom_key])
-            else:
+            classroom_key = self.manager.classrooms[self.manager.current_classroom_idx].name
+            if not self.manager.occupancy.rooms[classroom_key]:
                 messagebox.showinfo("No Saved Schedule", f"No saved schedule for {classroom_key}")
 
 
 # ======= Main Application =======
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Interactive scheduler.")
+    parser.add_argument("--connect", metavar="HOST:PORT", help="edit the schedule of a server.py instance")
+    parser.add_argument("--calendar", metavar="FILE",
+                        help="time grid (JSON, see timegrid.py) for a new schedule; ignored with --connect")
+    parser.add_argument("--database", metavar="FILE",
+                        help="also keep the schedule up to date in this SQLite file; ignored with --connect")
+    args = parser.parse_args()
+
+    configure_logging()
     root = tk.Tk()
     root.title("Interactive Scheduler")
     root.geometry("1400x800")
     # Initialize the schedule manager
     manager = ScheduleManager()
-
-    # Add some example classrooms
-    manager.add_classroom("P310", 25)
-    manager.add_classroom("B3", 50)
-    manager.add_classroom("B4", 50)
-    manager.add_classroom("P216", 50)
-    manager.add_classroom("P007", 50)
+    journal = client = database = None
+
+    if args.connect:
+        # The server owns (and journals) the schedule; this window works on a live copy of it
+        from server import ScheduleClient
+        host, _, port = args.connect.rpartition(":")
+        client = ScheduleClient(manager, host or "127.0.0.1", int(port))
+        client.connect()
+        root.title(f"Interactive Scheduler ({args.connect})")
+    else:
+        # Restore the last session and record every change from here on
+        journal = ScheduleJournal(manager)
+        journal.open()
+        if args.calendar:
+            # Only a schedule without classes can change its time grid (rooms and instructors are kept);
+            # the journal keeps it for later sessions
+            calendar = Calendar.load(args.calendar)
+            if calendar != manager.calendar:
+                if manager.sections:
+                    journal.close()
+                    parser.error("--calendar needs an empty schedule: the last session still has classes")
+                try:
+                    manager.set_calendar(calendar)
+                except SchedulingError as e:
+                    journal.close()
+                    parser.error(f"--calendar: {e}")
+
+        # Add some example classrooms
+        for name, capacity in DEFAULT_CLASSROOMS:
+            if manager.get_classroom(name) is None:
+                manager.add_classroom(name, capacity)
+
+        if args.database:
+            # Every change is written to the database too, for queries by other tools while we edit
+            from database import ScheduleDatabase
+            database = ScheduleDatabase(args.database)
+            database.attach(manager)
 
     # Start the Tkinter interface
-    app = DragDropInterface(master=root, manager=manager)
+    app = DragDropInterface(master=root, manager=manager, journal=journal, client=client, database=database)
     app.switch_to_group(1)
     app.mainloop()
+    if client is not None:
+        client.close()
+    else:
+        journal.close()
+    if database is not None:
+        database.close()
+    log_timing_report()
@@ -0,0 +1,929 @@
+import json
+import re
+from bisect import bisect_left, insort
+
+from instrumentation import get_logger, timed
+from timegrid import DEFAULT_CALENDAR, Calendar
+
+logger = get_logger("scheduler")
+
+# Days and slot length of the default calendar (see timegrid.py for other grids)
+DAYS_OF_WEEK = list(DEFAULT_CALENDAR.days)
+SLOT_MINUTES = DEFAULT_CALENDAR.slot_minutes
+BUILDING_PATTERN = re.compile(r"[A-Za-z]+")
+# Rooms a new schedule starts with
+DEFAULT_CLASSROOMS = (("P310", 25), ("B3", 50), ("B4", 50), ("P216", 50), ("P007", 50))
+
+
+def generate_time_slots():
+    # Half-hour slots from 08:00 AM to 04:30 PM
+    return list(DEFAULT_CALENDAR.time_slots)
+
+
+def building_of(room_name):
+    # Default building code of a room: the letters its name starts with ("P310" -> "P")
+    match = BUILDING_PATTERN.match(room_name)
+    return match.group(0).upper() if match else "Other"
+
+
+# Raised when a placement, move or deletion cannot be applied
+class SchedulingError(Exception):
+    pass
+
+
+# Pattern of the labels written by older versions, e.g. "3T: Cálculo (Group 2, P310, 25 students)"
+CLASS_LABEL_PATTERN = re.compile(r'(\d+)T: (.+?) \(Group (\d+), ([A-Za-z0-9]+), (\d+) students\)')
+
+
+# Occupancy of rooms, trimesters and instructors as integer bitsets with one bit per (day, time_slot),
+# so whole-week checks and free-slot searches are a few integer operations instead of dict walks.
+# Bit positions are also the keys of the schedule views; labels are looked up once per booking.
+class OccupancyMatrix:
+    def __init__(self, calendar):
+        self.days = calendar.days
+        self.time_slots = calendar.time_slots
+        self.day_index = calendar.day_index
+        self.slot_index = calendar.slot_index
+        self.slots_per_day = len(self.time_slots)
+        self.size = len(self.days) * self.slots_per_day
+        self.full_mask = (1 << self.size) - 1
+        self.labels = [(day, time_slot) for day in self.days for time_slot in self.time_slots]  # Position -> pair
+        self.positions = {pair: position for position, pair in enumerate(self.labels)}
+        self.cells = [(time_slot, day) for day, time_slot in self.labels]  # Position -> grid cell
+
+        # Slots outside the day's hours or inside blocked periods; no section is ever booked there
+        self.blocked = 0
+        self.blocked_reasons = {}  # Position -> reason, e.g. "Lunch"
+        for (day_idx, slot_idx), reason in calendar.blocked_slots().items():
+            position = day_idx * self.slots_per_day + slot_idx
+            self.blocked |= 1 << position
+            self.blocked_reasons[position] = reason
+
+        self.rooms = {}  # Room name -> week bitset
+        self.trimesters = {}  # Trimester -> week bitset
+        self.room_positions = {}  # Room name -> bit used in slot_rooms
+        self.room_names = []
+        self.slot_rooms = [0] * self.size  # Week position -> bitset of the rooms booked there
+        self.instructors = {}  # Instructor name -> week bitset of the slots they teach
+        self.unavailable = {}  # Instructor name -> week bitset outside their availability windows
+        self.start_masks = {}  # Run length -> week bitset of the positions where such a run fits in the day
+
+    def position(self, day, time_slot):
+        return self.positions[(day, time_slot)]
+
+    def bit(self, day, time_slot):
+        return 1 << self.position(day, time_slot)
+
+    def mask(self, pairs):
+        mask = 0
+        for day, time_slot in pairs:
+            mask |= self.bit(day, time_slot)
+        return mask
+
+    def positions_in(self, mask):
+        # Set bits of a week bitset, in day/slot order
+        positions = []
+        while mask:
+            low_bit = mask & -mask
+            positions.append(low_bit.bit_length() - 1)
+            mask ^= low_bit
+        return positions
+
+    def pairs(self, mask):
+        # Decode a week bitset back into (day, time_slot) pairs, in day/slot order
+        labels = self.labels
+        return [labels[position] for position in self.positions_in(mask)]
+
+    def room_names_in(self, room_mask):
+        names = []
+        while room_mask:
+            low_bit = room_mask & -room_mask
+            names.append(self.room_names[low_bit.bit_length() - 1])
+            room_mask ^= low_bit
+        return names
+
+    def add_room(self, name):
+        self.room_positions[name] = len(self.room_names)
+        self.room_names.append(name)
+        self.rooms[name] = 0
+
+    def available_mask(self, windows):
+        # Week bitset inside availability windows [(day, first time_slot, last time_slot), ...];
+        # None (any time) when there are no windows
+        if not windows:
+            return None
+        available = 0
+        for day, first, last in windows:
+            if day not in self.day_index or first not in self.slot_index or last not in self.slot_index:
+                raise SchedulingError(f"Unknown day or time slot in availability window {day} {first}-{last}")
+            length = self.slot_index[last] - self.slot_index[first] + 1
+            if length < 1:
+                raise SchedulingError(f"Availability window {day} {first}-{last} ends before it starts")
+            available |= self.run_mask(day, first, length)
+        return available
+
+    def add_instructor(self, name, available_mask=None):
+        self.instructors.setdefault(name, 0)
+        self.unavailable[name] = 0 if available_mask is None else self.full_mask & ~available_mask
+
+    def busy_mask(self, room, trimester, instructor=None):
+        # Every slot where a section of this room, trimester and instructor cannot go
+        busy = self.blocked | self.rooms[room] | self.trimesters.get(trimester, 0)
+        if instructor is not None:
+            busy |= self.instructors[instructor] | self.unavailable[instructor]
+        return busy
+
+    def run_mask(self, day, time_slot, length):
+        # Bits of `length` consecutive slots starting at (day, time_slot), or 0 past the end of the day
+        slot_idx = self.slot_index[time_slot]
+        if slot_idx + length > self.slots_per_day:
+            return 0
+        return ((1 << length) - 1) << (self.day_index[day] * self.slots_per_day + slot_idx)
+
+    def start_mask(self, length):
+        mask = self.start_masks.get(length)
+        if mask is None:
+            day_starts = (1 << max(self.slots_per_day - length + 1, 0)) - 1
+            mask = 0
+            for day_idx in range(len(self.days)):
+                mask |= day_starts << (day_idx * self.slots_per_day)
+            self.start_masks[length] = mask
+        return mask
+
+    def run_starts(self, free, length):
+        # Positions starting `length` consecutive free slots of one day: one AND per extra slot
+        starts = free & self.start_mask(length)
+        for offset in range(1, length):
+            starts &= free >> offset
+        return starts
+
+    def book(self, room, trimester, mask, instructor=None):
+        # Mark every slot in mask as taken by the room, the trimester and the instructor
+        self.rooms[room] |= mask
+        self.trimesters[trimester] = self.trimesters.get(trimester, 0) | mask
+        if instructor is not None:
+            self.instructors[instructor] |= mask
+        room_bit = 1 << self.room_positions[room]
+        while mask:
+            low_bit = mask & -mask
+            self.slot_rooms[low_bit.bit_length() - 1] |= room_bit
+            mask ^= low_bit
+
+    def release(self, room, trimester, mask, instructor=None):
+        self.rooms[room] &= ~mask
+        self.trimesters[trimester] &= ~mask
+        if instructor is not None:
+            self.instructors[instructor] &= ~mask
+        room_bit = ~(1 << self.room_positions[room])
+        while mask:
+            low_bit = mask & -mask
+            self.slot_rooms[low_bit.bit_length() - 1] &= room_bit
+            mask ^= low_bit
+
+
+# Class to represent a classroom
+class Classroom:
+    def __init__(self, name, capacity, building=None, features=()):
+        self.name = name
+        self.capacity = capacity
+        self.building = building or building_of(name)
+        self.features = tuple(features)  # e.g. ("projector", "lab")
+
+
+# A teacher. Availability windows are (day, first time_slot, last time_slot); none means any time.
+class Instructor:
+    def __init__(self, name, windows=()):
+        self.name = name
+        self.windows = [tuple(window) for window in windows]
+
+
+# One section (group) of a course, stored once and referenced by id from the indexes
+class Section:
+    def __init__(self, section_id, course, trimester, number, room, students, duration=1, days=None,
+                 instructor=None):
+        self.id = section_id
+        self.course = course
+        self.trimester = trimester
+        self.number = number  # Group number shown in the label
+        self.room = room  # Classroom name
+        self.students = students
+        self.duration = duration  # Consecutive time slots per meeting
+        self.days = list(days or [])  # Weekly meeting pattern, e.g. ["Monday", "Wednesday"]
+        self.instructor = instructor  # Instructor name, or None while unassigned
+        self.meetings = set()  # (day, start time_slot) of each booked meeting
+        self.slots = set()  # Every (day, time_slot) pair covered by the meetings
+
+    def key(self):
+        return self.trimester, self.course, self.number
+
+    def __repr__(self):
+        return f"Section({self.label()!r})"
+
+    def label(self):
+        # Display text, generated only when a grid cell or export needs it
+        return f"{self.trimester}T: {self.course} (Group {self.number}, {self.room}, {self.students} students)"
+
+
+# Class to manage schedules (no GUI code here, so it can be driven from scripts)
+class ScheduleManager:
+    def __init__(self):
+        self.classrooms = []
+        self.predefined_classes = {
+            1: ["Cálculo Diferencial", "Mecánica Clásica", "Ecología", "Química Universitaria", "Optativa Inter",],
+            2: ["Cálculo Integral", "Lab de Mediciones y Mecánica", "Ondas Calor Fluidos", "Probabilidad Estadística",
+                "Álgebra Lineal", "Optativa Inter"],
+            3: ["Cálculo de Varias Variables", "Optativa Inter","Electricidad Magnetismo", "Laboratorio Física",
+                "Circuitos Eléctricos 1", "Fundamentos de Programación", "Fundamentos Diseño Lógico"],
+            4: ["Ecuaciones Diferenciales", "Optativa Inter","Campos Electromagnéticos", "Dispositivos Electrónicos",
+                "Circuitos Eléctricos 2", "Métodos Numéricos"],
+            5: ["Matemáticas para ICT", "Optativa Inter","Acondicionamiento de Señales Eléctricas", "Programación Orientada a Objetos",
+                "Diseño Lógico Avanzado"],
+            6: ["Señales Sistemas", "Administración de Organizaciones", "Optativa Inter","Comunicaciones Analógicas",
+                "Algoritmos Estructuras de Datos", "Sistemas Basados en Microcontroladores"],
+            7: ["Control Analógico", "Bases de Datos", "Optativa Inter","Sistemas Operativos"],
+            8: ["Comunicaciones Digitales", "Optativa Inter","Óptica Física Moderna", "Fundamentos de Admin de Proyectos de SW",
+                "Redes de Comunicación"],
+            9: ["Procesamiento Digital de Señales", "Optativa Inter","Teoría de Información Codificación", "Física Electrónica",
+                "Formulación de proyecto fundamento económico", "Optativa Disciplinar"],
+            10: ["Control Digital", "Laboratorio de Control", "Optativa Inter","Factibilidad tec económica financiera", "Optativa Disciplinar"],
+            11: ["Emprendimiento social""Optativa Inter","Optativa Disciplinar"],
+            12: ["Optativa Inter", "Optativa Disciplinar"]  # Group 12 has no classes (thesis work)
+        }
+        self.current_group = 1
+        self.group_tracker = {}  # Track the group number for each class
+        self.class_pools = {}  # Section ids created per group (trimester)
+        self.current_classroom_idx = 0  # Track which classroom is being viewed
+        self.calendar = DEFAULT_CALENDAR  # timegrid.Calendar; change it with set_calendar()
+        self.days_of_week = self.calendar.days
+        self.time_slots = self.calendar.time_slots
+
+        self.classrooms_by_name = {}
+        self.rooms_by_capacity = []  # (capacity, name) sorted, for best-fit lookups
+        self.sections = {}  # Section id -> Section
+        self.sections_by_key = {}  # (trimester, course, number) -> Section
+        self.next_section_id = 1
+        # Views kept up to date by every booking: owner -> {week position: section id}, so showing
+        # one room, trimester or instructor costs as much as its own bookings
+        self.room_views = {}  # Room name -> view
+        self.trimester_views = {}  # Trimester -> view
+        self.instructors = {}  # Instructor name -> Instructor
+        self.instructor_views = {}  # Instructor name -> view
+        self.occupancy = OccupancyMatrix(self.calendar)
+        self.capacity_masks = {}  # Required capacity -> bitset of the rooms that are big enough
+        self.rejected_bookings = []  # Bookings skipped by the last load because they conflicted
+        self.validation_report = None  # validator.ValidationReport of the last JSON file loaded
+        self.offerings = {}  # Imported {trimester: [(course, sections, students[, meetings[, duration]])]}
+
+        # Every change is announced to the listeners as an operation record (see emit)
+        self.listeners = []
+        self.sequence = 0  # Number of the last operation applied
+
+        # Define trimester colors
+        self.trimester_colors = {
+            1: "#FFCCCC", 2: "#FF9999", 3: "#FF6666", 4: "#FF3333", 5: "#FF0000",
+            6: "#CCFFCC", 7: "#99FF99", 8: "#66FF66", 9: "#33FF33", 10: "#00FF00",
+            11: "#CCCCFF", 12: "#9999FF"
+        }
+
+    # ----- Operation records -----
+
+    def emit(self, record):
+        # Number the operation and hand it to every listener (journal, undo history, server, ...)
+        self.sequence += 1
+        if self.listeners:
+            record["seq"] = self.sequence
+            for listener in self.listeners:
+                listener(record)
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self.listeners.remove(listener)
+
+    def section_record(self, section):
+        # Everything needed to recreate the section, keyed by its stable (trimester, course, number)
+        return {
+            "section": list(section.key()), "room": section.room, "students": section.students,
+            "duration": section.duration, "days": list(section.days), "instructor": section.instructor,
+            "meetings": [list(meeting) for meeting in sorted(section.meetings)]
+        }
+
+    def apply_operation(self, record):
+        # Replay an operation record produced by emit()
+        op = record["op"]
+        if op == "room":
+            if record["name"] not in self.classrooms_by_name:
+                self.add_classroom(record["name"], record["capacity"], record.get("building"),
+                                   record.get("features", ()))
+            return
+        if op == "instructor":
+            if record["name"] not in self.instructors:
+                self.add_instructor(record["name"], record.get("windows", ()))
+            return
+        if op == "reset":
+            return
+
+        trimester, course, number = record["section"]
+        if op == "create":
+            self.create_section(course, record["students"], record["room"], trimester, number,
+                                record.get("duration", 1), record.get("days"), record.get("instructor"))
+            return
+        section = self.sections_by_key[(trimester, course, number)]
+        if op == "place":
+            self.place_meetings(section.id, [tuple(meeting) for meeting in record["meetings"]])
+        elif op == "unplace":
+            self.unplace_section(section.id, *record["meeting"])
+        elif op == "move":
+            self.move_section(section.id, *record["meeting"], *record["to"])
+        elif op == "assign":
+            self.assign_instructor(section.id, record["instructor"])
+        elif op == "delete":
+            self.delete_section(section.id)
+        else:
+            raise SchedulingError(f"Unknown operation {op!r}")
+
+    def add_classroom(self, name, capacity, building=None, features=()):
+        if name in self.classrooms_by_name:
+            raise SchedulingError(f"Classroom {name} already exists")
+        room = Classroom(name, capacity, building, features)
+        self.classrooms.append(room)
+        self.classrooms_by_name[name] = room
+        insort(self.rooms_by_capacity, (capacity, name))
+        self.occupancy.add_room(name)
+        self.capacity_masks = {}
+        self.emit({"op": "room", "name": name, "capacity": capacity, "building": room.building,
+                   "features": list(room.features)})
+        return room
+
+    def get_classroom(self, name):
+        return self.classrooms_by_name.get(name)
+
+    def add_instructor(self, name, windows=()):
+        # windows: [(day, first time_slot, last time_slot), ...]; empty means available all week
+        if name in self.instructors:
+            raise SchedulingError(f"Instructor {name} already exists")
+        instructor = Instructor(name, windows)
+        available = self.occupancy.available_mask(instructor.windows)
+        self.instructors[name] = instructor
+        self.occupancy.add_instructor(name, available)
+        self.emit({"op": "instructor", "name": name, "windows": [list(window) for window in instructor.windows]})
+        return instructor
+
+    def get_instructor(self, name):
+        return self.instructors.get(name)
+
+    def assign_instructor(self, section_id, instructor):
+        # Give the section another instructor (or None); its booked slots must suit the new one
+        section = self.sections[section_id]
+        if instructor is not None and instructor not in self.instructors:
+            raise SchedulingError(f"Instructor {instructor} does not exist")
+        previous = section.instructor
+        if instructor == previous:
+            return section
+        mask = self.occupancy.mask(section.slots)
+        if instructor is not None:
+            clash = mask & (self.occupancy.instructors[instructor] | self.occupancy.unavailable[instructor])
+            if clash:
+                day, time_slot = self.occupancy.pairs(clash)[0]
+                raise SchedulingError(f"{instructor} is busy or unavailable at {time_slot} on {day}.")
+
+        for position in self.occupancy.positions_in(mask):
+            if previous is not None:
+                del self.instructor_views[previous][position]
+            if instructor is not None:
+                self.instructor_views.setdefault(instructor, {})[position] = section.id
+        if previous is not None:
+            self.occupancy.instructors[previous] &= ~mask
+        if instructor is not None:
+            self.occupancy.instructors[instructor] |= mask
+        section.instructor = instructor
+        self.emit({"op": "assign", "section": list(section.key()), "instructor": instructor, "previous": previous})
+        return section
+
+    def set_offerings(self, offerings):
+        # Replace the course offerings; their courses become the class pool of each trimester
+        self.offerings = offerings
+        for trimester, courses in offerings.items():
+            names = []
+            for offering in courses:
+                if offering[0] not in names:
+                    names.append(offering[0])
+            self.predefined_classes[trimester] = names
+
+    def get_available_classrooms(self, required_capacity, trimester=None):
+        # Rooms big enough, smallest (best fit) first. With a trimester, rooms that have no
+        # slot left in common with that trimester are skipped.
+        start = bisect_left(self.rooms_by_capacity, (required_capacity,))
+        names = [name for _, name in self.rooms_by_capacity[start:]]
+        if trimester is not None:
+            busy_trimester = self.occupancy.blocked | self.occupancy.trimesters.get(trimester, 0)
+            names = [name for name in names
+                     if self.occupancy.full_mask & ~(self.occupancy.rooms[name] | busy_trimester)]
+        return names
+
+    def find_best_fit_classroom(self, required_capacity, pairs=()):
+        # Smallest room with capacity >= required_capacity that is free at every (day, time_slot)
+        # pair: binary search to the first big-enough room, then one AND per candidate
+        mask = self.occupancy.mask(pairs)
+        rooms = self.rooms_by_capacity
+        for idx in range(bisect_left(rooms, (required_capacity,)), len(rooms)):
+            name = rooms[idx][1]
+            if not self.occupancy.rooms[name] & mask:
+                return self.classrooms_by_name[name]
+        return None
+
+    def is_time_slot_free(self, room, day, time_slot):
+        return not (self.occupancy.blocked | self.occupancy.rooms[room.name]) & self.occupancy.bit(day, time_slot)
+
+    def is_trimester_slot_free(self, trimester, day, time_slot):
+        busy = self.occupancy.blocked | self.occupancy.trimesters.get(trimester, 0)
+        return not busy & self.occupancy.bit(day, time_slot)
+
+    def is_blocked(self, day, time_slot):
+        return bool(self.occupancy.blocked & self.occupancy.bit(day, time_slot))
+
+    # ----- Place / move / delete -----
+
+    def create_section(self, course, students, classroom, trimester=None, number=None, duration=1, days=None,
+                       instructor=None):
+        # Register a new section of course and add it to the trimester's class pool
+        if trimester is None:
+            trimester = self.current_group
+        if classroom not in self.classrooms_by_name:
+            raise SchedulingError(f"Classroom {classroom} does not exist")
+        if instructor is not None and instructor not in self.instructors:
+            raise SchedulingError(f"Instructor {instructor} does not exist")
+
+        if duration < 1 or duration > self.occupancy.slots_per_day:
+            raise SchedulingError(f"A meeting must last between 1 and {self.occupancy.slots_per_day} time slots")
+
+        # Determine the next group number for this class
+        if number is None:
+            number = self.group_tracker.get(course, 1)  # Start at group 1 if not tracked yet
+        if (trimester, course, number) in self.sections_by_key:
+            raise SchedulingError(f"Group {number} of {course} already exists for trimester {trimester}")
+        # Only a section that is really created moves the tracker on
+        self.group_tracker[course] = max(self.group_tracker.get(course, 1), number + 1)
+
+        section = Section(self.next_section_id, course, trimester, number, classroom, students, duration, days,
+                          instructor)
+        self.next_section_id += 1
+        self.sections[section.id] = section
+        self.sections_by_key[section.key()] = section
+        self.class_pools.setdefault(trimester, []).append(section.id)
+        self.emit(dict(self.section_record(section), op="create"))
+        return section
+
+    def place_section(self, section_id, day, time_slot):
+        # Book one meeting of the section starting at (day, time_slot)
+        self.place_meetings(section_id, [(day, time_slot)])
+
+    def place_pattern(self, section_id, time_slot):
+        # Book a meeting at time_slot on every day of the section's weekly pattern
+        section = self.sections[section_id]
+        self.place_meetings(section_id, [(day, time_slot) for day in section.days])
+
+    def place_meetings(self, section_id, meetings):
+        # Book several meetings of the section at once: either all of them or none
+        section = self.sections[section_id]
+        self.book_meetings(section, meetings)
+        self.emit({"op": "place", "section": list(section.key()), "meetings": [list(meeting) for meeting in meetings]})
+
+    def book_meetings(self, section, meetings):
+        # All covered slots are checked with one AND against the room, trimester and instructor bitsets
+        mask = 0
+        for day, time_slot in meetings:
+            meeting_mask = self.occupancy.run_mask(day, time_slot, section.duration)
+            if not meeting_mask:
+                raise SchedulingError(f"A {section.duration * self.calendar.slot_minutes} minute class starting at {time_slot} "
+                                      f"does not fit before the end of {day}.")
+            if mask & meeting_mask:
+                raise SchedulingError(f"The meetings of {section.label()} overlap on {day}.")
+            mask |= meeting_mask
+
+        if mask & self.occupancy.busy_mask(section.room, section.trimester, section.instructor):
+            self.raise_clash(section, mask)
+
+        room_view = self.room_views.setdefault(section.room, {})
+        trimester_view = self.trimester_views.setdefault(section.trimester, {})
+        instructor_view = self.instructor_views.setdefault(section.instructor, {}) if section.instructor else None
+        labels = self.occupancy.labels
+        for position in self.occupancy.positions_in(mask):
+            room_view[position] = section.id
+            trimester_view[position] = section.id
+            if instructor_view is not None:
+                instructor_view[position] = section.id
+            section.slots.add(labels[position])
+        self.occupancy.book(section.room, section.trimester, mask, section.instructor)
+        section.meetings.update(meetings)
+
+    def raise_clash(self, section, mask):
+        # Explain which of the room, trimester or instructor is taken (only called once a clash is known)
+        blocked_clash = mask & self.occupancy.blocked
+        if blocked_clash:
+            position = self.occupancy.positions_in(blocked_clash)[0]
+            day, time_slot = self.occupancy.labels[position]
+            raise SchedulingError(f"The time slot at {time_slot} on {day} cannot be booked "
+                                  f"({self.occupancy.blocked_reasons[position]}).")
+        room_clash = mask & self.occupancy.rooms[section.room]
+        if room_clash:
+            day, time_slot = self.occupancy.pairs(room_clash)[0]
+            raise SchedulingError(f"The time slot at {time_slot} on {day} is already booked in {section.room}.")
+        trimester_clash = mask & self.occupancy.trimesters.get(section.trimester, 0)
+        if trimester_clash:
+            day, time_slot = self.occupancy.pairs(trimester_clash)[0]
+            raise SchedulingError(f"The time slot at {time_slot} on {day} is already booked "
+                                  f"for Group {section.trimester}.")
+        instructor_clash = mask & self.occupancy.instructors[section.instructor]
+        if instructor_clash:
+            day, time_slot = self.occupancy.pairs(instructor_clash)[0]
+            raise SchedulingError(f"{section.instructor} already teaches at {time_slot} on {day}.")
+        day, time_slot = self.occupancy.pairs(mask & self.occupancy.unavailable[section.instructor])[0]
+        raise SchedulingError(f"{section.instructor} is not available at {time_slot} on {day}.")
+
+    def find_meeting(self, section, day, time_slot):
+        # Start of the meeting of section that covers (day, time_slot), or None
+        slot_idx = self.occupancy.slot_index[time_slot]
+        for meeting_day, start in section.meetings:
+            start_idx = self.occupancy.slot_index[start]
+            if meeting_day == day and start_idx <= slot_idx < start_idx + section.duration:
+                return meeting_day, start
+        return None
+
+    def unplace_section(self, section_id, day, time_slot):
+        # Free the whole meeting of the section that covers (day, time_slot)
+        section = self.sections[section_id]
+        meeting = self.find_meeting(section, day, time_slot)
+        if meeting is None:
+            raise SchedulingError(f"{section.label()} is not booked at {time_slot} on {day}.")
+        self.release_meeting(section, meeting)
+        self.emit({"op": "unplace", "section": list(section.key()), "meeting": list(meeting)})
+        return section
+
+    def release_meeting(self, section, meeting):
+        mask = self.occupancy.run_mask(meeting[0], meeting[1], section.duration)
+        room_view = self.room_views[section.room]
+        trimester_view = self.trimester_views[section.trimester]
+        instructor_view = self.instructor_views[section.instructor] if section.instructor else None
+        labels = self.occupancy.labels
+        for position in self.occupancy.positions_in(mask):
+            del room_view[position]
+            del trimester_view[position]
+            if instructor_view is not None:
+                del instructor_view[position]
+            section.slots.discard(labels[position])
+        self.occupancy.release(section.room, section.trimester, mask, section.instructor)
+        section.meetings.discard(meeting)
+
+    def move_section(self, section_id, day, time_slot, new_day, new_time_slot):
+        # Move the meeting covering (day, time_slot) so it starts at (new_day, new_time_slot),
+        # leaving it in place if the target is taken
+        section = self.sections[section_id]
+        meeting = self.find_meeting(section, day, time_slot)
+        if meeting is None:
+            raise SchedulingError(f"{section.label()} is not booked at {time_slot} on {day}.")
+        self.release_meeting(section, meeting)
+        try:
+            self.book_meetings(section, [(new_day, new_time_slot)])
+        except SchedulingError:
+            self.book_meetings(section, [meeting])
+            raise
+        self.emit({"op": "move", "section": list(section.key()), "meeting": list(meeting),
+                   "to": [new_day, new_time_slot]})
+        return section
+
+    def delete_section(self, section_id):
+        # Remove the section, its bookings and its class pool entry
+        section = self.sections[section_id]
+        record = dict(self.section_record(section), op="delete")
+        for meeting in list(section.meetings):
+            self.release_meeting(section, meeting)
+        del self.sections[section_id]
+        del self.sections_by_key[section.key()]
+        self.class_pools.get(section.trimester, []).remove(section_id)
+        self.emit(record)
+        return section
+
+    # ----- Queries -----
+
+    def get_view(self, trimester=None, classroom=None, instructor=None):
+        # {week position: section id} of a classroom, an instructor or (by default) a trimester.
+        # This is the live view, not a copy: callers must not modify it.
+        if classroom is not None:
+            return self.room_views.get(classroom, {})
+        if instructor is not None:
+            return self.instructor_views.get(instructor, {})
+        if trimester is None:
+            trimester = self.current_group
+        return self.trimester_views.get(trimester, {})
+
+    def get_section_at(self, day, time_slot, trimester=None, classroom=None, instructor=None):
+        # Section booked at (day, time_slot) for a classroom, an instructor or (by default) a trimester
+        position = self.occupancy.positions.get((day, time_slot))
+        return self.sections.get(self.get_view(trimester, classroom, instructor).get(position))
+
+    def get_schedule(self, trimester=None, classroom=None, instructor=None):
+        # {day: {time_slot: Section}} for a classroom, an instructor or (by default) a trimester
+        schedule = {}
+        labels = self.occupancy.labels
+        for position, section_id in self.get_view(trimester, classroom, instructor).items():
+            day, time_slot = labels[position]
+            schedule.setdefault(day, {})[time_slot] = self.sections[section_id]
+        return schedule
+
+    def get_grid_labels(self, trimester=None, classroom=None, instructor=None):
+        # {(time_slot, day): label} for the cells of a classroom, instructor or trimester grid
+        sections = self.sections
+        cells = self.occupancy.cells
+        return {cells[position]: sections[section_id].label()
+                for position, section_id in self.get_view(trimester, classroom, instructor).items()}
+
+    def get_group_schedule(self, trimester=None):
+        return self.get_schedule(trimester=trimester)
+
+    def get_classroom_schedule(self, classroom_name):
+        return self.get_schedule(classroom=classroom_name)
+
+    def get_instructor_schedule(self, instructor_name):
+        return self.get_schedule(instructor=instructor_name)
+
+    def capacity_mask(self, required_capacity):
+        # Bitset (over room positions) of the rooms holding at least required_capacity students
+        mask = self.capacity_masks.get(required_capacity)
+        if mask is None:
+            mask = 0
+            for room in self.classrooms:
+                if room.capacity >= required_capacity:
+                    mask |= 1 << self.occupancy.room_positions[room.name]
+            self.capacity_masks[required_capacity] = mask
+        return mask
+
+    def get_free_classrooms(self, day, time_slot, required_capacity=0):
+        # Rooms big enough and free at (day, time_slot): one AND-NOT over all rooms at once
+        position = self.occupancy.position(day, time_slot)
+        if self.occupancy.blocked >> position & 1:
+            return []
+        booked = self.occupancy.slot_rooms[position]
+        return self.occupancy.room_names_in(self.capacity_mask(required_capacity) & ~booked)
+
+    def get_free_slots(self, trimester=None, classroom=None, instructor=None):
+        # (day, time_slot) pairs free for the trimester, the classroom and/or the instructor
+        busy = self.occupancy.blocked
+        if trimester is not None:
+            busy |= self.occupancy.trimesters.get(trimester, 0)
+        if classroom is not None:
+            busy |= self.occupancy.rooms[classroom]
+        if instructor is not None:
+            busy |= self.occupancy.instructors[instructor] | self.occupancy.unavailable[instructor]
+        return self.occupancy.pairs(self.occupancy.full_mask & ~busy)
+
+    @timed("find_placements")
+    def find_placements(self, students, duration=1, trimester=None, instructor=None, features=()):
+        # Every (room, day, start time_slot) where a new section could meet without clashing with
+        # its room, trimester or instructor, best-fitting (smallest big-enough) rooms first. Each room
+        # costs one AND-NOT of whole-week bitsets plus one shifted AND per slot of the duration.
+        if trimester is None:
+            trimester = self.current_group
+        if instructor is not None and instructor not in self.instructors:
+            raise SchedulingError(f"Instructor {instructor} does not exist")
+        occupancy = self.occupancy
+        if duration < 1 or duration > occupancy.slots_per_day:
+            return []
+        busy = occupancy.blocked | occupancy.trimesters.get(trimester, 0)
+        if instructor is not None:
+            busy |= occupancy.instructors[instructor] | occupancy.unavailable[instructor]
+        free = occupancy.full_mask & ~busy
+
+        required = set(features)
+        placements = []
+        for idx in range(bisect_left(self.rooms_by_capacity, (students,)), len(self.rooms_by_capacity)):
+            name = self.rooms_by_capacity[idx][1]
+            if required and not required.issubset(self.classrooms_by_name[name].features):
+                continue
+            starts = occupancy.run_starts(free & ~occupancy.rooms[name], duration)
+            placements.extend((name, day, time_slot) for day, time_slot in occupancy.pairs(starts))
+        return placements
+
+    def find_conflicts(self, section_id, pairs):
+        # Which of the (day, time_slot) pairs clash with the section's room, trimester or instructor
+        section = self.sections[section_id]
+        busy = self.occupancy.busy_mask(section.room, section.trimester, section.instructor)
+        return self.occupancy.pairs(self.occupancy.mask(pairs) & busy)
+
+    def get_pool_sections(self, trimester=None):
+        if trimester is None:
+            trimester = self.current_group
+        return [self.sections[section_id] for section_id in self.class_pools.get(trimester, [])]
+
+    def rebuild_class_pools(self):
+        # Recreate the class pools from the known sections
+        self.class_pools = {}
+        for section in self.sections.values():
+            self.class_pools.setdefault(section.trimester, []).append(section.id)
+
+    @property
+    def saved_schedule(self):
+        # Label view in the format older versions kept in memory and in schedule.json
+        saved_schedule = {}
+        labels = self.occupancy.labels
+        for trimester, view in self.trimester_views.items():
+            for position, section_id in view.items():
+                day, time_slot = labels[position]
+                group_schedule = saved_schedule.setdefault(f"Group {trimester}", {})
+                group_schedule.setdefault(day, {})[time_slot] = self.sections[section_id].label()
+        return saved_schedule
+
+    # ----- Persistence -----
+
+    def set_calendar(self, calendar):
+        # Switch to another time grid (timegrid.Calendar). Rooms and instructors are kept; sections are
+        # dropped, because their bookings are bit positions of the old grid. Listeners get a "reset".
+        # Availability windows that do not exist in the new grid raise SchedulingError before anything changes.
+        occupancy = OccupancyMatrix(calendar)
+        available = {name: occupancy.available_mask(instructor.windows) for name, instructor in self.instructors.items()}
+        for room in self.classrooms:
+            occupancy.add_room(room.name)
+        for name, mask in available.items():
+            occupancy.add_instructor(name, mask)
+        self.calendar = calendar
+        self.days_of_week = calendar.days
+        self.time_slots = calendar.time_slots
+        self.clear_sections()
+        self.occupancy = occupancy
+        self.emit({"op": "reset", "calendar": calendar.to_dict()})
+
+    def clear(self):
+        self.days_of_week = self.calendar.days
+        self.time_slots = self.calendar.time_slots
+        self.classrooms = []
+        self.classrooms_by_name = {}
+        self.rooms_by_capacity = []
+        self.instructors = {}
+        self.occupancy = OccupancyMatrix(self.calendar)
+        self.capacity_masks = {}
+        self.clear_sections()
+
+    def clear_sections(self):
+        # Drop every section and view; the caller gives the occupancy a fresh grid for the rooms and instructors
+        self.sections = {}
+        self.sections_by_key = {}
+        self.next_section_id = 1
+        self.room_views = {}
+        self.trimester_views = {}
+        self.instructor_views = {}
+        self.class_pools = {}
+        self.group_tracker = {}
+        self.rejected_bookings = []
+
+    def to_dict(self):
+        # Same layout as the schedule.json/backup.json files written by older versions, plus a
+        # "sections" list with the fields the labels cannot carry (duration, meeting pattern)
+        room_schedules = {room.name: {day: {} for day in self.days_of_week} for room in self.classrooms}
+        labels = self.occupancy.labels
+        for room_name, view in self.room_views.items():
+            for position, section_id in view.items():
+                day, time_slot = labels[position]
+                room_schedules[room_name][day][time_slot] = self.sections[section_id].label()
+        return {
+            "calendar": self.calendar.to_dict(),
+            "classrooms": [
+                {"name": room.name, "capacity": room.capacity, "building": room.building,
+                 "features": list(room.features), "schedule": room_schedules[room.name]}
+                for room in self.classrooms
+            ],
+            "instructors": [
+                {"name": instructor.name, "windows": [list(window) for window in instructor.windows]}
+                for instructor in self.instructors.values()
+            ],
+            "saved_schedule": self.saved_schedule,
+            "class_pools": {
+                trimester: [self.sections[section_id].label() for section_id in section_ids]
+                for trimester, section_ids in self.class_pools.items()
+            },
+            "sections": [
+                {
+                    "course": section.course, "trimester": section.trimester, "number": section.number,
+                    "room": section.room, "students": section.students, "duration": section.duration,
+                    "days": section.days, "instructor": section.instructor, "meetings": sorted(section.meetings)
+                }
+                for section in self.sections.values()
+            ]
+        }
+
+    def load_dict(self, data):
+        # Rebuild rooms, sections and indexes from a schedule.json/backup.json document.
+        # Labels are parsed here, once, and never again afterwards. Documents written before
+        # calendars existed keep the current one.
+        if "calendar" in data:
+            self.calendar = Calendar.from_dict(data["calendar"])
+        self.clear()
+        for room_data in data["classrooms"]:
+            if room_data["name"] in self.classrooms_by_name:
+                continue  # Listed twice (a validator duplicate-room): the first entry is kept
+            self.add_classroom(room_data["name"], room_data["capacity"], room_data.get("building"),
+                               room_data.get("features", ()))
+        for instructor_data in data.get("instructors", []):
+            self.add_instructor(instructor_data["name"], instructor_data.get("windows", ()))
+
+        if "sections" in data:
+            self.load_sections(data["sections"])
+            return
+
+        sections_by_key = self.sections_by_key
+
+        def section_for(class_info):
+            match = CLASS_LABEL_PATTERN.search(class_info) if isinstance(class_info, str) else None
+            if not match:
+                return None
+            trimester, course, number = int(match.group(1)), match.group(2), int(match.group(3))
+            section = sections_by_key.get((trimester, course, number))
+            if section is None:
+                room_name, students = match.group(4), int(match.group(5))
+                if room_name not in self.classrooms_by_name:
+                    return None
+                section = self.create_section(course, students, room_name, trimester, number)
+            return section
+
+        for class_list in data.get("class_pools", {}).values():
+            for class_info in class_list:
+                section_for(class_info)
+
+        # Bookings live in the group schedules, in classroom-keyed entries and in the room schedules
+        bookings = []
+        for schedule_key, schedule in data.get("saved_schedule", {}).items():
+            bookings.extend((day, time_slot, class_info)
+                            for day, time_slots in schedule.items() for time_slot, class_info in time_slots.items())
+        for room_data in data["classrooms"]:
+            bookings.extend((day, time_slot, class_info)
+                            for day, time_slots in room_data.get("schedule", {}).items()
+                            for time_slot, class_info in time_slots.items())
+
+        for day, time_slot, class_info in bookings:
+            section = section_for(class_info)
+            if section is None:
+                self.rejected_bookings.append((day, time_slot, class_info))
+            elif (day, time_slot) not in section.slots:
+                try:
+                    self.place_section(section.id, day, time_slot)
+                except SchedulingError:
+                    self.rejected_bookings.append((day, time_slot, class_info))
+
+    def load_sections(self, sections):
+        # Structured section records written by to_dict()
+        for record in sections:
+            try:
+                section = self.create_section(record["course"], record["students"], record["room"],
+                                              record["trimester"], record["number"], record.get("duration", 1),
+                                              record.get("days"), record.get("instructor"))
+            except SchedulingError:
+                self.rejected_bookings.extend((day, time_slot, record["course"])
+                                              for day, time_slot in record.get("meetings", []))
+                continue
+            for day, time_slot in record.get("meetings", []):
+                try:
+                    self.place_section(section.id, day, time_slot)
+                except SchedulingError:
+                    self.rejected_bookings.append((day, time_slot, section.label()))
+
+    @timed("save")
+    def save_schedule(self, file_name="schedule.json"):
+        # Files ending in .hbs use the compact format from storage.py, .sqlite/.db the SQLite
+        # database from database.py, anything else JSON
+        if file_name.endswith(".hbs"):
+            from storage import save_compact
+            save_compact(self, file_name)
+            return
+        if file_name.endswith((".sqlite", ".db")):
+            from database import save_database
+            save_database(self, file_name)
+            return
+        with open(file_name, 'w') as outfile:
+            json.dump(self.to_dict(), outfile, indent=4)
+
+    @timed("load")
+    def load_schedule(self, file_name="schedule.json"):
+        # Listeners get a single "reset" instead of one record per rebuilt section
+        listeners, self.listeners = self.listeners, []
+        self.validation_report = None
+        try:
+            if file_name.endswith(".hbs"):
+                from storage import load_compact
+                load_compact(file_name, self)
+            elif file_name.endswith((".sqlite", ".db")):
+                from database import load_database
+                load_database(file_name, self)
+            else:
+                from validator import validate_document
+                with open(file_name, 'r') as infile:
+                    data = json.load(infile)
+                # Hand-edited or old files can hold conflicts the load would silently skip: report them all
+                self.validation_report = validate_document(data, calendar=self.calendar)
+                if not self.validation_report.ok:
+                    logger.warning("%s: %s", file_name, self.validation_report.summary())
+                self.load_dict(data)
+        finally:
+            self.listeners = listeners
+        self.emit({"op": "reset", "file": file_name})
+        if self.rejected_bookings:
+            logger.warning("%s: skipped %d conflicting or unknown bookings", file_name, len(self.rejected_bookings))
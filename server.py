@@ -0,0 +1,439 @@
+import argparse
+import asyncio
+import json
+import queue
+import sys
+import threading
+from contextlib import ExitStack
+
+from history import inverse_operations
+from instrumentation import configure_logging, get_logger
+from scheduler import DEFAULT_CLASSROOMS, ScheduleManager, SchedulingError
+from timegrid import Calendar
+
+logger = get_logger("server")
+
+# Local schedule server: one process owns the ScheduleManager (and its journal) and several GUIs
+# edit it at the same time. Messages are JSON objects, one per line:
+#
+#   server -> client  {"type": "snapshot", "seq": n, "schedule": {...to_dict()...}}
+#                     {"type": "ops", "seq": n, "records": [...]}      changes made by other clients
+#                     {"type": "ack", "id": i, "seq": n}               a batch was applied
+#                     {"type": "reject", "id": i, "reason": "..."}     a batch (or a malformed message) was
+#                                                                      refused, nothing applied
+#   client -> server  {"type": "submit", "id": i, "base": n, "ops": [...]}
+#                     {"type": "sync"}                                 ask for a new snapshot
+#
+# Locking is optimistic and per slot: every (room / trimester / instructor, day, time_slot) and every
+# section remembers the sequence number of the last batch that touched it. A batch is refused when
+# one of the slots it touches was changed by another client after `base`, the last sequence number
+# that client had seen, so nobody overwrites a change they have not seen. Editors working on
+# different trimesters and rooms never touch the same slots and never block each other.
+#
+#   python server.py                          # serve schedule.hbs/schedule.journal on localhost
+#   python main.py --connect 127.0.0.1:8765   # GUI as a client of that server
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+LINE_LIMIT = 64 * 1024 * 1024  # Snapshots of large schedules are long lines
+
+
+# Raised when a batch touches slots another client changed since the batch's base
+class EditConflict(SchedulingError):
+    pass
+
+
+def encode_message(message):
+    return (json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def message_problem(message):
+    # Why a client message cannot be handled, or None; checked before any of it is used
+    if not isinstance(message, dict) or not isinstance(message.get("type"), str):
+        return "A message must be an object with a type"
+    if message["type"] == "submit":
+        if not isinstance(message.get("base"), int) or not isinstance(message.get("ops"), list):
+            return "A submit needs a base sequence number and a list of ops"
+        if not all(isinstance(record, dict) for record in message["ops"]):
+            return "Every op must be an object"
+    return None
+
+
+def operation_locks(manager, record):
+    # Slots and sections an operation record reads or writes, computed before it is applied
+    op = record["op"]
+    if op in ("room", "instructor"):
+        return {(op, record["name"])}
+    key = tuple(record["section"])
+    locks = {("section", key)}
+    section = manager.sections_by_key.get(key)
+    if section is None:
+        return locks
+
+    if op == "place":
+        meetings = record["meetings"]
+    elif op == "unplace":
+        meetings = [record["meeting"]]
+    elif op == "move":
+        meetings = [record["meeting"], record["to"]]
+    else:  # assign and delete touch every booked meeting
+        meetings = section.meetings
+    owners = [("room", section.room), ("trimester", section.trimester)]
+    if section.instructor is not None:
+        owners.append(("instructor", section.instructor))
+    if op == "assign" and record.get("instructor") is not None:
+        owners.append(("instructor", record["instructor"]))
+
+    occupancy = manager.occupancy
+    for day, start in meetings:
+        if day not in occupancy.day_index or start not in occupancy.slot_index:
+            continue  # Applying it will fail and refuse the batch
+        for pair in occupancy.pairs(occupancy.run_mask(day, start, section.duration)):
+            locks.update(owner + pair for owner in owners)
+    return locks
+
+
+class ScheduleServer:
+    def __init__(self, manager, host=DEFAULT_HOST, port=DEFAULT_PORT, journal=None, database=None):
+        self.manager = manager
+        self.host = host
+        self.port = port
+        self.journal = journal  # ScheduleJournal of the manager, synced once per batch
+        self.database = database  # database.ScheduleDatabase attached to the manager, one transaction per batch
+        self.versions = {}  # Lock -> (sequence number, client id) of the last batch that touched it
+        self.clients = {}  # Client id -> StreamWriter
+        self.next_client = 1
+        self.collected = None  # Records emitted while a batch is applied
+        self.server = None
+        manager.add_listener(self.collect)
+
+    def collect(self, record):
+        if self.collected is not None:
+            self.collected.append(record)
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_client, self.host, self.port, limit=LINE_LIMIT)
+        self.port = self.server.sockets[0].getsockname()[1]  # The real one when started on port 0
+        logger.info("Serving the schedule on %s:%d", self.host, self.port)
+        return self.server
+
+    async def serve_forever(self):
+        await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        for writer in list(self.clients.values()):
+            writer.close()
+
+    def snapshot(self):
+        # The schedule carries its calendar, so clients switch to the server's time grid
+        return {"type": "snapshot", "seq": self.manager.sequence, "schedule": self.manager.to_dict()}
+
+    async def handle_client(self, reader, writer):
+        client_id = self.next_client
+        self.next_client += 1
+        self.clients[client_id] = writer
+        logger.info("Client %d connected from %s", client_id, writer.get_extra_info("peername"))
+        try:
+            await self.send(writer, self.snapshot())
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:  # Not JSON (or not UTF-8)
+                    message, problem = None, "A message must be one line of JSON"
+                else:
+                    problem = message_problem(message)
+                if problem is not None:
+                    # Answer instead of dropping the client, so a buggy client sees what it sent wrong
+                    logger.warning("Client %d sent a malformed message: %s", client_id, problem)
+                    message_id = message.get("id") if isinstance(message, dict) else None
+                    await self.send(writer, {"type": "reject", "id": message_id, "reason": problem})
+                elif message["type"] == "submit":
+                    await self.handle_submit(client_id, writer, message)
+                elif message["type"] == "sync":
+                    await self.send(writer, self.snapshot())
+                else:
+                    logger.warning("Client %d sent an unknown message %r", client_id, message["type"])
+        except (ConnectionError, ValueError) as e:
+            logger.warning("Client %d dropped: %s", client_id, e)
+        finally:
+            del self.clients[client_id]
+            writer.close()
+            logger.info("Client %d disconnected", client_id)
+
+    async def handle_submit(self, client_id, writer, message):
+        try:
+            with ExitStack() as stack:
+                for store in (self.journal, self.database):
+                    if store is not None:
+                        stack.enter_context(store.deferred())
+                records = self.submit(client_id, message["base"], message["ops"])
+        except SchedulingError as e:
+            logger.info("Refused batch %s of client %d: %s", message.get("id"), client_id, e)
+            await self.send(writer, {"type": "reject", "id": message.get("id"), "reason": str(e)})
+            return
+        # Queue the ack and the update for everyone before the next batch can run, so every client
+        # sees the batches in the order they were applied
+        writer.write(encode_message({"type": "ack", "id": message.get("id"), "seq": self.manager.sequence}))
+        await self.broadcast({"type": "ops", "seq": self.manager.sequence, "records": records}, client_id)
+
+    def submit(self, client_id, base, records):
+        # Apply a client's batch all or nothing; returns the records the manager emitted
+        applied = self.collected = []
+        touched = set()
+        try:
+            for record in records:
+                if record["op"] == "reset":
+                    raise SchedulingError("Files cannot be loaded while connected to the server")
+                locks = operation_locks(self.manager, record)
+                for lock in locks:
+                    seq, owner = self.versions.get(lock, (0, None))
+                    if seq > base and owner != client_id:
+                        raise EditConflict("Another editor changed these slots in the meantime")
+                touched |= locks
+                self.manager.apply_operation(record)
+        except (SchedulingError, KeyError, TypeError, ValueError) as e:
+            self.collected = None
+            self.rollback(applied)
+            if isinstance(e, SchedulingError):
+                raise
+            raise SchedulingError(f"Invalid operation: {e!r}") from e
+        self.collected = None
+        for lock in touched:
+            self.versions[lock] = (self.manager.sequence, client_id)
+        return applied
+
+    def rollback(self, applied):
+        # Undo the part of a refused batch that was applied; room and instructor additions stay
+        for record in reversed(applied):
+            if record["op"] in ("room", "instructor"):
+                continue
+            for inverse in inverse_operations(record):
+                self.manager.apply_operation(inverse)
+
+    async def send(self, writer, message):
+        writer.write(encode_message(message))
+        await writer.drain()
+
+    async def broadcast(self, message, sender=None):
+        # Send to every client except the sender; all writes are queued before the first await
+        data = encode_message(message)
+        writers = list(self.clients.items())
+        for client_id, writer in writers:
+            if client_id != sender:
+                writer.write(data)
+        for client_id, writer in writers:
+            try:
+                await writer.drain()
+            except ConnectionError:
+                logger.warning("Could not update client %d", client_id)
+
+
+# Client side of the protocol for a GUI (or a script) with its own copy of the schedule.
+# The network runs on an asyncio loop in a background thread; everything that touches the manager
+# happens in poll(), which the owner calls from its own thread (the Tk main loop, every few ms).
+# Local edits are applied at once and sent as one batch per poll(); when the server refuses a batch
+# the client reloads a fresh snapshot, which also undoes the refused edits.
+class ScheduleClient:
+    def __init__(self, manager, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.manager = manager
+        self.host = host
+        self.port = port
+        self.seq = 0  # Last server operation reflected in the manager
+        self.outbox = []  # Local records not sent yet
+        self.inbox = queue.Queue()  # Messages from the server, handled in poll()
+        self.next_batch = 1
+        self.unacked = set()  # Batches sent and not answered yet
+        self.resyncing = False  # Waiting for the snapshot that follows a refused batch
+        self.loop = None
+        self.thread = None
+        self.writer = None
+
+    def connect(self, timeout=10.0):
+        # Connect and load the server's schedule; raises OSError if the server cannot be reached
+        connected = threading.Event()
+        errors = []
+
+        async def run():
+            try:
+                reader, self.writer = await asyncio.open_connection(self.host, self.port, limit=LINE_LIMIT)
+            except OSError as e:
+                errors.append(e)
+                return
+            finally:
+                connected.set()
+            try:
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    self.inbox.put(json.loads(line))
+            except ConnectionError as e:
+                logger.warning("Lost the connection to the server: %s", e)
+            self.inbox.put({"type": "closed"})
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_until_complete, args=(run(),), daemon=True)
+        self.thread.start()
+        if not connected.wait(timeout):
+            raise OSError(f"Timed out connecting to {self.host}:{self.port}")
+        if errors:
+            raise errors[0]
+
+        message = self.inbox.get(timeout=timeout)
+        if message["type"] != "snapshot":
+            raise OSError(f"Unexpected first message from the server: {message['type']}")
+        self.load_snapshot(message)
+        self.manager.add_listener(self.record)
+
+    def close(self):
+        if self.record in self.manager.listeners:
+            self.manager.remove_listener(self.record)
+        if self.writer is not None:
+            self.loop.call_soon_threadsafe(self.writer.close)
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+
+    def record(self, record):
+        # Listener: queue local edits for the next batch (edits made while resyncing are lost anyway)
+        if not self.resyncing:
+            self.outbox.append(record)
+
+    def send(self, message):
+        self.loop.call_soon_threadsafe(self.writer.write, encode_message(message))
+
+    def flush(self):
+        # Send the queued edits as one batch, based on the last server state this copy reflects
+        if not self.outbox or self.resyncing:
+            return
+        records = [{key: value for key, value in record.items() if key != "seq"} for record in self.outbox]
+        self.outbox = []
+        self.send({"type": "submit", "id": self.next_batch, "base": self.seq, "ops": records})
+        self.unacked.add(self.next_batch)
+        self.next_batch += 1
+
+    def poll(self):
+        # Send local edits, then apply what the server sent. Returns events for the caller:
+        # ("changed", records), ("reloaded",), ("rejected", reason) and ("closed",)
+        self.flush()
+        events = []
+        while True:
+            try:
+                message = self.inbox.get_nowait()
+            except queue.Empty:
+                return events
+            kind = message["type"]
+            if kind == "snapshot":
+                self.load_snapshot(message)
+                events.append(("reloaded",))
+            elif kind == "ops":
+                if self.resyncing:
+                    continue  # The snapshot on its way already contains them
+                try:
+                    self.apply_remote(message["records"])
+                except (SchedulingError, KeyError) as e:
+                    # Expected when one of our own batches clashes with it: that batch will be refused
+                    log = logger.info if self.unacked else logger.warning
+                    log("Could not apply a change from the server (%s), reloading", e)
+                    self.request_snapshot()
+                    continue
+                self.seq = message["seq"]
+                events.append(("changed", message["records"]))
+            elif kind == "ack":
+                self.unacked.discard(message["id"])
+                if not self.resyncing:
+                    self.seq = message["seq"]
+            elif kind == "reject":
+                self.unacked.discard(message["id"])
+                self.request_snapshot()
+                events.append(("rejected", message["reason"]))
+            elif kind == "closed":
+                events.append(("closed",))
+
+    def request_snapshot(self):
+        if not self.resyncing:
+            self.resyncing = True
+            self.outbox = []
+            self.send({"type": "sync"})
+
+    def without_listeners(self, function, *args):
+        # Changes that come from the server are neither sent back nor recorded in the local undo history
+        listeners, self.manager.listeners = self.manager.listeners, []
+        try:
+            return function(*args)
+        finally:
+            self.manager.listeners = listeners
+
+    def apply_remote(self, records):
+        def apply():
+            for record in records:
+                self.manager.apply_operation(record)
+        self.without_listeners(apply)
+
+    def load_snapshot(self, message):
+        self.without_listeners(self.manager.load_dict, message["schedule"])
+        self.manager.rebuild_class_pools()
+        self.seq = message["seq"]
+        self.resyncing = False
+        self.outbox = []
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve one schedule to several GUI clients on this machine.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="address to listen on (default %(default)s)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port to listen on (default %(default)s)")
+    parser.add_argument("--journal", default="schedule.journal", help="operation journal (default %(default)s)")
+    parser.add_argument("--snapshot", default="schedule.hbs", help="journal snapshot (default %(default)s)")
+    parser.add_argument("--calendar", metavar="FILE", help="time grid (JSON, see timegrid.py) for a new schedule")
+    parser.add_argument("--database", metavar="FILE", help="also keep the schedule up to date in this SQLite file")
+    args = parser.parse_args(argv)
+    configure_logging("INFO")
+
+    from journal import ScheduleJournal
+
+    # The server owns the schedule: it restores and records it exactly like a standalone GUI would
+    manager = ScheduleManager()
+    journal = ScheduleJournal(manager, args.journal, args.snapshot)
+    journal.open()
+    if args.calendar:
+        calendar = Calendar.load(args.calendar)
+        if calendar != manager.calendar:
+            if manager.sections:
+                journal.close()
+                parser.error("--calendar needs an empty schedule: the journal still has classes")
+            try:
+                manager.set_calendar(calendar)
+            except SchedulingError as e:
+                journal.close()
+                parser.error(f"--calendar: {e}")
+    for name, capacity in DEFAULT_CLASSROOMS:
+        if manager.get_classroom(name) is None:
+            manager.add_classroom(name, capacity)
+
+    database = None
+    if args.database:
+        from database import ScheduleDatabase
+        database = ScheduleDatabase(args.database)
+        database.attach(manager)
+
+    server = ScheduleServer(manager, args.host, args.port, journal, database)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        journal.close()
+        if database is not None:
+            database.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
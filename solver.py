@@ -0,0 +1,210 @@
+import os
+import random
+from bisect import bisect_left
+import time
+
+from scheduler import ScheduleManager, SchedulingError
+
+
+# One section the solver has to place
+class SectionRequest:
+    def __init__(self, trimester, course, students, meetings=1, duration=1, instructor=None):
+        self.trimester = trimester
+        self.course = course
+        self.students = students
+        self.meetings = meetings  # Weekly meetings, each on a different day
+        self.duration = duration  # Consecutive time slots per meeting
+        self.instructor = instructor  # Instructor name, or None
+
+    def __repr__(self):
+        return (f"SectionRequest({self.trimester}T: {self.course}, {self.students} students, "
+                f"{self.meetings}x{self.duration} slots)")
+
+
+# Outcome of a solver run: what could be placed, and what could not
+class SolverResult:
+    def __init__(self, assignments, unplaced):
+        self.assignments = assignments  # (SectionRequest, room name, [(day, start time_slot), ...])
+        self.unplaced = unplaced  # SectionRequests with no feasible room and slots
+        self.sections = []  # Sections created by apply()
+
+    def score(self):
+        # Placed sections first, then placed students as a tie-breaker
+        return len(self.assignments), sum(request.students for request, _, _ in self.assignments)
+
+    def apply(self, manager):
+        # Create and book the planned sections in the manager
+        for request, room, meetings in self.assignments:
+            section = manager.create_section(request.course, request.students, room, request.trimester,
+                                             duration=request.duration, days=[day for day, _ in meetings],
+                                             instructor=request.instructor)
+            manager.place_meetings(section.id, meetings)
+            self.sections.append(section)
+        return self.sections
+
+
+def build_requests(offerings):
+    # offerings: {trimester: [(course, sections, students[, meetings[, duration[, instructor]]]), ...]}
+    requests = []
+    for trimester, courses in offerings.items():
+        for offering in courses:
+            course, sections, students = offering[:3]
+            meetings = offering[3] if len(offering) > 3 else 1
+            duration = offering[4] if len(offering) > 4 else 1
+            instructor = offering[5] if len(offering) > 5 else None
+            requests.extend(SectionRequest(trimester, course, students, meetings, duration, instructor)
+                            for _ in range(sections))
+    return requests
+
+
+def offerings_from_predefined(manager, students, sections=1, meetings=1, duration=1):
+    # One offering per predefined course with the same headcount everywhere
+    return {
+        trimester: [(course, sections, students, meetings, duration) for course in courses]
+        for trimester, courses in manager.predefined_classes.items()
+    }
+
+
+# Greedy placement on top of the manager's occupancy bitsets: the hardest sections (largest
+# headcount, most meetings) go first, each into the smallest room that fits, on the days where
+# its trimester is least busy. Nothing is booked in the manager until SolverResult.apply().
+class TimetableSolver:
+    def __init__(self, manager, offerings, seed=None):
+        self.manager = manager
+        self.requests = build_requests(offerings)
+        self.rng = random.Random(seed) if seed is not None else None
+        for request in self.requests:
+            # Checked up front: solve() reads the instructor's bitsets directly
+            if request.instructor is not None and request.instructor not in manager.instructors:
+                raise SchedulingError(f"Instructor {request.instructor} of {request.course} does not exist")
+
+    def solve(self):
+        occupancy = self.manager.occupancy
+        slots_per_day = occupancy.slots_per_day
+        day_masks = [((1 << slots_per_day) - 1) << (day_idx * slots_per_day) for day_idx in range(len(occupancy.days))]
+
+        # Work on copies so the manager is untouched while planning
+        room_bits = dict(occupancy.rooms)
+        trimester_bits = dict(occupancy.trimesters)
+        instructor_bits = dict(occupancy.instructors)
+        rooms = self.manager.rooms_by_capacity
+
+        requests = list(self.requests)
+        if self.rng is not None:
+            self.rng.shuffle(requests)  # Randomize the order among equally hard sections
+        requests.sort(key=lambda request: (request.students, request.meetings * request.duration), reverse=True)
+
+        assignments = []
+        unplaced = []
+        for request in requests:
+            busy_trimester = trimester_bits.get(request.trimester, 0)
+            busy = busy_trimester | occupancy.blocked  # Blocked periods count as taken
+            if request.instructor is not None:
+                busy |= instructor_bits[request.instructor] | occupancy.unavailable[request.instructor]
+            # Least busy days of the trimester first
+            days = list(range(len(day_masks)))
+            if self.rng is not None:
+                self.rng.shuffle(days)
+            days.sort(key=lambda day_idx: bin(busy_trimester & day_masks[day_idx]).count("1"))
+
+            # Rooms in best-fit order, starting at the first one that is big enough
+            placement = None
+            for idx in range(bisect_left(rooms, (request.students,)), len(rooms)):
+                room_name = rooms[idx][1]
+                free = occupancy.full_mask & ~(room_bits[room_name] | busy)
+                positions = self.pick_positions(free, days, day_masks, request.meetings, request.duration)
+                if positions is not None:
+                    placement = room_name, positions
+                    break
+
+            if placement is None:
+                unplaced.append(request)
+                continue
+
+            room_name, positions = placement
+            run = (1 << request.duration) - 1
+            mask = starts = 0
+            for position in positions:
+                mask |= run << position
+                starts |= 1 << position
+            room_bits[room_name] |= mask
+            trimester_bits[request.trimester] = busy_trimester | mask
+            if request.instructor is not None:
+                instructor_bits[request.instructor] |= mask
+            assignments.append((request, room_name, occupancy.pairs(starts)))
+
+        return SolverResult(assignments, unplaced)
+
+    def pick_positions(self, free, days, day_masks, meetings, duration=1):
+        # Start of a free run of `duration` slots on each of `meetings` different days, or None
+        positions = []
+        for day_idx in days:
+            day_free = free & day_masks[day_idx]
+            # Keep the slots followed by duration - 1 free slots of the same day
+            run_starts = day_free
+            for offset in range(1, duration):
+                run_starts &= day_free >> offset
+            day_free = run_starts
+            if not day_free:
+                continue
+            if self.rng is None:
+                low_bit = day_free & -day_free  # Earliest free slot of the day
+                positions.append(low_bit.bit_length() - 1)
+            else:
+                candidates = []
+                while day_free:
+                    low_bit = day_free & -day_free
+                    candidates.append(low_bit.bit_length() - 1)
+                    day_free ^= low_bit
+                positions.append(self.rng.choice(candidates))
+            if len(positions) == meetings:
+                return positions
+        return None
+
+
+def solve_timetable(manager, offerings, seed=None, apply=True):
+    # Plan a conflict-free placement of the offerings and (by default) book it in the manager
+    result = TimetableSolver(manager, offerings, seed).solve()
+    if apply:
+        result.apply(manager)
+    return result
+
+
+def multi_start(snapshot, offerings, first_seed, seed_step, deadline):
+    # Randomized restarts inside one worker until the deadline (wall clock) or a complete plan
+    manager = ScheduleManager()
+    manager.load_dict(snapshot)
+    best = None
+    seed = first_seed
+    while True:
+        result = TimetableSolver(manager, offerings, seed).solve()
+        if best is None or result.score() > best.score():
+            best = result
+        if not best.unplaced or time.time() >= deadline:
+            return best
+        seed += seed_step
+
+
+def solve_parallel(manager, offerings, workers=None, time_budget=5.0, seed=0, apply=True):
+    # Run multi_start in a process pool and keep the best-scoring plan.
+    # Each worker rebuilds the manager from a snapshot, so the schedule is sent once per worker.
+    from concurrent.futures import ProcessPoolExecutor  # Pulls in multiprocessing; only needed here
+
+    workers = workers or os.cpu_count() or 1
+    snapshot = manager.to_dict()
+    deadline = time.time() + time_budget
+
+    # The deterministic greedy run is always one of the candidates
+    best = TimetableSolver(manager, offerings).solve()
+    if best.unplaced:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(multi_start, snapshot, offerings, seed + worker, workers, deadline)
+                       for worker in range(workers)]
+            for future in futures:
+                result = future.result()
+                if result.score() > best.score():
+                    best = result
+
+    if apply:
+        best.apply(manager)
+    return best
@@ -0,0 +1,252 @@
+import json
+import struct
+import sys
+import zlib
+from array import array
+
+from scheduler import ScheduleManager, SchedulingError
+from timegrid import Calendar
+
+# Compact schedule format (.hbs): zlib-compressed columns of integers plus one table of interned
+# strings (courses, rooms, days, time slots), so labels are never stored and loading is a handful
+# of array reads. Archives (.hba) bundle many schedules with an index so each one loads on its own.
+
+COMPACT_EXTENSION = ".hbs"
+ARCHIVE_EXTENSION = ".hba"
+MAGIC = b"HBS4"
+# HBS2 added room buildings/features, HBS3 instructors, HBS4 the calendar (blocked periods, day hours)
+VERSIONS = {b"HBS1": 1, b"HBS2": 2, b"HBS3": 3, MAGIC: 4}
+ARCHIVE_MAGIC = b"HBA1"
+
+# string blob size, rooms, sections, meetings, days, slots, instructors, availability windows
+HEADER = struct.Struct("<8I")
+LEGACY_HEADER = struct.Struct("<6I")  # HBS1/HBS2: no instructor counts
+TRAILER = struct.Struct("<Q")  # Manager operation sequence number the snapshot was taken at
+CALENDAR = struct.Struct("<I")  # Size of the calendar JSON that follows the trailer (HBS4)
+ARCHIVE_ENTRY = struct.Struct("<HQQ")  # name size, payload offset, payload size
+
+# Column types, in file order
+ROOM_COLUMNS = ("name", "capacity", "building", "features")
+FEATURE_SEPARATOR = ";"
+INSTRUCTOR_COLUMNS = ("name", "windows")
+SECTION_COLUMNS = ("course", "trimester", "number", "room", "students", "duration", "days", "meetings",
+                   "instructor")  # Instructor string id + 1, 0 when unassigned
+
+
+def _to_bytes(column):
+    if sys.byteorder == "big":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def _from_bytes(typecode, data, offset, count):
+    column = array(typecode)
+    size = column.itemsize * count
+    column.frombytes(data[offset:offset + size])
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column, offset + size
+
+
+def encode_schedule(manager):
+    strings = []
+    string_ids = {}
+
+    def intern(text):
+        string_id = string_ids.get(text)
+        if string_id is None:
+            string_id = string_ids[text] = len(strings)
+            strings.append(text)
+        return string_id
+
+    day_ids = array("I", (intern(day) for day in manager.days_of_week))
+    slot_ids = array("I", (intern(time_slot) for time_slot in manager.time_slots))
+    day_index = {day: idx for idx, day in enumerate(manager.days_of_week)}
+    slot_index = {time_slot: idx for idx, time_slot in enumerate(manager.time_slots)}
+
+    rooms = {column: array("I") for column in ROOM_COLUMNS}
+    for room in manager.classrooms:
+        rooms["name"].append(intern(room.name))
+        rooms["capacity"].append(room.capacity)
+        rooms["building"].append(intern(room.building))
+        rooms["features"].append(intern(FEATURE_SEPARATOR.join(room.features)))
+
+    instructors = {column: array("I") for column in INSTRUCTOR_COLUMNS}
+    windows = {column: array(typecode) for column, typecode in (("day", "B"), ("first", "H"), ("last", "H"))}
+    for instructor in manager.instructors.values():
+        instructors["name"].append(intern(instructor.name))
+        instructors["windows"].append(len(instructor.windows))
+        for day, first, last in instructor.windows:
+            windows["day"].append(day_index[day])
+            windows["first"].append(slot_index[first])
+            windows["last"].append(slot_index[last])
+
+    sections = {column: array("I") for column in SECTION_COLUMNS}
+    meeting_days = array("B")
+    meeting_slots = array("H")
+    for section in manager.sections.values():
+        sections["course"].append(intern(section.course))
+        sections["trimester"].append(section.trimester)
+        sections["number"].append(section.number)
+        sections["room"].append(intern(section.room))
+        sections["students"].append(section.students)
+        sections["duration"].append(section.duration)
+        sections["days"].append(sum(1 << day_index[day] for day in section.days))
+        sections["meetings"].append(len(section.meetings))
+        sections["instructor"].append(0 if section.instructor is None else intern(section.instructor) + 1)
+        for day, time_slot in sorted(section.meetings):
+            meeting_days.append(day_index[day])
+            meeting_slots.append(slot_index[time_slot])
+
+    string_blob = "\0".join(strings).encode("utf-8")
+    parts = [
+        HEADER.pack(len(string_blob), len(manager.classrooms), len(manager.sections), len(meeting_days),
+                    len(day_ids), len(slot_ids), len(manager.instructors), len(windows["day"])),
+        string_blob, _to_bytes(day_ids), _to_bytes(slot_ids),
+    ]
+    parts.extend(_to_bytes(rooms[column]) for column in ROOM_COLUMNS)
+    parts.extend(_to_bytes(instructors[column]) for column in INSTRUCTOR_COLUMNS)
+    parts.extend(_to_bytes(windows[column]) for column in ("day", "first", "last"))
+    parts.extend(_to_bytes(sections[column]) for column in SECTION_COLUMNS)
+    parts.append(_to_bytes(meeting_days))
+    parts.append(_to_bytes(meeting_slots))
+    parts.append(TRAILER.pack(manager.sequence))
+    calendar = json.dumps(manager.calendar.to_dict(), separators=(",", ":")).encode("utf-8")
+    parts += [CALENDAR.pack(len(calendar)), calendar]
+    return MAGIC + zlib.compress(b"".join(parts))
+
+
+def decode_schedule(payload, manager=None):
+    # Rebuild a ScheduleManager (a new one unless one is given) from encode_schedule() output
+    version = VERSIONS.get(payload[:len(MAGIC)])
+    if version is None:
+        raise ValueError("Not a compact schedule file")
+    data = zlib.decompress(payload[len(MAGIC):])
+    if version >= 3:
+        blob_size, room_count, section_count, meeting_count, day_count, slot_count, instructor_count, \
+            window_count = HEADER.unpack_from(data)
+        offset = HEADER.size
+    else:
+        blob_size, room_count, section_count, meeting_count, day_count, slot_count = LEGACY_HEADER.unpack_from(data)
+        instructor_count = window_count = 0
+        offset = LEGACY_HEADER.size
+    strings = data[offset:offset + blob_size].decode("utf-8").split("\0")
+    offset += blob_size
+
+    day_ids, offset = _from_bytes("I", data, offset, day_count)
+    slot_ids, offset = _from_bytes("I", data, offset, slot_count)
+    rooms = {}
+    for column in ROOM_COLUMNS if version >= 2 else ROOM_COLUMNS[:2]:
+        rooms[column], offset = _from_bytes("I", data, offset, room_count)
+    instructors = {column: array("I") for column in INSTRUCTOR_COLUMNS}
+    windows = {}
+    if version >= 3:
+        for column in INSTRUCTOR_COLUMNS:
+            instructors[column], offset = _from_bytes("I", data, offset, instructor_count)
+        for column, typecode in (("day", "B"), ("first", "H"), ("last", "H")):
+            windows[column], offset = _from_bytes(typecode, data, offset, window_count)
+    sections = {}
+    for column in SECTION_COLUMNS if version >= 3 else SECTION_COLUMNS[:-1]:
+        sections[column], offset = _from_bytes("I", data, offset, section_count)
+    meeting_days, offset = _from_bytes("B", data, offset, meeting_count)
+    meeting_slots, offset = _from_bytes("H", data, offset, meeting_count)
+    sequence, = TRAILER.unpack_from(data, offset) if len(data) >= offset + TRAILER.size else (0,)
+
+    days = [strings[string_id] for string_id in day_ids]
+    time_slots = [strings[string_id] for string_id in slot_ids]
+
+    if manager is None:
+        manager = ScheduleManager()
+    if version >= 4:
+        offset += TRAILER.size
+        calendar_size, = CALENDAR.unpack_from(data, offset)
+        offset += CALENDAR.size
+        manager.calendar = Calendar.from_dict(json.loads(data[offset:offset + calendar_size].decode("utf-8")))
+    elif days != manager.days_of_week or time_slots != manager.time_slots:
+        manager.calendar = Calendar.from_labels(days, time_slots)
+    manager.clear()
+    for idx, name_id in enumerate(rooms["name"]):
+        if version >= 2:
+            features = strings[rooms["features"][idx]]
+            manager.add_classroom(strings[name_id], rooms["capacity"][idx], strings[rooms["building"][idx]],
+                                  features.split(FEATURE_SEPARATOR) if features else ())
+        else:
+            manager.add_classroom(strings[name_id], rooms["capacity"][idx])
+
+    window_idx = 0
+    for name_id, window_total in zip(instructors["name"], instructors["windows"]):
+        manager.add_instructor(strings[name_id], [
+            (days[windows["day"][position]], time_slots[windows["first"][position]],
+             time_slots[windows["last"][position]])
+            for position in range(window_idx, window_idx + window_total)
+        ])
+        window_idx += window_total
+
+    meeting_idx = 0
+    for idx in range(section_count):
+        pattern = sections["days"][idx]
+        meetings = [(days[meeting_days[position]], time_slots[meeting_slots[position]])
+                    for position in range(meeting_idx, meeting_idx + sections["meetings"][idx])]
+        meeting_idx += len(meetings)
+        course, room = strings[sections["course"][idx]], strings[sections["room"][idx]]
+        instructor_id = sections["instructor"][idx] if version >= 3 else 0
+        try:
+            section = manager.create_section(course, sections["students"][idx], room, sections["trimester"][idx],
+                                             sections["number"][idx], sections["duration"][idx],
+                                             [day for bit, day in enumerate(days) if pattern >> bit & 1],
+                                             strings[instructor_id - 1] if instructor_id else None)
+            manager.place_meetings(section.id, meetings)
+        except (SchedulingError, KeyError):
+            manager.rejected_bookings.extend((day, time_slot, course) for day, time_slot in meetings)
+    manager.sequence = sequence
+    return manager
+
+
+def save_compact(manager, file_name):
+    with open(file_name, "wb") as outfile:
+        outfile.write(encode_schedule(manager))
+
+
+def load_compact(file_name, manager=None):
+    with open(file_name, "rb") as infile:
+        return decode_schedule(infile.read(), manager)
+
+
+def save_archive(file_name, managers):
+    # managers: {schedule name: ScheduleManager}
+    payloads = [(name.encode("utf-8"), encode_schedule(manager)) for name, manager in managers.items()]
+    index_size = 8 + sum(ARCHIVE_ENTRY.size + len(name) for name, _ in payloads)
+    offset = index_size
+    index = [ARCHIVE_MAGIC, struct.pack("<I", len(payloads))]
+    for name, payload in payloads:
+        index.append(ARCHIVE_ENTRY.pack(len(name), offset, len(payload)) + name)
+        offset += len(payload)
+    with open(file_name, "wb") as outfile:
+        outfile.write(b"".join(index))
+        for _, payload in payloads:
+            outfile.write(payload)
+
+
+def read_archive_index(infile):
+    # {schedule name: (offset, size)} without reading any schedule
+    if infile.read(len(ARCHIVE_MAGIC)) != ARCHIVE_MAGIC:
+        raise ValueError("Not a schedule archive")
+    count, = struct.unpack("<I", infile.read(4))
+    index = {}
+    for _ in range(count):
+        name_size, offset, size = ARCHIVE_ENTRY.unpack(infile.read(ARCHIVE_ENTRY.size))
+        index[infile.read(name_size).decode("utf-8")] = (offset, size)
+    return index
+
+
+def load_archive(file_name, names=None):
+    # {schedule name: ScheduleManager}, only for `names` when given
+    managers = {}
+    with open(file_name, "rb") as infile:
+        for name, (offset, size) in read_archive_index(infile).items():
+            if names is not None and name not in names:
+                continue
+            infile.seek(offset)
+            managers[name] = decode_schedule(infile.read(size))
+    return managers
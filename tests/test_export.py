@@ -0,0 +1,61 @@
+import csv
+
+import pytest
+
+from export import export_schedule, sheet_rows, sheet_title
+from scheduler import ScheduleManager
+from timegrid import Calendar
+
+
+@pytest.fixture
+def manager():
+    manager = ScheduleManager()
+    manager.set_calendar(Calendar(days=["Monday", "Tuesday"], start="08:00 AM", end="11:00 AM",
+                                  blocked=[(None, "10:00 AM", "10:30 AM", "Break")]))
+    manager.add_classroom("P310", 30)
+    manager.add_classroom("B3", 30)
+    section = manager.create_section("Calculus", 20, "P310", 1, duration=2)
+    manager.place_section(section.id, "Tuesday", "08:30 AM")
+    return manager
+
+
+def test_sheet_rows_are_the_grid(manager):
+    label = manager.sections_by_key[(1, "Calculus", 1)].label()
+    assert sheet_rows(manager, classroom="P310") == [
+        ["08:00 AM", "", ""],
+        ["08:30 AM", "", label],
+        ["09:00 AM", "", label],
+        ["09:30 AM", "", ""],
+        ["10:00 AM", "Break", "Break"],
+        ["10:30 AM", "", ""],
+    ]
+    assert sheet_rows(manager, classroom="B3")[1] == ["08:30 AM", "", ""]
+    assert sheet_rows(manager, trimester=1) == sheet_rows(manager, classroom="P310")
+
+
+def test_csv_export_by_room(manager, tmp_path):
+    file_name = str(tmp_path / "rooms.csv")
+    progress = []
+    assert export_schedule(manager, file_name, by="room", progress=lambda *args: progress.append(args)) == [file_name]
+    with open(file_name, newline="", encoding="utf-8") as infile:
+        rows = list(csv.reader(infile))
+    assert rows[0] == ["Sheet", "Time", "Monday", "Tuesday"]
+    assert [row[0] for row in rows[1:]] == ["P310"] * 6 + ["B3"] * 6
+    assert rows[1:7] == [["P310"] + row for row in sheet_rows(manager, classroom="P310")]
+    assert progress == [(1, 2, "P310"), (2, 2, "B3")]
+
+
+def test_xlsx_export_by_building(manager, tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    files = export_schedule(manager, str(tmp_path / "rooms.xlsx"), by="building")
+    assert sorted(files) == sorted([str(tmp_path / "rooms-P.xlsx"), str(tmp_path / "rooms-B.xlsx")])
+    worksheet = openpyxl.load_workbook(str(tmp_path / "rooms-P.xlsx"))["P310"]
+    assert [cell.value for cell in worksheet[3]] == ["08:30 AM", None, manager.sections_by_key[(1, "Calculus", 1)].label()]
+
+
+def test_sheet_titles_are_excel_safe_and_unique():
+    used = set()
+    assert sheet_title("Lab: 1/2", used) == "Lab_ 1_2"
+    long_name = "A very long room name that Excel cannot use"
+    first, second = sheet_title(long_name, used), sheet_title(long_name, used)
+    assert len(first) == len(second) == 31 and first != second
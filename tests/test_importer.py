@@ -0,0 +1,87 @@
+import pytest
+
+from importer import ImportValidationError, import_instructors, import_offerings, import_rooms, parse_offerings
+from scheduler import ScheduleManager
+from timegrid import Calendar
+
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_rooms_import_with_aliases(tmp_path):
+    manager = ScheduleManager()
+    manager.add_classroom("P310", 30)
+    file_name = write(tmp_path, "rooms.csv", "Salon,Capacidad,Edificio,Equipment\n"
+                                             "LAB-1,25,LAB,projector; computers\n"
+                                             "\n"
+                                             "Aula Magna,120,,\n")
+    added = import_rooms(manager, file_name)
+    assert [(room.name, room.capacity, room.building, room.features) for room in added] == [
+        ("LAB-1", 25, "LAB", ("projector", "computers")), ("Aula Magna", 120, "AULA", ())]
+    assert [room.name for room in manager.classrooms] == ["P310", "LAB-1", "Aula Magna"]
+
+
+def test_every_problem_is_reported_and_nothing_imported(tmp_path):
+    manager = ScheduleManager()
+    manager.add_classroom("P310", 30)
+    file_name = write(tmp_path, "rooms.csv", "room,capacity\n"
+                                             "P310,30\n"
+                                             "B3,many\n"
+                                             ",20\n"
+                                             "B4,0\n"
+                                             "B5,40\n")
+    with pytest.raises(ImportValidationError) as error:
+        import_rooms(manager, file_name)
+    assert [row for row, _ in error.value.problems] == [2, 3, 4, 5]
+    assert [room.name for room in manager.classrooms] == ["P310"]
+
+    with pytest.raises(ImportValidationError) as error:
+        import_rooms(manager, write(tmp_path, "bad.csv", "room,seats_total\nB3,20\n"))
+    assert "capacity" in error.value.problems[0][1]
+
+
+def test_offering_durations_are_minutes(tmp_path):
+    calendar = Calendar(slot_minutes=15)
+    file_name = write(tmp_path, "offerings.csv", "trimester,course,sections,students,meetings,minutes,teacher\n"
+                                                 "1,Calculus,2,30,2,90,Ana\n"
+                                                 "1,Physics,1,25,,,\n")
+    assert parse_offerings(file_name, calendar) == {1: [("Calculus", 2, 30, 2, 6, "Ana"), ("Physics", 1, 25, 1, 1, None)]}
+    assert parse_offerings(file_name) == {1: [("Calculus", 2, 30, 2, 3, "Ana"), ("Physics", 1, 25, 1, 1, None)]}
+
+    older = write(tmp_path, "older.csv", "trimester,course,sections,students,slots\n1,Calculus,1,30,2\n")
+    assert parse_offerings(older) == {1: [("Calculus", 1, 30, 1, 2, None)]}
+
+    bad = write(tmp_path, "bad.csv", "trimester,course,sections,students,meetings,minutes\n"
+                                     "1,Calculus,1,30,2,45\n"
+                                     "1,Physics,1,30,6,60\n"
+                                     "1,Chemistry,1,30,1,600\n")
+    with pytest.raises(ImportValidationError) as error:
+        parse_offerings(bad)
+    assert [row for row, _ in error.value.problems] == [2, 3, 4]
+
+
+def test_offerings_and_instructors_reach_the_manager(tmp_path):
+    manager = ScheduleManager()
+    instructors = write(tmp_path, "instructors.csv", "name,day,from,to\n"
+                                                     "Ana,monday,8:00,10:30 AM\n"
+                                                     "Ana,Wednesday,13:00,14:00\n"
+                                                     "Luis,,,\n")
+    import_instructors(manager, instructors)
+    assert manager.instructors["Ana"].windows == [("Monday", "08:00 AM", "10:30 AM"),
+                                                  ("Wednesday", "01:00 PM", "02:00 PM")]
+    assert manager.instructors["Luis"].windows == []
+
+    offerings = write(tmp_path, "offerings.csv", "trimester,course,sections,students,teacher\n"
+                                                 "2,Physics,1,25,Marta\n")
+    import_offerings(manager, offerings)
+    assert "Marta" in manager.instructors  # Added, available all week
+    assert manager.predefined_classes[2] == ["Physics"]
+
+    bad = write(tmp_path, "bad.csv", "name,day,from,to\nBea,Funday,8:00,9:00\nEva,Monday,8:10,9:00\n"
+                                     "Rui,Monday,11:00,9:00\nAna,,,\n")
+    with pytest.raises(ImportValidationError) as error:
+        import_instructors(manager, bad)
+    assert [row for row, _ in error.value.problems] == [2, 3, 4, 5]
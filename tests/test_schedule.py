@@ -0,0 +1,405 @@
+import asyncio
+import json
+
+import pytest
+
+from database import ScheduleDatabase
+from diff import ADDED, CHANGED, MOVED, REMOVED, SLOT_CONFLICT, diff_schedules, merge_schedules, schedule_states
+from history import ScheduleHistory
+from journal import ScheduleJournal
+from scheduler import ScheduleManager, SchedulingError
+from server import EditConflict, ScheduleServer
+from storage import load_compact, save_compact
+from timegrid import Calendar
+
+# Core behaviour of the headless modules: placement, the journal, undo/redo, the compact format,
+# the server's conflict checks and diff/merge.
+
+
+def state(manager):
+    return sorted((section.key(), section.room, section.students, section.instructor, tuple(sorted(section.meetings)))
+                  for section in manager.sections.values())
+
+
+def occupancy(manager):
+    # Bitsets and views by section key (ids change when a deleted section is recreated)
+    bitsets = manager.occupancy
+
+    def keys(views):
+        return {owner: {position: manager.sections[section_id].key() for position, section_id in view.items()}
+                for owner, view in views.items() if view}
+    return ({owner: bits for owner, bits in bitsets.rooms.items() if bits},
+            {owner: bits for owner, bits in bitsets.trimesters.items() if bits},
+            {owner: bits for owner, bits in bitsets.instructors.items() if bits},
+            keys(manager.room_views), keys(manager.trimester_views), keys(manager.instructor_views))
+
+
+def copy_of(manager):
+    copy = ScheduleManager()
+    copy.load_dict(json.loads(json.dumps(manager.to_dict())))
+    return copy
+
+
+@pytest.fixture
+def manager():
+    manager = ScheduleManager()
+    manager.add_classroom("A", 30)
+    manager.add_classroom("B", 60)
+    manager.add_instructor("Ana")
+    return manager
+
+
+def test_place_books_room_and_trimester(manager):
+    day, time_slot = manager.days_of_week[0], manager.time_slots[2]
+    section = manager.create_section("Calculus", 20, "A", 1)
+    manager.place_section(section.id, day, time_slot)
+    assert section.meetings == {(day, time_slot)}
+    assert manager.get_section_at(day, time_slot, classroom="A") is section
+    assert manager.get_section_at(day, time_slot, trimester=1) is section
+    assert not manager.is_time_slot_free(manager.get_classroom("A"), day, time_slot)
+
+    other = manager.create_section("Physics", 20, "A", 2)
+    with pytest.raises(SchedulingError):
+        manager.place_section(other.id, day, time_slot)  # Same room
+    same_group = manager.create_section("Chemistry", 20, "B", 1)
+    with pytest.raises(SchedulingError):
+        manager.place_section(same_group.id, day, time_slot)  # Same trimester
+    assert not other.meetings and not same_group.meetings
+
+
+def test_multi_slot_meetings_are_atomic(manager):
+    days, time_slots = manager.days_of_week, manager.time_slots
+    blocker = manager.create_section("Physics", 20, "A", 2)
+    manager.place_section(blocker.id, days[2], time_slots[4])
+    before = occupancy(manager)
+
+    section = manager.create_section("Calculus", 20, "A", 1, duration=3, days=days[:3])
+    with pytest.raises(SchedulingError):
+        manager.place_pattern(section.id, time_slots[2])  # The third day overlaps the blocker
+    assert not section.meetings and not section.slots
+    assert occupancy(manager) == before
+
+    with pytest.raises(SchedulingError):
+        manager.place_section(section.id, days[0], time_slots[-2])  # Runs past the end of the day
+    assert occupancy(manager) == before
+
+    manager.place_pattern(section.id, time_slots[5])
+    assert len(section.slots) == 9
+    manager.unplace_section(section.id, days[1], time_slots[6])  # Any covered slot frees the meeting
+    assert section.meetings == {(days[0], time_slots[5]), (days[2], time_slots[5])}
+    assert manager.is_time_slot_free(manager.get_classroom("A"), days[1], time_slots[5])
+    assert manager.is_time_slot_free(manager.get_classroom("A"), days[1], time_slots[7])
+
+
+def test_failed_move_keeps_the_meeting(manager):
+    days, time_slots = manager.days_of_week, manager.time_slots
+    first = manager.create_section("Calculus", 20, "A", 1, duration=2)
+    second = manager.create_section("Physics", 20, "A", 2)
+    manager.place_section(first.id, days[0], time_slots[0])
+    manager.place_section(second.id, days[0], time_slots[3])
+    before = occupancy(manager)
+    with pytest.raises(SchedulingError):
+        manager.move_section(first.id, days[0], time_slots[1], days[0], time_slots[2])
+    assert first.meetings == {(days[0], time_slots[0])}
+    assert occupancy(manager) == before
+
+
+def test_journal_replays_after_a_crash(manager, tmp_path):
+    journal_file, snapshot_file = str(tmp_path / "schedule.journal"), str(tmp_path / "schedule.hbs")
+    journal = ScheduleJournal(manager, journal_file, snapshot_file, compact_every=3, fsync=False)
+    journal.open()
+    days, time_slots = manager.days_of_week, manager.time_slots
+    for idx, course in enumerate(("Calculus", "Physics", "Chemistry", "Biology")):
+        section = manager.create_section(course, 20, "A", idx + 1, duration=2)
+        manager.place_section(section.id, days[idx], time_slots[idx])
+    section = manager.sections_by_key[(1, "Calculus", 1)]
+    manager.move_section(section.id, days[0], time_slots[0], days[4], time_slots[6])
+    manager.delete_section(manager.sections_by_key[(2, "Physics", 1)].id)
+    expected = state(manager)
+
+    # Crash in the middle of writing a record: no close(), a torn last line
+    journal.outfile.write('{"op": "pla')
+    journal.outfile.flush()
+
+    restored = ScheduleManager()
+    replayed = ScheduleJournal(restored, journal_file, snapshot_file, fsync=False)
+    assert replayed.open() > 0
+    assert state(restored) == expected
+    assert restored.sequence == manager.sequence
+    assert occupancy(restored) == occupancy(manager)
+
+    # New records go on a clean line after the torn one was dropped
+    restored.unplace_section(restored.sections_by_key[(3, "Chemistry", 1)].id, days[2], time_slots[2])
+    expected = state(restored)
+    replayed.outfile.close()
+    again = ScheduleManager()
+    ScheduleJournal(again, journal_file, snapshot_file, fsync=False).open()
+    assert state(again) == expected
+
+
+def test_undo_and_redo_are_inverses(manager):
+    history = ScheduleHistory(manager)
+    days, time_slots = manager.days_of_week, manager.time_slots
+    states = [state(manager)]
+
+    section = manager.create_section("Calculus", 20, "A", 1, duration=2, days=days[:2])
+    states.append(state(manager))
+    manager.place_pattern(section.id, time_slots[1])
+    states.append(state(manager))
+    manager.move_section(section.id, days[1], time_slots[2], days[3], time_slots[5])
+    states.append(state(manager))
+    manager.assign_instructor(section.id, "Ana")
+    states.append(state(manager))
+    with history.batch():
+        manager.unplace_section(section.id, days[0], time_slots[1])
+        other = manager.create_section("Physics", 40, "B", 1)
+        manager.place_section(other.id, days[0], time_slots[1])
+    states.append(state(manager))
+    manager.delete_section(section.id)
+    states.append(state(manager))
+    after = occupancy(manager)
+
+    for expected in reversed(states[:-1]):
+        history.undo()
+        assert state(manager) == expected
+    assert not history.can_undo()
+    assert not manager.sections and occupancy(manager) == occupancy(ScheduleManager())
+
+    for expected in states[1:]:
+        history.redo()
+        assert state(manager) == expected
+    assert occupancy(manager) == after
+    assert not history.can_redo()
+
+
+def test_compact_format_round_trip(manager, tmp_path):
+    days, time_slots = manager.days_of_week, manager.time_slots
+    calculus = manager.create_section("Cálculo", 25, "A", 1, duration=3, days=[days[0], days[2]], instructor="Ana")
+    manager.place_pattern(calculus.id, time_slots[4])
+    manager.create_section("Physics", 40, "B", 2)  # Created but not placed
+    manager.add_classroom("LAB1", 20, "LAB", ("computers",))
+    file_name = str(tmp_path / "schedule.hbs")
+    save_compact(manager, file_name)
+
+    loaded = load_compact(file_name)
+    assert state(loaded) == state(manager)
+    assert loaded.calendar == manager.calendar
+    assert [(room.name, room.capacity, room.building, tuple(room.features)) for room in loaded.classrooms] == \
+        [(room.name, room.capacity, room.building, tuple(room.features)) for room in manager.classrooms]
+    assert occupancy(loaded) == occupancy(manager)
+    assert loaded.sections_by_key[(1, "Cálculo", 1)].days == [days[0], days[2]]
+
+
+def test_server_rejects_stale_edits(manager):
+    server = ScheduleServer(manager)
+    base = manager.sequence
+    days, time_slots = manager.days_of_week, manager.time_slots
+
+    def batch(edit):
+        # Records a client produces for `edit` on its own copy of the schedule
+        copy, records = copy_of(manager), []
+        copy.add_listener(records.append)
+        edit(copy)
+        return records
+
+    def book(course, trimester, time_slot):
+        def edit(copy):
+            section = copy.create_section(course, 20, "A", trimester)
+            copy.place_section(section.id, days[0], time_slot)
+        return edit
+
+    first = batch(book("Calculus", 1, time_slots[0]))
+    clashing = batch(book("Physics", 2, time_slots[0]))
+    elsewhere = batch(book("Chemistry", 3, time_slots[5]))
+
+    server.submit(1, base, first)
+    before = state(manager)
+    with pytest.raises(EditConflict):
+        server.submit(2, base, clashing)  # Written against a base that did not have client 1's booking
+    assert state(manager) == before
+
+    server.submit(2, base, elsewhere)  # Different slots: no conflict even from an old base
+    assert (3, "Chemistry", 1) in manager.sections_by_key
+
+    before = state(manager)
+    with pytest.raises(SchedulingError):
+        server.submit(2, manager.sequence, batch(book("Biology", 4, time_slots[1])) +
+                      [{"op": "place", "section": [4, "Biology", 1], "meetings": [[days[0], "99:99"]]}])
+    assert state(manager) == before  # Refused batches are rolled back whole
+
+
+def exchange(server, messages):
+    # Replies of a running server to one client sending `messages` (JSON text or objects) in turn
+    async def talk():
+        await server.start()
+        reader, writer = await asyncio.open_connection(server.host, server.port)
+        replies = [json.loads(await reader.readline())]  # The first snapshot
+        for message in messages:
+            line = message if isinstance(message, str) else json.dumps(message)
+            writer.write(line.encode("utf-8") + b"\n")
+            replies.append(json.loads(await reader.readline()))
+        writer.close()
+        await server.close()
+        return replies
+    return asyncio.run(talk())
+
+
+def test_server_answers_malformed_messages(manager):
+    replies = exchange(ScheduleServer(manager, port=0), [
+        'not json', '[1, 2]', '{"id": 1}', '{"type": "submit", "id": 2, "ops": []}',
+        '{"type": "submit", "id": 3, "base": 0, "ops": [5]}',
+        '{"type": "submit", "id": 4, "base": 0, "ops": [{"op": "place"}]}',
+        '{"type": "sync"}',
+    ])
+    assert [reply["type"] for reply in replies] == ["snapshot"] + ["reject"] * 6 + ["snapshot"]
+    assert [reply.get("id") for reply in replies[1:7]] == [None, None, 1, 2, 3, 4]
+
+
+def test_server_batches_reach_an_attached_database(manager, tmp_path):
+    database = ScheduleDatabase(str(tmp_path / "schedule.db"))
+    database.attach(manager)
+    days, time_slots = manager.days_of_week, manager.time_slots
+    copy, records = copy_of(manager), []
+    copy.add_listener(records.append)
+    section = copy.create_section("Calculus", 20, "A", 1, duration=2)
+    copy.place_section(section.id, days[0], time_slots[0])
+    clash = [{"op": "create", "section": [2, "Physics", 1], "room": "A", "students": 20, "duration": 1,
+              "days": None, "instructor": None},
+             {"op": "place", "section": [2, "Physics", 1], "meetings": [[days[0], time_slots[1]]]}]
+
+    replies = exchange(ScheduleServer(manager, port=0, database=database), [
+        {"type": "submit", "id": 1, "base": 0, "ops": records},
+        {"type": "submit", "id": 2, "base": manager.sequence + 2, "ops": clash},
+    ])
+    assert [reply["type"] for reply in replies[1:]] == ["ack", "reject"]
+    assert state(database.load()) == state(manager) == state(copy)
+    database.close()
+
+
+def test_diff_reports_each_kind_of_change(manager):
+    days, time_slots = manager.days_of_week, manager.time_slots
+    for idx, course in enumerate(("Calculus", "Physics", "Chemistry")):
+        section = manager.create_section(course, 20, "A", 1)
+        manager.place_section(section.id, days[idx], time_slots[0])
+    new = copy_of(manager)
+    physics = new.sections_by_key[(1, "Physics", 1)]
+    new.move_section(physics.id, days[1], time_slots[0], days[1], time_slots[3])
+    new.sections_by_key[(1, "Chemistry", 1)].students = 25
+    new.delete_section(new.sections_by_key[(1, "Calculus", 1)].id)
+    new.create_section("Biology", 20, "B", 1)
+
+    changes = {change.key: change.kind for change in diff_schedules(manager, new).changes}
+    assert changes == {(1, "Physics", 1): MOVED, (1, "Chemistry", 1): CHANGED,
+                       (1, "Calculus", 1): REMOVED, (1, "Biology", 1): ADDED}
+    assert len(diff_schedules(manager, copy_of(manager))) == 0
+
+
+def test_merge_takes_both_sides_and_reports_clashes(manager):
+    days, time_slots = manager.days_of_week, manager.time_slots
+    for idx, course in enumerate(("Calculus", "Physics")):
+        section = manager.create_section(course, 20, "A", 1)
+        manager.place_section(section.id, days[idx], time_slots[0])
+    ours, theirs = copy_of(manager), copy_of(manager)
+
+    calculus = ours.sections_by_key[(1, "Calculus", 1)]
+    ours.move_section(calculus.id, days[0], time_slots[0], days[0], time_slots[2])
+    theirs.assign_instructor(theirs.sections_by_key[(1, "Physics", 1)].id, "Ana")
+    mine = ours.create_section("Chemistry", 20, "B", 2)
+    ours.place_section(mine.id, days[3], time_slots[4])
+    other = theirs.create_section("Biology", 20, "B", 3)
+    theirs.place_section(other.id, days[3], time_slots[4])  # Same room and slot as ours
+
+    result = merge_schedules(manager, ours, theirs)
+    merged = schedule_states(result.manager)
+    assert merged[(1, "Calculus", 1)]["meetings"] == {(days[0], time_slots[2])}
+    assert merged[(1, "Physics", 1)]["instructor"] == "Ana"
+    assert merged[(2, "Chemistry", 1)]["meetings"] == {(days[3], time_slots[4])}
+    assert merged[(3, "Biology", 1)]["meetings"] == set()
+    assert [(conflict.kind, conflict.key) for conflict in result.conflicts] == [(SLOT_CONFLICT, (3, "Biology", 1))]
+    assert not result.ok
+
+
+def test_refused_sections_do_not_use_up_group_numbers(manager):
+    manager.create_section("Calculus", 20, "A", 1)
+    with pytest.raises(SchedulingError):
+        manager.create_section("Calculus", 20, "A", 1, number=1)  # Duplicate group
+    with pytest.raises(SchedulingError):
+        manager.create_section("Calculus", 20, "A", 1, duration=0)
+    assert manager.create_section("Calculus", 20, "A", 1).number == 2
+
+
+def test_merge_reports_slots_missing_from_our_calendar(manager):
+    ours = copy_of(manager)
+    theirs = copy_of(manager)
+    theirs.set_calendar(Calendar(days=manager.days_of_week + ["Saturday"], end="08:00 PM"))
+    theirs.add_instructor("Bea", [("Saturday", "06:00 PM", "07:30 PM")])
+    late = theirs.create_section("Calculus", 20, "A", 1, instructor="Bea")
+    theirs.place_section(late.id, "Saturday", "06:00 PM")
+    long = theirs.create_section("Physics", 20, "B", 2, duration=len(theirs.time_slots))
+
+    result = merge_schedules(manager, ours, theirs)
+    assert result.manager.calendar == manager.calendar
+    assert "Bea" in result.manager.instructors
+    assert schedule_states(result.manager)[(1, "Calculus", 1)]["meetings"] == set()
+    assert long.key() not in result.manager.sections_by_key
+    assert {conflict.key for conflict in result.conflicts} == {None, (1, "Calculus", 1), long.key()}
+
+
+def test_rooms_cannot_be_added_twice(manager):
+    with pytest.raises(SchedulingError):
+        manager.add_classroom("A", 100)
+    assert [room.name for room in manager.classrooms] == ["A", "B"]
+    assert manager.get_classroom("A").capacity == 30
+
+    data = manager.to_dict()
+    data["classrooms"].append(dict(data["classrooms"][0], capacity=100))
+    loaded = ScheduleManager()
+    loaded.load_dict(data)
+    assert [(room.name, room.capacity) for room in loaded.classrooms] == [("A", 30), ("B", 60)]
+    first = loaded.create_section("Calculus", 20, "A", 1)
+    second = loaded.create_section("Physics", 20, "A", 2)
+    loaded.place_section(first.id, loaded.days_of_week[0], loaded.time_slots[0])
+    with pytest.raises(SchedulingError):
+        loaded.place_section(second.id, loaded.days_of_week[0], loaded.time_slots[0])
+
+
+def test_find_placements_matches_a_brute_force_search():
+    manager = ScheduleManager()
+    manager.set_calendar(Calendar(blocked=[(None, "01:00 PM", "02:00 PM", "Lunch")],
+                                  day_hours={"Friday": ("08:00 AM", "12:00 PM")}))
+    for name, capacity, features in (("B3", 40, ()), ("P310", 25, ("projector",)), ("LAB1", 25, ()), ("S1", 10, ())):
+        manager.add_classroom(name, capacity, features=features)
+    manager.add_instructor("Ana", [("Monday", "08:00 AM", "11:30 AM"), ("Thursday", "02:00 PM", "04:30 PM")])
+    days, time_slots = manager.days_of_week, manager.time_slots
+    for idx, (course, room, trimester, day, start, duration) in enumerate((
+            ("Calculus", "P310", 1, "Monday", "09:00 AM", 2), ("Physics", "B3", 2, "Thursday", "02:30 PM", 3),
+            ("Chemistry", "LAB1", 1, "Thursday", "03:30 PM", 1))):
+        section = manager.create_section(course, 20, room, trimester, duration=duration,
+                                         instructor="Ana" if idx == 1 else None)
+        manager.place_section(section.id, day, start)
+
+    def brute_force(students, duration, trimester, instructor=None, features=()):
+        rooms = sorted((room.capacity, room.name) for room in manager.classrooms
+                       if room.capacity >= students and set(features) <= set(room.features))
+        found = []
+        for _, name in rooms:
+            room = manager.get_classroom(name)
+            for day in days:
+                for start_idx in range(len(time_slots) - duration + 1):
+                    covered = time_slots[start_idx:start_idx + duration]
+                    if all(manager.is_time_slot_free(room, day, time_slot)
+                           and manager.is_trimester_slot_free(trimester, day, time_slot)
+                           and (instructor is None or
+                                (manager.get_section_at(day, time_slot, instructor=instructor) is None
+                                 and any(window_day == day and manager.calendar.slot_of(first) <= time_slots.index(time_slot)
+                                         <= manager.calendar.slot_of(last)
+                                         for window_day, first, last in manager.instructors[instructor].windows)))
+                           for time_slot in covered):
+                        found.append((name, day, covered[0]))
+        return found
+
+    for query in ((20, 1, 1), (20, 2, 1), (30, 3, 2), (5, 4, 3), (20, 2, 1, "Ana"), (20, 1, 3, None, ("projector",)),
+                  (50, 1, 1)):
+        expected = brute_force(*query)
+        assert manager.find_placements(*query) == expected, query
+        assert expected or query[0] > 40
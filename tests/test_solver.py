@@ -0,0 +1,45 @@
+import pytest
+
+from scheduler import ScheduleManager, SchedulingError
+from solver import solve_timetable
+from validator import validate_document
+
+
+@pytest.fixture
+def manager():
+    manager = ScheduleManager()
+    manager.add_classroom("Small", 20)
+    manager.add_classroom("Large", 60)
+    manager.add_instructor("Ana", [("Tuesday", "08:00 AM", "11:30 AM"), ("Thursday", "08:00 AM", "11:30 AM")])
+    return manager
+
+
+def test_solution_is_conflict_free(manager):
+    offerings = {
+        1: [("Calculus", 2, 18, 2, 3), ("Physics", 1, 50, 2, 2, "Ana")],
+        2: [("Chemistry", 3, 15, 1, 4), ("Biology", 1, 40, 2, 2, "Ana")],
+    }
+    result = solve_timetable(manager, offerings, seed=1)
+    assert not result.unplaced
+    assert len(manager.sections) == 7
+    assert validate_document(manager.to_dict()).ok
+    for section in manager.sections.values():
+        assert manager.get_classroom(section.room).capacity >= section.students
+        if section.instructor == "Ana":
+            assert {day for day, _ in section.meetings} == {"Tuesday", "Thursday"}
+
+
+def test_sections_that_cannot_fit_are_unplaced(manager):
+    result = solve_timetable(manager, {1: [("Lecture", 1, 100), ("Seminar", 1, 10)]})
+    assert [request.course for request in result.unplaced] == ["Lecture"]
+    assert [section.course for section in manager.sections.values()] == ["Seminar"]
+
+    # Ana teaches on two days only, so a third weekly meeting cannot be found
+    result = solve_timetable(manager, {2: [("Statistics", 1, 10, 3, 1, "Ana")]})
+    assert len(result.unplaced) == 1
+
+
+def test_unknown_instructors_are_refused_before_planning(manager):
+    with pytest.raises(SchedulingError):
+        solve_timetable(manager, {1: [("Calculus", 1, 20, 1, 1, "Nobody")]})
+    assert not manager.sections
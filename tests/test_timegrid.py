@@ -0,0 +1,58 @@
+import pytest
+
+from scheduler import ScheduleManager, SchedulingError
+from timegrid import DEFAULT_CALENDAR, Calendar, format_time, parse_time
+
+
+def test_parse_and_format_times():
+    assert [parse_time(text) for text in ("08:00 AM", "8:00am", "13:30", "8 PM", "12:15 a.m.")] == [480, 480, 810, 1200, 15]
+    for text in ("25:00", "13:00 PM", "noon", "8:60"):
+        with pytest.raises(ValueError):
+            parse_time(text)
+    assert [format_time(minutes) for minutes in (15, 480, 720, 810)] == ["12:15 AM", "08:00 AM", "12:00 PM", "01:30 PM"]
+
+
+def test_slots_and_slot_of():
+    calendar = Calendar(start="07:30", end="10:00 AM", slot_minutes=45)
+    assert calendar.time_slots == ["07:30 AM", "08:15 AM", "09:00 AM"]  # 09:45 would end after 10:00
+    assert [calendar.slot_of(text) for text in ("07:30 AM", "8:15", "9:00 am")] == [0, 1, 2]
+    for text in ("08:00 AM", "09:45 AM", "07:00", "later"):
+        with pytest.raises(KeyError):
+            calendar.slot_of(text)
+    assert DEFAULT_CALENDAR.time_slots[-1] == "04:30 PM"
+
+
+def test_blocked_periods_and_day_hours():
+    calendar = Calendar(days=["Monday", "Saturday"], start="08:00 AM", end="12:00 PM",
+                        blocked=[(None, "10:15 AM", "10:45 AM", "Break"), ("Monday", "08:00 AM", "08:30 AM")],
+                        day_hours={"Saturday": ("09:00 AM", "11:00 AM")})
+    blocked = calendar.blocked_pairs()
+    # A slot is lost to any period that overlaps it, even partly
+    assert blocked[("Monday", "10:00 AM")] == blocked[("Monday", "10:30 AM")] == "Break"
+    assert blocked[("Monday", "08:00 AM")] == "blocked"
+    assert ("Monday", "09:00 AM") not in blocked
+    assert [time_slot for (day, time_slot), reason in blocked.items() if day == "Saturday" and reason == "closed"] == \
+        ["08:00 AM", "08:30 AM", "11:00 AM", "11:30 AM"]
+    assert Calendar.from_dict(calendar.to_dict()) == calendar
+
+    with pytest.raises(ValueError):
+        Calendar(blocked=[("Sunday", "08:00 AM", "09:00 AM")])
+    with pytest.raises(ValueError):
+        Calendar(start="08:00 AM", end="08:15 AM")
+
+
+def test_manager_respects_the_calendar():
+    manager = ScheduleManager()
+    manager.add_classroom("A", 30)
+    manager.set_calendar(Calendar(days=["Monday", "Saturday"], slot_minutes=15,
+                                  blocked=[(None, "01:00 PM", "02:00 PM", "Lunch")],
+                                  day_hours={"Saturday": ("08:00 AM", "01:00 PM")}))
+    assert manager.get_classroom("A") is not None
+    section = manager.create_section("Calculus", 20, "A", 1, duration=4)
+    with pytest.raises(SchedulingError, match="Lunch"):
+        manager.place_section(section.id, "Monday", "12:30 PM")
+    with pytest.raises(SchedulingError, match="closed"):
+        manager.place_section(section.id, "Saturday", "12:15 PM")
+    manager.place_section(section.id, "Saturday", "12:00 PM")
+    assert manager.find_placements(20, 4, trimester=1)[0] == ("A", "Monday", "08:00 AM")
+    assert ("A", "Saturday", "12:00 PM") not in manager.find_placements(20, 4, trimester=2)
@@ -0,0 +1,53 @@
+import json
+
+from scheduler import ScheduleManager
+from validator import (DUPLICATE_ROOM, INSTRUCTOR_UNAVAILABLE, OVER_CAPACITY, ROOM_CONFLICT, TRIMESTER_CONFLICT,
+                       UNREADABLE_LABEL, validate_document)
+
+
+def document():
+    # A schedule the app writes itself, with room names the label pattern cannot read
+    manager = ScheduleManager()
+    manager.add_classroom("LAB-1", 30)
+    manager.add_classroom("Aula Magna", 120)
+    manager.add_instructor("Ana", [("Monday", "08:00 AM", "10:30 AM")])
+    days, time_slots = manager.days_of_week, manager.time_slots
+    calculus = manager.create_section("Calculus", 20, "LAB-1", 1, duration=2, instructor="Ana")
+    manager.place_section(calculus.id, days[0], time_slots[0])
+    physics = manager.create_section("Physics", 100, "Aula Magna", 2)
+    manager.place_section(physics.id, days[1], time_slots[3])
+    return json.loads(json.dumps(manager.to_dict()))
+
+
+def kinds(report):
+    return sorted(violation.kind for violation in report.violations)
+
+
+def test_saved_schedules_are_valid():
+    report = validate_document(document())
+    assert report.ok, report.violations
+    assert report.bookings == 3
+
+
+def test_section_records_are_checked():
+    data = document()
+    calculus, physics = data["sections"]
+    physics["room"], physics["trimester"] = "LAB-1", 1
+    physics["meetings"] = [["Monday", "08:30 AM"]]  # Second slot of Calculus, same room and trimester
+    calculus["meetings"].append(["Tuesday", "04:00 PM"])  # Outside Ana's hours
+    data["classrooms"].append(dict(data["classrooms"][0]))
+    assert kinds(validate_document(data)) == sorted([DUPLICATE_ROOM, ROOM_CONFLICT, TRIMESTER_CONFLICT, OVER_CAPACITY,
+                                                     INSTRUCTOR_UNAVAILABLE, INSTRUCTOR_UNAVAILABLE])
+
+
+def test_hand_edited_labels_are_reported_not_raised():
+    data = document()
+    del data["sections"]  # The older format, read from the labels
+    data["classrooms"] = [{"name": "P310", "capacity": 30, "schedule": {"Monday": {"08:00 AM": 5, "09:00 AM": "?"}}}]
+    data["saved_schedule"] = {"Group 1": {"Monday": {"08:00 AM": ["not", "a", "label"]}}}
+    data["class_pools"] = {}
+    assert kinds(validate_document(data)) == [UNREADABLE_LABEL] * 3
+
+    manager = ScheduleManager()
+    manager.load_dict(data)
+    assert not manager.sections and len(manager.rejected_bookings) == 3
@@ -0,0 +1,158 @@
+import json
+import re
+
+# The weekly time grid: which days exist, when each day starts and ends, how long one slot is and
+# which periods (lunch, assemblies, ...) cannot be booked. Everything inside the scheduler works on
+# slot positions (integers); the "08:00 AM" labels are made here, once, and only used at the edges
+# (grid cells, files, operation records).
+#
+#   calendar = Calendar(days=DEFAULT_DAYS + ("Saturday",), slot_minutes=15,
+#                       blocked=[(None, "01:00 PM", "02:00 PM", "Lunch")],
+#                       day_hours={"Saturday": ("08:00 AM", "01:00 PM")})
+
+DEFAULT_DAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday")
+DEFAULT_START = "08:00 AM"
+DEFAULT_END = "05:00 PM"  # End of the last slot, so the last slot starts at 04:30 PM
+DEFAULT_SLOT_MINUTES = 30
+TIME_PATTERN = re.compile(r"^\s*(\d{1,2})(?::(\d{2}))?\s*(?:([AaPp])\.?\s*[Mm]\.?)?\s*$")
+
+
+def parse_time(text):
+    # Minutes since midnight of "08:00 AM", "8:00am", "13:30" or "8 PM"; ValueError for anything else
+    match = TIME_PATTERN.match(str(text))
+    if not match:
+        raise ValueError(f"Invalid time {text!r}")
+    hour, minute, half = int(match.group(1)), int(match.group(2) or 0), match.group(3)
+    if half:
+        if not 1 <= hour <= 12:
+            raise ValueError(f"Invalid time {text!r}")
+        hour = hour % 12 + (12 if half.upper() == "P" else 0)
+    if hour > 23 or minute > 59:
+        raise ValueError(f"Invalid time {text!r}")
+    return hour * 60 + minute
+
+
+def format_time(minutes):
+    # Label of a slot starting `minutes` after midnight, in the "08:00 AM" form used by every file
+    hour, minute = divmod(minutes, 60)
+    return f"{(hour - 1) % 12 + 1:02d}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
+
+
+class Calendar:
+    def __init__(self, days=DEFAULT_DAYS, start=DEFAULT_START, end=DEFAULT_END,
+                 slot_minutes=DEFAULT_SLOT_MINUTES, blocked=(), day_hours=None):
+        # blocked: [(day or None for every day, start, end[, label]), ...]; day_hours: {day: (start, end)}
+        # for days with shorter hours, e.g. Saturday mornings. Times are labels or minutes since midnight.
+        self.days = list(days)
+        self.start = self.minutes(start)
+        self.end = self.minutes(end)
+        self.slot_minutes = int(slot_minutes)
+        if not self.days or len(set(self.days)) != len(self.days):
+            raise ValueError("A calendar needs at least one day and no day twice")
+        if self.slot_minutes < 1 or self.end - self.start < self.slot_minutes:
+            raise ValueError(f"{format_time(self.start)}-{format_time(self.end)} does not hold one "
+                             f"{self.slot_minutes} minute slot")
+
+        self.slot_starts = list(range(self.start, self.end - self.slot_minutes + 1, self.slot_minutes))
+        self.time_slots = [format_time(minutes) for minutes in self.slot_starts]
+        self.day_index = {day: idx for idx, day in enumerate(self.days)}
+        self.slot_index = {time_slot: idx for idx, time_slot in enumerate(self.time_slots)}
+
+        self.blocked = []  # (day or None, start minute, end minute, label)
+        for period in blocked:
+            day, first, last = period[:3]
+            label = period[3] if len(period) > 3 else ""
+            if day is not None and day not in self.day_index:
+                raise ValueError(f"Unknown day {day!r} in blocked period")
+            self.blocked.append((day, self.minutes(first), self.minutes(last), label))
+        self.day_hours = {}  # Day -> (start minute, end minute)
+        for day, (first, last) in (day_hours or {}).items():
+            if day not in self.day_index:
+                raise ValueError(f"Unknown day {day!r} in day hours")
+            self.day_hours[day] = (self.minutes(first), self.minutes(last))
+
+    @staticmethod
+    def minutes(value):
+        return value if isinstance(value, int) else parse_time(value)
+
+    def __eq__(self, other):
+        return other is self or isinstance(other, Calendar) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return (f"Calendar({len(self.days)} days, {format_time(self.start)}-{format_time(self.end)}, "
+                f"{self.slot_minutes} min, {len(self.blocked)} blocked)")
+
+    def slot_of(self, text):
+        # Index of the slot starting at a label in any parse_time form; KeyError if there is none
+        idx = self.slot_index.get(text)
+        if idx is not None:
+            return idx
+        try:
+            offset = parse_time(text) - self.start
+        except ValueError:
+            raise KeyError(text) from None
+        idx, remainder = divmod(offset, self.slot_minutes)
+        if remainder or not 0 <= idx < len(self.time_slots):
+            raise KeyError(text)
+        return idx
+
+    def blocked_slots(self):
+        # {(day index, slot index): reason} of the slots no section may use
+        blocked = {}
+        for day_idx, day in enumerate(self.days):
+            first, last = self.day_hours.get(day, (self.start, self.end))
+            for slot_idx, slot_start in enumerate(self.slot_starts):
+                slot_end = slot_start + self.slot_minutes
+                if slot_start < first or slot_end > last:
+                    blocked[(day_idx, slot_idx)] = "closed"
+                    continue
+                for period_day, period_start, period_end, label in self.blocked:
+                    # A slot is lost to every period it overlaps, even partly
+                    if period_day in (None, day) and slot_start < period_end and slot_end > period_start:
+                        blocked[(day_idx, slot_idx)] = label or "blocked"
+                        break
+        return blocked
+
+    def blocked_pairs(self):
+        # {(day, time_slot): reason}, for validators and grids that work with labels
+        return {(self.days[day_idx], self.time_slots[slot_idx]): reason
+                for (day_idx, slot_idx), reason in self.blocked_slots().items()}
+
+    def to_dict(self):
+        return {
+            "days": list(self.days), "start": format_time(self.start), "end": format_time(self.end),
+            "slot_minutes": self.slot_minutes,
+            "blocked": [{"day": day, "start": format_time(first), "end": format_time(last), "label": label}
+                        for day, first, last, label in self.blocked],
+            "day_hours": {day: [format_time(first), format_time(last)] for day, (first, last) in self.day_hours.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get("days", DEFAULT_DAYS), data.get("start", DEFAULT_START), data.get("end", DEFAULT_END),
+                   data.get("slot_minutes", DEFAULT_SLOT_MINUTES),
+                   [(period.get("day"), period["start"], period["end"], period.get("label", ""))
+                    for period in data.get("blocked", [])],
+                   data.get("day_hours"))
+
+    @classmethod
+    def from_labels(cls, days, time_slots):
+        # Calendar of a plain day list and evenly spaced slot labels, as stored before calendars existed
+        starts = [parse_time(time_slot) for time_slot in time_slots]
+        slot_minutes = starts[1] - starts[0] if len(starts) > 1 else DEFAULT_SLOT_MINUTES
+        calendar = cls(days, starts[0], starts[-1] + slot_minutes, slot_minutes)
+        if calendar.time_slots != list(time_slots):
+            raise ValueError("Time slots are not evenly spaced")
+        return calendar
+
+    @classmethod
+    def load(cls, file_name):
+        with open(file_name) as infile:
+            return cls.from_dict(json.load(infile))
+
+    def save(self, file_name):
+        with open(file_name, "w") as outfile:
+            json.dump(self.to_dict(), outfile, indent=4)
+
+
+DEFAULT_CALENDAR = Calendar()
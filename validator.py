@@ -0,0 +1,275 @@
+import argparse
+import json
+import sys
+
+from instrumentation import get_logger, timed
+from scheduler import CLASS_LABEL_PATTERN, DAYS_OF_WEEK, generate_time_slots
+from timegrid import Calendar
+
+logger = get_logger("validator")
+
+# Whole-schedule validation of a schedule.json/backup.json document.
+# Every booking is visited once: the structured section records when the document has them (the
+# labels in its room and group schedules are only copies, and ScheduleManager.load_dict ignores them
+# too), otherwise the labels of the room and group schedules. Occupancy is tracked in dicts keyed by
+# (room/trimester/instructor, day, time_slot), so the scan is linear in the number of bookings. The
+# same booking seen from several views is not a conflict, two different sections in one slot are.
+
+UNREADABLE_LABEL = "unreadable-label"
+UNKNOWN_SLOT = "unknown-slot"
+BLOCKED_SLOT = "blocked-slot"
+UNKNOWN_ROOM = "unknown-room"
+DUPLICATE_ROOM = "duplicate-room"
+OVER_CAPACITY = "over-capacity"
+WRONG_SCHEDULE = "wrong-schedule"
+ROOM_CONFLICT = "room-conflict"
+TRIMESTER_CONFLICT = "trimester-conflict"
+UNKNOWN_INSTRUCTOR = "unknown-instructor"
+INSTRUCTOR_CONFLICT = "instructor-conflict"
+INSTRUCTOR_UNAVAILABLE = "instructor-unavailable"
+
+
+def section_name(key):
+    trimester, course, number = key
+    return f"{course} (Group {number}, {trimester}T)"
+
+
+# One problem found in the document
+class Violation:
+    def __init__(self, kind, message, day=None, time_slot=None, section=None, room=None, trimester=None):
+        self.kind = kind
+        self.message = message
+        self.day = day
+        self.time_slot = time_slot
+        self.section = section  # (trimester, course, number), when known
+        self.room = room
+        self.trimester = trimester
+
+    def __repr__(self):
+        return f"Violation({self.kind}: {self.message})"
+
+    def to_dict(self):
+        return {
+            "kind": self.kind, "message": self.message, "day": self.day, "time_slot": self.time_slot,
+            "section": list(self.section) if self.section else None, "room": self.room, "trimester": self.trimester,
+        }
+
+
+class ValidationReport:
+    def __init__(self):
+        self.violations = []
+        self.bookings = 0  # Bookings visited
+
+    @property
+    def ok(self):
+        return not self.violations
+
+    def add(self, kind, message, **details):
+        self.violations.append(Violation(kind, message, **details))
+
+    def by_kind(self):
+        # {kind: [Violation, ...]}
+        kinds = {}
+        for violation in self.violations:
+            kinds.setdefault(violation.kind, []).append(violation)
+        return kinds
+
+    def summary(self):
+        if self.ok:
+            return f"No problems in {self.bookings} bookings"
+        counts = ", ".join(f"{len(violations)} {kind}" for kind, violations in sorted(self.by_kind().items()))
+        return f"{len(self.violations)} problems in {self.bookings} bookings: {counts}"
+
+    def to_dict(self):
+        return {"bookings": self.bookings, "violations": [violation.to_dict() for violation in self.violations]}
+
+
+class ScheduleValidator:
+    def __init__(self, days=None, time_slots=None, blocked=None):
+        self.days = list(days or DAYS_OF_WEEK)
+        self.time_slots = list(time_slots or generate_time_slots())
+        self.slot_index = {time_slot: idx for idx, time_slot in enumerate(self.time_slots)}
+        self.blocked = blocked or {}  # (day, time_slot) -> reason, from Calendar.blocked_pairs()
+
+    @timed("validate")
+    def validate(self, data):
+        self.report = ValidationReport()
+        self.rooms = {}  # Room name -> capacity
+        self.room_slots = {}  # (room, day, time_slot) -> section key
+        self.trimester_slots = {}  # (trimester, day, time_slot) -> section key
+        self.instructor_slots = {}  # (instructor, day, time_slot) -> section key
+        self.labels = {}  # Label -> (key, room, students), or None if unreadable
+        self.capacity_checked = set()  # Section keys already checked against their room
+
+        for room_data in data.get("classrooms", []):
+            name = room_data.get("name")
+            if name in self.rooms:
+                self.report.add(DUPLICATE_ROOM, f"Room {name} is listed more than once", room=name)
+                continue  # Loading keeps the first entry too
+            self.rooms[name] = room_data.get("capacity", 0)
+
+        instructors = {}
+        for instructor_data in data.get("instructors", []):
+            instructors[instructor_data["name"]] = self.available_slots(instructor_data.get("windows", ()))
+
+        if "sections" in data:
+            for record in data["sections"]:
+                self.check_record(record, instructors)
+            return self.report
+
+        for room_data in data.get("classrooms", []):
+            for day, time_slots in room_data.get("schedule", {}).items():
+                for time_slot, label in time_slots.items():
+                    self.check_label(day, time_slot, label, schedule_room=room_data.get("name"))
+
+        for schedule_key, schedule in data.get("saved_schedule", {}).items():
+            trimester = self.schedule_trimester(schedule_key)
+            for day, time_slots in schedule.items():
+                for time_slot, label in time_slots.items():
+                    self.check_label(day, time_slot, label, schedule_trimester=trimester)
+
+        return self.report
+
+    def schedule_trimester(self, schedule_key):
+        # "Group 3" -> 3; classroom-keyed entries written by old versions -> None
+        if schedule_key.startswith("Group "):
+            try:
+                return int(schedule_key[len("Group "):])
+            except ValueError:
+                pass
+        return None
+
+    def available_slots(self, windows):
+        # Set of (day, time_slot) inside the windows, or None for "any time"
+        if not windows:
+            return None
+        slots = set()
+        for day, first, last in windows:
+            if first in self.slot_index and last in self.slot_index:
+                slots.update((day, time_slot)
+                             for time_slot in self.time_slots[self.slot_index[first]:self.slot_index[last] + 1])
+        return slots
+
+    def parse(self, label):
+        if not isinstance(label, str):
+            return None  # Hand-edited files may hold numbers, lists or null where a label belongs
+        if label not in self.labels:
+            match = CLASS_LABEL_PATTERN.search(label)
+            self.labels[label] = None if match is None else (
+                (int(match.group(1)), match.group(2), int(match.group(3))), match.group(4), int(match.group(5)))
+        return self.labels[label]
+
+    def check_label(self, day, time_slot, label, schedule_room=None, schedule_trimester=None):
+        self.report.bookings += 1
+        parsed = self.parse(label)
+        if parsed is None:
+            self.report.add(UNREADABLE_LABEL, f"Cannot read the class at {time_slot} on {day}: {label!r}",
+                            day=day, time_slot=time_slot, room=schedule_room, trimester=schedule_trimester)
+            return
+        key, room, students = parsed
+        if schedule_room is not None and schedule_room != room:
+            self.report.add(WRONG_SCHEDULE, f"{label} is in the schedule of {schedule_room}",
+                            day=day, time_slot=time_slot, section=key, room=schedule_room)
+        if schedule_trimester is not None and schedule_trimester != key[0]:
+            self.report.add(WRONG_SCHEDULE, f"{label} is in the schedule of Group {schedule_trimester}",
+                            day=day, time_slot=time_slot, section=key, trimester=schedule_trimester)
+        self.check_booking(key, room, students, day, time_slot)
+
+    def check_record(self, record, instructors):
+        key = (record.get("trimester"), record.get("course"), record.get("number"))
+        duration = record.get("duration", 1)
+        instructor = record.get("instructor")
+        if instructor is not None and instructor not in instructors:
+            self.report.add(UNKNOWN_INSTRUCTOR, f"Instructor {instructor} of {section_name(key)} is not listed",
+                            section=key, trimester=key[0])
+            instructor = None
+        for day, start in record.get("meetings", []):
+            start_idx = self.slot_index.get(start)
+            if start_idx is None or start_idx + duration > len(self.time_slots):
+                self.report.bookings += 1
+                self.report.add(UNKNOWN_SLOT, f"{section_name(key)} starts at an unknown or too late time slot {start} on {day}",
+                                day=day, time_slot=start, section=key, trimester=key[0])
+                continue
+            for time_slot in self.time_slots[start_idx:start_idx + duration]:
+                self.report.bookings += 1
+                if not self.check_booking(key, record.get("room"), record.get("students", 0), day, time_slot):
+                    continue
+                if instructor is None:
+                    continue
+                available = instructors[instructor]
+                if available is not None and (day, time_slot) not in available:
+                    self.report.add(INSTRUCTOR_UNAVAILABLE, f"{instructor} is not available at {time_slot} on {day}",
+                                    day=day, time_slot=time_slot, section=key)
+                other = self.instructor_slots.setdefault((instructor, day, time_slot), key)
+                if other != key:
+                    self.report.add(INSTRUCTOR_CONFLICT, f"{instructor} teaches {section_name(other)} and {section_name(key)} at "
+                                    f"{time_slot} on {day}", day=day, time_slot=time_slot, section=key)
+
+    def check_booking(self, key, room, students, day, time_slot):
+        # Shared checks for one booked (day, time_slot); False when the slot itself is invalid
+        trimester = key[0]
+        course = section_name(key)
+        if day not in self.days or time_slot not in self.slot_index:
+            self.report.add(UNKNOWN_SLOT, f"{course} is booked at an unknown time {time_slot} on {day}",
+                            day=day, time_slot=time_slot, section=key, room=room, trimester=trimester)
+            return False
+        if self.blocked and (day, time_slot) in self.blocked:
+            self.report.add(BLOCKED_SLOT, f"{course} is booked at {time_slot} on {day}, which cannot be booked "
+                            f"({self.blocked[(day, time_slot)]})",
+                            day=day, time_slot=time_slot, section=key, room=room, trimester=trimester)
+
+        if room not in self.rooms:
+            if key not in self.capacity_checked:
+                self.report.add(UNKNOWN_ROOM, f"{course} uses room {room}, which does not exist",
+                                day=day, time_slot=time_slot, section=key, room=room, trimester=trimester)
+            self.capacity_checked.add(key)
+        elif key not in self.capacity_checked:
+            self.capacity_checked.add(key)
+            if students > self.rooms[room]:
+                self.report.add(OVER_CAPACITY, f"{course} has {students} students but {room} holds {self.rooms[room]}",
+                                section=key, room=room, trimester=trimester)
+
+        other = self.room_slots.setdefault((room, day, time_slot), key)
+        if other != key:
+            self.report.add(ROOM_CONFLICT, f"{room} is booked for {section_name(other)} and {course} at {time_slot} on {day}",
+                            day=day, time_slot=time_slot, section=key, room=room, trimester=trimester)
+        other = self.trimester_slots.setdefault((trimester, day, time_slot), key)
+        if other != key:
+            self.report.add(TRIMESTER_CONFLICT, f"Group {trimester} has {section_name(other)} and {course} at {time_slot} on {day}",
+                            day=day, time_slot=time_slot, section=key, room=room, trimester=trimester)
+        return True
+
+
+def validate_document(data, days=None, time_slots=None, calendar=None):
+    # The document's own calendar wins over the one given (the grid it would be loaded into)
+    if "calendar" in data:
+        calendar = Calendar.from_dict(data["calendar"])
+    if calendar is not None:
+        return ScheduleValidator(calendar.days, calendar.time_slots, calendar.blocked_pairs()).validate(data)
+    return ScheduleValidator(days, time_slots).validate(data)
+
+
+def validate_file(file_name):
+    with open(file_name, "r") as infile:
+        return validate_document(json.load(infile))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check a schedule JSON file for conflicts and invalid bookings.")
+    parser.add_argument("file", help="schedule.json or backup.json file")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = validate_file(args.file)
+    if args.json:
+        json.dump(report.to_dict(), sys.stdout, indent=2, ensure_ascii=False)
+        print()
+    else:
+        for violation in report.violations:
+            print(f"{violation.kind}: {violation.message}")
+        print(report.summary())
+    return 0 if report.ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())